@@ -0,0 +1,251 @@
+import logging
+import math
+import sqlite3
+from typing import Iterable
+
+from app import rollups, timestamps
+from app.database import get_connection, date_range_params, measurement_arrays, ts_range_params
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PERCENTILES = (0.5, 0.9, 0.98)
+
+# Oś czasu regresji liczona w dniach od J2000 – mniejsze liczby niż surowe julianday,
+# więc sumy kwadratów zachowują precyzję przy wielu latach danych
+_JULIAN_OFFSET = 2451545.0
+# J2000 (2000-01-01 12:00 UTC) w sekundach od epoki – dla pomiarów z kolumną ts
+_J2000_EPOCH = 946728000
+
+# Jedno przejście po indeksie (sensor_id, ts, value): liczność, min, max, średnia,
+# suma kwadratów i sumy potrzebne do nachylenia prostej najmniejszych kwadratów
+_AGGREGATES_SQL = """
+    SELECT sensor_id,
+           COUNT(*), MIN(value), MAX(value), AVG(value), SUM(value * value),
+           SUM(x), SUM(x * x), SUM(x * value)
+    FROM (
+        SELECT sensor_id, value, (ts - {epoch}) / 86400.0 AS x
+        FROM measurements
+        WHERE sensor_id IN ({placeholders}) AND ts >= ? AND ts <= ?
+          AND value IS NOT NULL
+    )
+    GROUP BY sensor_id
+"""
+
+# Funkcje okna wybierają tylko kilka wierszy na sensor: argmin/argmax, pierwszy/ostatni
+# pomiar i sąsiednie rangi potrzebne do interpolacji percentyli. Czas (ts) wraca jako liczba –
+# na tekst czasu lokalnego zamieniane są tylko wybrane wiersze.
+_RANKED_SQL = """
+    WITH ranked AS (
+        SELECT sensor_id, value, ts,
+               ROW_NUMBER() OVER (PARTITION BY sensor_id ORDER BY value, ts) AS rn_value,
+               ROW_NUMBER() OVER (PARTITION BY sensor_id ORDER BY value DESC, ts) AS rn_value_desc,
+               ROW_NUMBER() OVER (PARTITION BY sensor_id ORDER BY ts) AS rn_time,
+               COUNT(*) OVER (PARTITION BY sensor_id) AS n
+        FROM measurements
+        WHERE sensor_id IN ({placeholders}) AND ts >= ? AND ts <= ?
+          AND value IS NOT NULL
+    )
+    SELECT sensor_id, value, ts, rn_value, rn_value_desc, rn_time, n
+    FROM ranked
+    WHERE rn_value = 1 OR rn_value_desc = 1 OR rn_time = 1 OR rn_time = n
+       OR {rank_filter}
+"""
+
+
+# Te same statystyki z tabeli agregatów: kubełek reprezentowany przez swój początek
+# (x), ważony liczbą pomiarów. Percentyle nie są dostępne na tym poziomie.
+_ROLLUP_AGGREGATES_SQL = """
+    SELECT sensor_id,
+           SUM(count), MIN(min), MAX(max), SUM(sum) / SUM(count), SUM(sumsq),
+           SUM(count * x), SUM(count * x * x), SUM(x * sum)
+    FROM (
+        SELECT sensor_id, count, min, max, sum, sumsq, julianday(bucket) - {offset} AS x
+        FROM {table}
+        WHERE sensor_id IN ({placeholders}) AND bucket >= COALESCE(strftime('{fmt}', ?), '') AND bucket <= ?
+    )
+    GROUP BY sensor_id
+"""
+
+_ROLLUP_RANKED_SQL = """
+    WITH ranked AS (
+        SELECT sensor_id, sum / count AS value, bucket AS date_time,
+               ROW_NUMBER() OVER (PARTITION BY sensor_id ORDER BY min, bucket) AS rn_min,
+               ROW_NUMBER() OVER (PARTITION BY sensor_id ORDER BY max DESC, bucket) AS rn_max,
+               ROW_NUMBER() OVER (PARTITION BY sensor_id ORDER BY bucket) AS rn_time,
+               COUNT(*) OVER (PARTITION BY sensor_id) AS n
+        FROM {table}
+        WHERE sensor_id IN ({placeholders}) AND bucket >= COALESCE(strftime('{fmt}', ?), '') AND bucket <= ?
+    )
+    SELECT sensor_id, value, date_time, rn_min, rn_max, rn_time, n
+    FROM ranked
+    WHERE rn_min = 1 OR rn_max = 1 OR rn_time = 1 OR rn_time = n
+"""
+
+
+# Sensory, których zakres sięga przed granicę archiwum Parquet (app/archive.py) – ich surowe
+# pomiary są częściowo poza SQLite, więc statystyki liczone są ze scalonego szeregu
+_ARCHIVED_SQL = """
+    SELECT sensor_id FROM archive_state
+    WHERE sensor_id IN ({placeholders}) AND archived_before > ?
+"""
+
+
+def _percentile_rank_filter(count: int) -> str:
+    # Dla percentyla p: rangi floor(p * (n - 1)) + 1 oraz następna (interpolacja liniowa).
+    return " OR ".join(
+        "rn_value BETWEEN CAST(? * (n - 1) AS INTEGER) + 1 AND CAST(? * (n - 1) AS INTEGER) + 2"
+        for _ in range(count)
+    ) or "0"
+
+
+def _interpolate(by_rank: dict[int, float], n: int, p: float) -> float:
+    # Percentyl z interpolacją liniową (jak domyślnie w NumPy/pandas).
+    pos = p * (n - 1)
+    lo = int(pos)
+    low = by_rank[lo + 1]
+    high = by_rank.get(lo + 2, low)
+    return low + (high - low) * (pos - lo)
+
+
+def summarize_sensors(
+        sensor_ids: Iterable[int],
+        date_from=None,
+        date_to=None,
+        *,
+        percentiles: Iterable[float] = DEFAULT_PERCENTILES,
+        level: str | None = None,
+        conn: sqlite3.Connection | None = None
+) -> dict[int, dict]:
+
+    # Statystyki pomiarów wielu sensorów w zakresie dat, liczone w SQLite – do Pythona
+    # trafia jeden wiersz agregatów i kilka wierszy rang na sensor, nigdy cały szereg.
+    # Wyjątek: zakres sięgający przed granicę archiwum Parquet – wtedy statystyki surowych
+    # pomiarów liczone są w NumPy ze scalonego szeregu (database.measurement_arrays).
+    # level ("hourly"/"daily"/"monthly") liczy z tabel agregatów zamiast surowych pomiarów;
+    # wtedy min_time/max_time to początki kubełków, a percentyle są pomijane.
+    # Zwraca mapę sensor_id → słownik statystyk (sensory bez danych są pomijane).
+
+    sensor_ids = list(sensor_ids)
+    percentiles = tuple(percentiles)
+    if not sensor_ids:
+        return {}
+
+    if level is not None:
+        percentiles = ()
+
+    if conn is None:
+        conn = get_connection()
+    cur = conn.cursor()
+    summaries = {}
+
+    if level is None:
+        bounds = ts_range_params(date_from, date_to)
+        archived = _archived_sensors(cur, sensor_ids, bounds[0])
+        for sensor_id in archived:
+            summary = _summarize_arrays(*measurement_arrays(sensor_id, *bounds, conn=conn), percentiles)
+            if summary is not None:
+                summaries[sensor_id] = summary
+        if archived:
+            log.info("Statystyki %d sensorów ze scalonego archiwum i SQLite", len(archived))
+        sensor_ids = [sensor_id for sensor_id in sensor_ids if sensor_id not in archived]
+        if not sensor_ids:
+            return summaries
+
+    placeholders = ",".join("?" for _ in sensor_ids)
+    if level is None:
+        aggregates_sql = _AGGREGATES_SQL.format(epoch=_J2000_EPOCH, placeholders=placeholders)
+        ranked_sql = _RANKED_SQL.format(placeholders=placeholders,
+                                        rank_filter=_percentile_rank_filter(len(percentiles)))
+    else:
+        bounds = date_range_params(date_from, date_to)
+        table, _, fmt, _ = rollups.LEVELS[level]
+        aggregates_sql = _ROLLUP_AGGREGATES_SQL.format(offset=_JULIAN_OFFSET, table=table, fmt=fmt,
+                                                       placeholders=placeholders)
+        ranked_sql = _ROLLUP_RANKED_SQL.format(table=table, fmt=fmt, placeholders=placeholders)
+
+    cur.execute(aggregates_sql, (*sensor_ids, *bounds))
+    for sensor_id, n, min_v, max_v, mean, sumsq, sx, sxx, sxy in cur.fetchall():
+        variance = (sumsq - n * mean * mean) / (n - 1) if n > 1 else 0.0
+        denom = n * sxx - sx * sx
+        summaries[sensor_id] = {
+            "count": n,
+            "min": min_v,
+            "max": max_v,
+            "mean": mean,
+            "std": math.sqrt(max(variance, 0.0)),
+            "slope_per_day": (n * sxy - sx * mean * n) / denom if denom > 1e-12 else 0.0,
+            "percentiles": {},
+        }
+
+    rank_params = [p for p in percentiles for _ in (0, 1)]
+    cur.execute(ranked_sql, (*sensor_ids, *bounds, *rank_params))
+    by_rank: dict[int, dict[int, float]] = {}
+    for sensor_id, value, date_time, rn_value, rn_value_desc, rn_time, n in cur.fetchall():
+        if level is None:
+            date_time = timestamps.to_local_text(date_time)
+        summary = summaries[sensor_id]
+        by_rank.setdefault(sensor_id, {})[rn_value] = value
+        if rn_value == 1:
+            summary["min_time"] = date_time
+        if rn_value_desc == 1:
+            summary["max_time"] = date_time
+        if rn_time == 1:
+            summary["first"], summary["first_time"] = value, date_time
+        if rn_time == n:
+            summary["last"], summary["last_time"] = value, date_time
+
+    for sensor_id in by_rank:
+        summary = summaries[sensor_id]
+        for p in percentiles:
+            summary["percentiles"][p] = _interpolate(by_rank[sensor_id], summary["count"], p)
+
+    log.info("Statystyki policzone w SQL (%s) dla %d/%d sensorów",
+             level or "surowe", len(summaries), len(sensor_ids))
+    return summaries
+
+
+def summarize_sensor(sensor_id: int, date_from=None, date_to=None, **kwargs) -> dict | None:
+    # Statystyki jednego sensora lub None, gdy w zakresie nie ma pomiarów.
+    return summarize_sensors([sensor_id], date_from, date_to, **kwargs).get(sensor_id)
+
+
+def _archived_sensors(cur: sqlite3.Cursor, sensor_ids: list[int], ts_from: int) -> set[int]:
+    placeholders = ",".join("?" for _ in sensor_ids)
+    cur.execute(_ARCHIVED_SQL.format(placeholders=placeholders), (*sensor_ids, ts_from))
+    return {row[0] for row in cur.fetchall()}
+
+
+def _summarize_arrays(ts, values, percentiles: tuple[float, ...]) -> dict | None:
+
+    # Te same statystyki co _AGGREGATES_SQL/_RANKED_SQL, liczone w NumPy ze scalonego
+    # szeregu (archiwum + SQLite, rosnąco po ts). None, gdy w zakresie nie ma pomiarów.
+
+    import numpy as np
+
+    keep = ~np.isnan(values)
+    ts, values = ts[keep], values[keep]
+    n = len(values)
+    if not n:
+        return None
+    x = (ts - _J2000_EPOCH) / 86400.0
+    mean = float(values.mean())
+    sx, sxx, sxy = float(x.sum()), float((x * x).sum()), float((x * values).sum())
+    variance = (float((values * values).sum()) - n * mean * mean) / (n - 1) if n > 1 else 0.0
+    denom = n * sxx - sx * sx
+    # argmin/argmax zwracają pierwsze wystąpienie – najwcześniejszy ts, jak ORDER BY value, ts
+    i_min, i_max = int(values.argmin()), int(values.argmax())
+    return {
+        "count": n,
+        "min": float(values[i_min]),
+        "max": float(values[i_max]),
+        "mean": mean,
+        "std": math.sqrt(max(variance, 0.0)),
+        "slope_per_day": (n * sxy - sx * mean * n) / denom if denom > 1e-12 else 0.0,
+        "percentiles": {p: float(np.quantile(values, p)) for p in percentiles},
+        "min_time": timestamps.to_local_text(int(ts[i_min])),
+        "max_time": timestamps.to_local_text(int(ts[i_max])),
+        "first": float(values[0]),
+        "first_time": timestamps.to_local_text(int(ts[0])),
+        "last": float(values[-1]),
+        "last_time": timestamps.to_local_text(int(ts[-1])),
+    }
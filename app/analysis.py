@@ -1,6 +1,6 @@
 import logging
-from app.database import connect
-import pandas as pd
+from app.aggregation import summarize_sensor
+from app.database import series_level
 
 # Logger setup
 logger = logging.getLogger("Analysis")
@@ -11,43 +11,41 @@ if not logger.hasHandlers():
     handler.setFormatter(formatter)
     logger.addHandler(handler)
 
+# Nachylenie prostej regresji poniżej tego progu (|µg/m³ na dobę|, po zaokrągleniu 0.00) to trend stabilny
+STABLE_SLOPE_PER_DAY = 0.005
+
+def trend_name(slope_per_day: float) -> str:
+    # Kierunek trendu ze znaku nachylenia regresji – zgodny z liczbą wypisaną obok.
+    if abs(slope_per_day) < STABLE_SLOPE_PER_DAY:
+        return "stabilny"
+    return "wzrastający" if slope_per_day > 0 else "malejący"
+
 def analyze_measurements_to_text(sensor_id, date_from=None, date_to=None):
     logger.info(f"Analiza danych dla sensora ID: {sensor_id} w zakresie {date_from} - {date_to}")
     try:
-        conn = connect()
-        query = "SELECT value, date_time FROM measurements WHERE sensor_id = ? ORDER BY date_time"
-        df = pd.read_sql_query(query, conn, params=(sensor_id,))
-        conn.close()
-        logger.info(f"Pobrano {len(df)} rekordów z bazy danych")
-
-        df["date_time"] = pd.to_datetime(df["date_time"])
+        # Długie zakresy liczone z agregatów – czas analizy nie rośnie z historią
+        level = series_level(sensor_id, date_from, date_to)
+        stats = summarize_sensor(sensor_id, date_from, date_to, level=level)
 
-        if date_from:
-            df = df[df["date_time"] >= pd.to_datetime(date_from)]
-        if date_to:
-            df = df[df["date_time"] <= pd.to_datetime(date_to)]
-
-        if df.empty:
+        if not stats:
             logger.warning("Brak danych po przefiltrowaniu dat")
             return "Brak danych do analizy."
+        logger.info(f"Przeanalizowano {stats['count']} rekordów w bazie danych")
 
-        min_val = df["value"].min()
-        max_val = df["value"].max()
-        avg_val = df["value"].mean()
-
-        min_time = df[df["value"] == min_val]["date_time"].iloc[0]
-        max_time = df[df["value"] == max_val]["date_time"].iloc[0]
-
-        trend = "wzrastający" if df["value"].iloc[-1] > df["value"].iloc[0] else "malejący"
+        trend = trend_name(stats["slope_per_day"])
+        percentiles = ", ".join(
+            f"P{p * 100:g}: {v:.2f}" for p, v in stats["percentiles"].items()
+        ) or f"niedostępne dla agregatów ({level})"
 
-        logger.info(f"Min: {min_val}, Max: {max_val}, Avg: {avg_val:.2f}, Trend: {trend}")
+        logger.info(f"Min: {stats['min']}, Max: {stats['max']}, Avg: {stats['mean']:.2f}, Trend: {trend}")
 
         return (
             f" Analiza danych:\n"
-            f" Min: {min_val:.2f} µg/m³ o {min_time}\n"
-            f" Max: {max_val:.2f} µg/m³ o {max_time}\n"
-            f" Średnia: {avg_val:.2f} µg/m³\n"
-            f" Trend: {trend}"
+            f" Min: {stats['min']:.2f} µg/m³ o {stats['min_time']}\n"
+            f" Max: {stats['max']:.2f} µg/m³ o {stats['max_time']}\n"
+            f" Średnia: {stats['mean']:.2f} µg/m³ (odchylenie std: {stats['std']:.2f})\n"
+            f" Percentyle [µg/m³]: {percentiles}\n"
+            f" Trend: {trend} ({stats['slope_per_day']:+.2f} µg/m³ na dobę)"
         )
 
     except Exception as e:
@@ -1,6 +1,8 @@
 import logging
 import requests
 
+from app import http_client, timestamps
+
 BASE_URL = "https://api.gios.gov.pl/pjp-api/rest"
 
 # Logger setup
@@ -12,43 +14,74 @@ if not logger.hasHandlers():
     handler.setFormatter(formatter)
     logger.addHandler(handler)
 
-def get_all_stations():
+# Wszystkie funkcje pobierające przyjmują raise_errors: domyślnie błąd sieci/serwera jest
+# logowany i zwracana jest pusta odpowiedź ([] / {}), jak dotąd. Z raise_errors=True
+# wyjątek requests.RequestException jest przekazywany dalej – wtedy pusta odpowiedź
+# znaczy „brak danych”, a nie „nie udało się pobrać”. Ponowienia, limity czasu
+# i bezpieczniki endpointów – w http_client.request.
+
+def get_all_stations(*, raise_errors=False):
     url = f"{BASE_URL}/station/findAll"
     try:
         logger.info("Pobieranie wszystkich stacji")
-        response = requests.get(url)
-        response.raise_for_status()
-        stations = response.json()
+        stations = http_client.request(url, endpoint="station/findAll").json()
         logger.info(f"Pobrano {len(stations)} stacji")
         return stations
     except requests.RequestException as e:
+        if raise_errors:
+            raise
         logger.exception("Błąd podczas pobierania stacji")
         return []
 
-def get_sensors_for_station(station_id):
+def get_sensors_for_station(station_id, *, raise_errors=False):
     url = f"{BASE_URL}/station/sensors/{station_id}"
     try:
         logger.info(f"Pobieranie sensorów dla stacji ID: {station_id}")
-        response = requests.get(url)
-        response.raise_for_status()
-        sensors = response.json()
+        sensors = http_client.request(url, endpoint="station/sensors").json()
         logger.info(f"Pobrano {len(sensors)} sensorów")
         return sensors
     except requests.RequestException as e:
+        if raise_errors:
+            raise
         logger.exception(f"Błąd przy pobieraniu sensorów dla stacji {station_id}")
         return []
 
-def get_measurements_for_sensor(sensor_id):
+class SensorData(dict):
+
+    # Odpowiedź getData razem z walidatorami HTTP (ETag, Last-Modified) do następnego
+    # zapytania warunkowego. not_modified=True: serwer odpowiedział 304 – brak nowych danych.
+
+    def __init__(self, data=(), *, etag=None, last_modified=None, not_modified=False):
+        super().__init__(data)
+        self.etag = etag
+        self.last_modified = last_modified
+        self.not_modified = not_modified
+
+def get_measurements_for_sensor(sensor_id, *, etag=None, last_modified=None, raise_errors=False):
     url = f"{BASE_URL}/data/getData/{sensor_id}"
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
     try:
         logger.info(f"Pobieranie danych z sensora ID: {sensor_id}")
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        values_count = len(data.get('values', []))
+        response = http_client.request(url, endpoint="data/getData", headers=headers)
+        if response.status_code == 304:
+            logger.info(f"Brak zmian danych sensora {sensor_id} (304)")
+            return SensorData({"values": []}, etag=etag, last_modified=last_modified, not_modified=True)
+        data = SensorData(response.json(), etag=response.headers.get("ETag"),
+                          last_modified=response.headers.get("Last-Modified"))
+        # Czas pomiaru przeliczany raz, tutaj (całą odpowiedź naraz): "ts" w sekundach UTC obok tekstowego "date"
+        values = data.get("values", [])
+        for value, ts in zip(values, timestamps.parse_local_many([v["date"] for v in values]).tolist()):
+            value["ts"] = ts
+        values_count = len(values)
         logger.info(f"Pobrano {values_count} pomiarów")
         return data
     except requests.RequestException as e:
+        if raise_errors:
+            raise
         logger.exception(f"Błąd przy pobieraniu danych z sensora {sensor_id}")
         return {}
 
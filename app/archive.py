@@ -0,0 +1,201 @@
+import logging
+import os
+import sqlite3
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app import database, timestamps
+
+log = logging.getLogger(__name__)
+
+# Archiwum zimnej historii: pomiary starsze niż max_age_days są przenoszone z tabeli
+# measurements do plików Parquet podzielonych na sensor i miesiąc (układ "hive"):
+#
+#   data/archive/sensor_id=92/month=2023-01/part.parquet
+#
+# Kolumny: ts (int64, sekundy UTC – jak measurements.ts) i value (float32 – ok. 7 cyfr
+# znaczących, więcej niż dokładność pomiaru); miesiąc partycji to miesiąc czasu lokalnego.
+# Tabela archive_state pamięta dla każdego sensora granicę archiwum – pomiary sprzed niej
+# są tylko w Parquecie. Agregaty
+# (app/rollups.py) zostają w SQLite, więc długie zakresy nie sięgają do archiwum wcale.
+# pyarrow jest importowany dopiero przy zapisie/odczycie archiwum.
+
+DEFAULT_MAX_AGE_DAYS = 365
+ARCHIVE_DIR_NAME = "archive"
+PART_FILE = "part.parquet"
+COMPRESSION = "zstd"
+
+_ARCHIVE_ROWS_SQL = """
+    SELECT ts, value FROM measurements
+    WHERE sensor_id = ? AND ts < ?
+    ORDER BY ts
+"""
+
+_UPDATE_STATE_SQL = """
+    INSERT INTO archive_state (sensor_id, archived_before, first_ts, last_ts)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(sensor_id) DO UPDATE SET
+        archived_before = MAX(archived_before, excluded.archived_before),
+        first_ts = MIN(COALESCE(first_ts, excluded.first_ts), excluded.first_ts),
+        last_ts = MAX(COALESCE(last_ts, excluded.last_ts), excluded.last_ts)
+"""
+
+
+def archive_dir(conn: sqlite3.Connection | None = None) -> str:
+    # Katalog archiwum obok pliku bazy połączenia (baza w pamięci – obok DB_PATH).
+    path = ""
+    if conn is not None:
+        path = next((row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main"), "")
+    return os.path.join(os.path.dirname(path or database.DB_PATH), ARCHIVE_DIR_NAME)
+
+
+def cutoff_for(max_age_days: int, now: datetime | None = None) -> int:
+
+    # Granica archiwum (ts) wyrównana do początku lokalnego miesiąca – cały miesiąc jest
+    # albo w SQLite, albo w Parquecie. now – czas lokalny (domyślnie bieżący).
+
+    moment = (now or datetime.now()) - timedelta(days=max_age_days)
+    return timestamps.local_floor(timestamps.parse_local(moment.strftime(timestamps.DATE_TIME_FORMAT)), "month")
+
+
+def partition_path(root: str, sensor_id: int, month: str) -> str:
+    return os.path.join(root, f"sensor_id={sensor_id}", f"month={month}", PART_FILE)
+
+
+def _schema():
+    import pyarrow as pa
+    return pa.schema([("ts", pa.int64()), ("value", pa.float32())])
+
+
+def _write_month(path: str, ts: np.ndarray, values: np.ndarray) -> int:
+
+    # Zapisuje miesiąc sensora; istniejący plik jest scalany (dla powtórzonej daty wygrywa
+    # nowy wiersz z SQLite). Zapis do pliku tymczasowego (kropka na początku – pomijany
+    # przy odczycie) i os.replace – przerwany zapis nie psuje archiwum. Zwraca rozmiar pliku w bajtach.
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if os.path.exists(path):
+        old = pq.read_table(path)
+        ts = np.concatenate([old["ts"].to_numpy(), ts])
+        values = np.concatenate([old["value"].to_numpy(zero_copy_only=False), values])
+    order = np.argsort(ts, kind="stable")
+    ts, values = ts[order], values[order]
+    last = np.r_[ts[1:] != ts[:-1], True]
+    table = pa.table({"ts": ts[last], "value": values[last]}, schema=_schema())
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = os.path.join(os.path.dirname(path), f".{uuid.uuid4().hex}.tmp")
+    pq.write_table(table, tmp, compression=COMPRESSION)
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+
+def archive_sensor(conn: sqlite3.Connection, sensor_id: int, cutoff: int, root: str) -> int:
+
+    # Przenosi pomiary sensora sprzed cutoff do archiwum. Najpierw zapis plików, potem
+    # w jednej transakcji usunięcie wierszy i przesunięcie granicy w archive_state – po
+    # przerwaniu w połowie dane są nadal w SQLite, a kolejne uruchomienie scali je ponownie.
+    # Zwraca liczbę przeniesionych pomiarów.
+
+    rows = conn.execute(_ARCHIVE_ROWS_SQL, (sensor_id, cutoff)).fetchall()
+    if not rows:
+        return 0
+    ts = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    values = np.array([row[1] for row in rows], dtype=np.float64).astype(np.float32)
+    months = timestamps.to_local_many(ts).astype("datetime64[M]")
+    starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    for start, end in zip(starts, np.r_[starts[1:], len(ts)]):
+        _write_month(partition_path(root, sensor_id, str(months[start])), ts[start:end], values[start:end])
+
+    with conn:
+        conn.execute("DELETE FROM measurements WHERE sensor_id = ? AND ts < ?", (sensor_id, cutoff))
+        conn.execute(_UPDATE_STATE_SQL, (sensor_id, cutoff, int(ts[0]), int(ts[-1])))
+    return len(rows)
+
+
+def used_bytes(conn: sqlite3.Connection) -> int:
+    # Bajty zajęte w pliku bazy (bez wolnych stron – te odzyskuje dopiero VACUUM).
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return (pages - free) * page_size
+
+
+def directory_bytes(root: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name))
+               for path, _, names in os.walk(root) for name in names)
+
+
+def archive_measurements(conn=None, *, max_age_days: int = DEFAULT_MAX_AGE_DAYS, now: datetime | None = None,
+                         root: str | None = None, vacuum: bool = False) -> dict:
+
+    # Archiwizuje pomiary wszystkich sensorów starsze niż max_age_days (do początku miesiąca).
+    # vacuum=True zmniejsza potem plik bazy. Zwraca podsumowanie z rozmiarami przed i po.
+
+    if conn is None:
+        conn = database.get_connection()
+    root = root or archive_dir(conn)
+    cutoff = cutoff_for(max_age_days, now)
+    bytes_before = used_bytes(conn)
+    archive_before = directory_bytes(root)
+
+    sensor_ids = [row[0] for row in conn.execute(
+        "SELECT DISTINCT sensor_id FROM measurements WHERE ts < ?", (cutoff,))]
+    moved = 0
+    for sensor_id in sensor_ids:
+        moved += archive_sensor(conn, sensor_id, cutoff, root)
+    if vacuum and moved:
+        conn.execute("VACUUM")
+
+    summary = {
+        "cutoff": timestamps.to_local_text(cutoff),
+        "sensors": len(sensor_ids),
+        "rows": moved,
+        "sqlite_bytes_before": bytes_before,
+        "sqlite_bytes_after": used_bytes(conn),
+        "archive_bytes_added": directory_bytes(root) - archive_before,
+        "archive_dir": root,
+    }
+    log.info("Archiwizacja pomiarów sprzed %s: %s", summary["cutoff"], summary)
+    return summary
+
+
+def _month_of(ts: int, default: str) -> str:
+    # Lokalny miesiąc "YYYY-MM" dla ts; granice otwarte (database.MIN_TS/MAX_TS) → default.
+    return timestamps.to_local_text(ts)[:7] if database.MIN_TS < ts < database.MAX_TS else default
+
+
+def read_range(sensor_id: int, ts_from: int, ts_to: int, root: str) -> tuple[np.ndarray, np.ndarray]:
+
+    # Pomiary sensora z archiwum w zakresie ts [ts_from, ts_to] jako tablice (ts, wartości
+    # float64), rosnąco po ts. Partycje są przycinane po nazwie katalogu month=... (pliki
+    # spoza zakresu nie są otwierane – szybciej niż filtr na kolumnie partycji po odkryciu
+    # całego katalogu), a filtr na ts trafia do skanera Parquet i korzysta ze statystyk grup wierszy.
+
+    import pyarrow.dataset as ds
+
+    sensor_root = os.path.join(root, f"sensor_id={sensor_id}")
+    month_from, month_to = _month_of(ts_from, ""), _month_of(ts_to, "9999-12")
+    files = []
+    if os.path.isdir(sensor_root):
+        files = sorted(
+            os.path.join(entry.path, PART_FILE) for entry in os.scandir(sensor_root)
+            if entry.name.startswith("month=") and month_from <= entry.name[6:] <= month_to
+            and os.path.exists(os.path.join(entry.path, PART_FILE))
+        )
+    if not files:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+
+    condition = (ds.field("ts") >= ts_from) & (ds.field("ts") <= ts_to)
+    table = ds.dataset(files, schema=_schema(), format="parquet").to_table(filter=condition, use_threads=False)
+
+    ts = table["ts"].to_numpy()
+    values = table["value"].to_numpy(zero_copy_only=False).astype(np.float64)
+    if len(ts) and np.any(ts[1:] < ts[:-1]):
+        order = np.argsort(ts, kind="stable")
+        ts, values = ts[order], values[order]
+    return ts, values
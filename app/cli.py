@@ -0,0 +1,135 @@
+import argparse
+import logging
+
+from app import archive, database, metadata, pipeline, rollups, scheduler, startup, update_db
+from app.constants import CITY_NAMES
+
+log = logging.getLogger(__name__)
+
+
+def _cmd_compact(args) -> int:
+    summary = database.compact_database()
+    print(f"Usunięto duplikatów: {summary['removed_rows']}")
+    print(f"Rozmiar bazy: {summary['bytes_before'] / 1e6:.1f} MB → {summary['bytes_after'] / 1e6:.1f} MB")
+    return 0
+
+
+def _cmd_archive(args) -> int:
+    database.create_tables()
+    summary = archive.archive_measurements(max_age_days=args.max_age_days, vacuum=args.vacuum)
+    if not summary["rows"]:
+        print(f"Brak pomiarów sprzed {summary['cutoff']} do archiwizacji.")
+        return 0
+    freed = summary["sqlite_bytes_before"] - summary["sqlite_bytes_after"]
+    print(f"Przeniesiono {summary['rows']} pomiarów {summary['sensors']} sensorów sprzed {summary['cutoff']} "
+          f"do {summary['archive_dir']}")
+    print(f"SQLite: -{freed / 1e6:.1f} MB, archiwum: +{summary['archive_bytes_added'] / 1e6:.1f} MB "
+          f"({summary['archive_bytes_added'] / max(freed, 1):.0%} zajmowanego miejsca)")
+    if not args.vacuum:
+        print("Plik bazy zmniejszy się po VACUUM (opcja --vacuum albo polecenie compact).")
+    return 0
+
+
+def _cmd_rebuild_rollups(args) -> int:
+    conn = database.get_connection()
+    with conn:
+        rollups.rebuild(conn)
+    print("Przeliczono agregaty godzinowe, dzienne i miesięczne.")
+    return 0
+
+
+def _cmd_refresh_metadata(args) -> int:
+    database.create_tables()
+    count = metadata.refresh_stations()
+    if not count:
+        print("Nie udało się pobrać listy stacji z GIOŚ.")
+        return 1
+    print(f"Odświeżono metadane {count} stacji.")
+    return 0
+
+
+def _cmd_update(args) -> int:
+    database.create_tables()
+    cities = None if args.all else (args.cities or CITY_NAMES)
+    metrics = pipeline.PipelineMetrics()
+    results = update_db.update_many(cities, workers=args.workers, force=args.force, metrics=metrics)
+    print(f"{'miasto':24s} {'sensory':>8s} {'odpytane':>9s} {'nowe':>7s} {'błędy':>6s} {'czas':>8s}")
+    for city, result in results.items():
+        print(f"{city:24s} {result.sensors:8d} {result.fetched:9d} {result.inserted:7d} {result.failed:6d} "
+              f"{result.seconds:7.1f}s")
+    print(f"Razem nowych pomiarów: {sum(result.inserted for result in results.values())}")
+    if metrics.stages:
+        print(f"Potok: {metrics.summary()}")
+    return 1 if any(result.failed for result in results.values()) else 0
+
+
+def _cmd_schedule(args) -> int:
+    database.create_tables()
+    daemon = scheduler.RefreshScheduler(requests_per_minute=args.rpm, workers=args.workers)
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        print(f"Zatrzymano. Odpytano sensorów: {daemon.fetched}")
+    return 0
+
+
+def _cmd_startup_report(args) -> int:
+    rows = startup.import_report(args.module, top=args.top)
+    print(f"{'moduł':40s} {'własny':>10s} {'łącznie':>10s}")
+    for name, own, total in rows:
+        print(f"{name:40s} {own * 1000:8.1f} ms {total * 1000:8.1f} ms")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli",
+        description="Narzędzia wiersza poleceń dla bazy jakości powietrza (bez GUI)."
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    compact = sub.add_parser("compact", help="usuń zduplikowane pomiary, dodaj klucz unikalny i wykonaj VACUUM")
+    compact.set_defaults(func=_cmd_compact)
+
+    archive_cmd = sub.add_parser("archive", help="przenieś stare pomiary z SQLite do plików Parquet")
+    archive_cmd.add_argument("--max-age-days", type=int, default=archive.DEFAULT_MAX_AGE_DAYS,
+                             help="archiwizuj pomiary starsze niż tyle dni (do początku miesiąca)")
+    archive_cmd.add_argument("--vacuum", action="store_true", help="po archiwizacji zmniejsz plik bazy (VACUUM)")
+    archive_cmd.set_defaults(func=_cmd_archive)
+
+    rebuild = sub.add_parser("rebuild-rollups", help="przelicz od nowa tabele agregatów z surowych pomiarów")
+    rebuild.set_defaults(func=_cmd_rebuild_rollups)
+
+    refresh = sub.add_parser("refresh-metadata", help="pobierz z GIOŚ aktualną listę stacji do lokalnego cache'u")
+    refresh.set_defaults(func=_cmd_refresh_metadata)
+
+    update = sub.add_parser("update", help="pobierz nowe pomiary miast (domyślnie wszystkich z listy miast aplikacji)")
+    update.add_argument("cities", nargs="*", help="nazwy miast (bez podania – constants.CITY_NAMES)")
+    update.add_argument("--all", action="store_true", help="wszystkie miasta ze stacjami w bazie")
+    update.add_argument("--workers", type=int, default=None, help="równoległe zapytania do GIOŚ")
+    update.add_argument("--force", action="store_true", help="odpytaj także sensory bez możliwych nowych danych")
+    update.set_defaults(func=_cmd_update)
+
+    schedule = sub.add_parser("schedule", help="odświeżaj w tle pomiary wszystkich sensorów w kraju (Ctrl+C kończy)")
+    schedule.add_argument("--rpm", type=float, default=scheduler.DEFAULT_REQUESTS_PER_MINUTE,
+                          help="globalny limit zapytań do GIOŚ na minutę")
+    schedule.add_argument("--workers", type=int, default=scheduler.DEFAULT_WORKERS,
+                          help="równoległe zapytania w jednym cyklu")
+    schedule.set_defaults(func=_cmd_schedule)
+
+    report = sub.add_parser("startup-report", help="pokaż, które importy najbardziej spowalniają start aplikacji")
+    report.add_argument("--module", default="app.gui", help="moduł, którego import jest mierzony")
+    report.add_argument("--top", type=int, default=20, help="ile najwolniejszych modułów pokazać")
+    report.set_defaults(func=_cmd_startup_report)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,6 +2,14 @@ import sys
 import os
 import sqlite3
 import logging
+import threading
+from datetime import date, datetime
+
+from app import rollups, timestamps
+from app.timestamps import DATE_TIME_FORMAT
+
+# pandas jest importowany dopiero w funkcjach, które zwracają DataFrame – import tego
+# modułu (a więc i start GUI) go nie wymaga
 
 logger = logging.getLogger(__name__)
 
@@ -15,18 +23,196 @@ def resource_path(relative_path):
 
 DB_PATH = resource_path(os.path.join("data", "air_quality.db"))
 
-def connect():
-    logger.info(f"Nawiązywanie połączenia z bazą danych: {DB_PATH}")
-    return sqlite3.connect(DB_PATH)
+# Ustawienia każdego połączenia: WAL pozwala GUI czytać w trakcie zapisu aktualizacji,
+# synchronous=NORMAL w trybie WAL nie robi fsync przy każdym commicie, a większy cache
+# stron i mmap przyspieszają skany indeksów
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -32000,       # ~32 MB
+    "mmap_size": 268435456,     # 256 MB
+    "temp_store": "MEMORY",
+    "busy_timeout": 10000,      # ms
+}
+
+# Rozmiar cache'u przygotowanych zapytań (per połączenie) – przy długo żyjących
+# połączeniach powtarzane zapytania nie są ponownie kompilowane
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+
+def connect(path=None):
+
+    # Nowe, skonfigurowane połączenie – zamyka je wywołujący. Do zwykłej pracy
+    # używaj get_connection(), które zwraca połączenie współdzielone w obrębie wątku.
+
+    path = path or DB_PATH
+    logger.info(f"Nawiązywanie połączenia z bazą danych: {path}")
+    conn = sqlite3.connect(path, timeout=PRAGMAS["busy_timeout"] / 1000,
+                           cached_statements=STATEMENT_CACHE_SIZE)
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+def get_connection():
+
+    # Połączenie z pulą per wątek (i per ścieżka bazy). Nie zamykać – jest ponownie
+    # używane przez kolejne wywołania w tym samym wątku.
+
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(DB_PATH)
+    if conn is None:
+        conn = connections[DB_PATH] = connect(DB_PATH)
+    return conn
+
+def close_connections():
+    # Zamyka połączenia z puli bieżącego wątku (np. przy zamykaniu aplikacji lub w testach).
+    for conn in getattr(_local, "connections", {}).values():
+        conn.close()
+    _local.connections = {}
+
+# Zapytania wstawiające – współdzielone przez zapis pojedynczy, wsadowy (ingest)
+# i odświeżanie cache'u metadanych. Stacje i sensory są nadpisywane, żeby zmiany
+# w GIOŚ (np. adres stacji) trafiały do bazy.
+INSERT_STATION_SQL = """
+    INSERT INTO stations (id, station_name, city, commune, province, latitude, longitude, address_street)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        station_name = excluded.station_name, city = excluded.city, commune = excluded.commune,
+        province = excluded.province, latitude = excluded.latitude, longitude = excluded.longitude,
+        address_street = excluded.address_street;
+"""
+
+INSERT_SENSOR_SQL = """
+    INSERT INTO sensors (id, station_id, param_code, param_name)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        station_id = excluded.station_id, param_code = excluded.param_code, param_name = excluded.param_name;
+"""
+
+# Upsert: ponowne wstawienie tego samego (sensor_id, ts) nie tworzy duplikatu,
+# a jedynie aktualizuje wartość, jeśli GIOŚ ją skorygował. ts – sekundy UTC (app/timestamps.py).
+INSERT_MEASUREMENT_SQL = """
+    INSERT INTO measurements (sensor_id, value, ts)
+    VALUES (?, ?, ?)
+    ON CONFLICT(sensor_id, ts) DO UPDATE SET value = excluded.value
+    WHERE value IS NOT excluded.value;
+"""
+
+# Stan synchronizacji sensora: najnowszy zapisany pomiar (znak wodny last_ts, sekundy UTC),
+# czas ostatniego pobrania i walidatory HTTP odpowiedzi GIOŚ.
+# Znak wodny tylko rośnie – MAX po stronie SQL.
+ADVANCE_SYNC_STATE_SQL = """
+    INSERT INTO sensor_sync_state (sensor_id, last_ts) VALUES (?, ?)
+    ON CONFLICT(sensor_id) DO UPDATE SET
+        last_ts = MAX(COALESCE(last_ts, excluded.last_ts), excluded.last_ts);
+"""
+
+RECORD_FETCH_SQL = """
+    INSERT INTO sensor_sync_state (sensor_id, last_fetch, etag, last_modified) VALUES (?, ?, ?, ?)
+    ON CONFLICT(sensor_id) DO UPDATE SET
+        last_fetch = excluded.last_fetch, etag = excluded.etag, last_modified = excluded.last_modified;
+"""
+
+# Licznik wyświetleń sensora w GUI – częściej oglądane sensory harmonogram odświeża częściej
+RECORD_VIEW_SQL = """
+    INSERT INTO sensor_sync_state (sensor_id, views) VALUES (?, 1)
+    ON CONFLICT(sensor_id) DO UPDATE SET views = views + 1;
+"""
+
+MEASUREMENTS_UNIQUE_INDEX = "ux_measurements_sensor_time"
+
+# Indeksy zarządzane przez aplikację (nazwa → definicja). Każdy gorący odczyt filtruje
+# pomiary po sensor_id i sortuje po ts, a sensory wyszukuje po stacji.
+# Zapytania korzystające z tych indeksów są sprawdzane w tests/test_query_plans.py.
+MANAGED_INDEX_PREFIX = "idx_"
+INDEXES = {
+    "idx_measurements_sensor_time_value": "ON measurements (sensor_id, ts, value)",
+    "idx_sensors_station": "ON sensors (station_id)",
+}
+
+# Szereg czasowy sensora w zakresie dat – wspólny dla analizy, wykresu w GUI
+# i charts.plot_measurements. Granice to liczby całkowite (sekundy UTC, ts_range_params).
+SENSOR_RANGE_SQL = """
+    SELECT ts, value
+    FROM measurements
+    WHERE sensor_id = ? AND ts >= ? AND ts <= ?
+    ORDER BY ts
+"""
+
+# Granice używane, gdy zakres jest otwarty z jednej strony: tekstowe (kubełki agregatów)
+# i liczbowe (ts)
+_MIN_BOUND = ""
+_MAX_BOUND = "9999-12-31 23:59:59"
+MIN_TS = -(2 ** 62)
+MAX_TS = 2 ** 62
+
+SENSOR_RANGE_EXISTS_SQL = """
+    SELECT 1 FROM measurements
+    WHERE sensor_id = ? AND ts >= ? AND ts <= ?
+    LIMIT 1
+"""
+
+# Widok zgodności ze starym schematem: kolumna date_time jako tekst czasu lokalnego,
+# liczona z ts (do zapytań ad hoc i narzędzi zewnętrznych, np. konsoli sqlite3)
+MEASUREMENTS_VIEW = "measurements_local"
+
+ARCHIVE_BOUNDS_SQL = "SELECT archived_before, first_ts, last_ts FROM archive_state WHERE sensor_id = ?"
+
+# Wszystkie stacje z nazwą miasta – miasto jest dopasowywane w Pythonie (city_key), bo LOWER()
+# w SQLite zmienia tylko litery ASCII ("Łódź" ≠ "łódź"). Stacji jest kilkaset, lista jest mała.
+STATIONS_WITH_CITY_SQL = """
+    SELECT id, station_name, city, commune, province, latitude, longitude, address_street
+    FROM stations
+    WHERE city IS NOT NULL
+    ORDER BY station_name
+"""
+
+SENSORS_BY_STATION_SQL = """
+    SELECT id, param_code, param_name
+    FROM sensors
+    WHERE station_id = ?
+    ORDER BY id
+"""
+
+def station_row(station):
+    # Zamienia słownik stacji z API GIOŚ na krotkę parametrów dla INSERT_STATION_SQL.
+    return (
+        station['id'],
+        station['stationName'],
+        station['city']['name'],
+        station['city']['commune']['communeName'],
+        station['city']['commune']['provinceName'],
+        float(station['gegrLat']),
+        float(station['gegrLon']),
+        station.get('addressStreet')
+    )
 
+def sensor_row(sensor, station_id):
+    # Zamienia słownik sensora z API GIOŚ na krotkę parametrów dla INSERT_SENSOR_SQL.
+    return (
+        sensor['id'],
+        station_id,
+        sensor['param']['paramCode'],
+        sensor['param']['paramName']
+    )
 
-def connect():
-    logger.info("Nawiązywanie połączenia z bazą danych")
-    return sqlite3.connect(DB_PATH)
+MEASUREMENTS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sensor_id INTEGER,
+        value REAL,
+        ts INTEGER NOT NULL,
+        FOREIGN KEY(sensor_id) REFERENCES sensors(id)
+    );
+"""
 
-def create_tables():
+def create_tables(conn=None):
     logger.info("Tworzenie tabel w bazie danych, jeśli nie istnieją")
-    conn = connect()
+    if conn is None:
+        conn = get_connection()
     cur = conn.cursor()
 
     cur.execute("""
@@ -37,9 +223,11 @@ def create_tables():
             commune TEXT,
             province TEXT,
             latitude REAL,
-            longitude REAL
+            longitude REAL,
+            address_street TEXT
         );
     """)
+    _add_column_if_missing(cur, "stations", "address_street", "TEXT")
 
     cur.execute("""
         CREATE TABLE IF NOT EXISTS sensors (
@@ -51,123 +239,336 @@ def create_tables():
         );
     """)
 
+    cur.execute(MEASUREMENTS_TABLE_SQL.format(table="measurements"))
+    migrate_measurements_epoch(conn)
+    cur.execute(f"""
+        CREATE VIEW IF NOT EXISTS {MEASUREMENTS_VIEW} AS
+        SELECT id, sensor_id, value, ts, {timestamps.local_text_sql("ts")} AS date_time
+        FROM measurements
+    """)
+
+    # Kiedy ostatnio metadane (lista stacji, sensory stacji) były pobrane z GIOŚ – patrz app/metadata.py
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS metadata_sync (
+            resource TEXT PRIMARY KEY,
+            synced_at REAL NOT NULL
+        );
+    """)
+
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sensor_sync_state'")
+    sync_state_exists = cur.fetchone() is not None
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS sensor_sync_state (
+            sensor_id INTEGER PRIMARY KEY,
+            last_ts INTEGER,
+            last_fetch REAL,
+            etag TEXT,
+            last_modified TEXT,
+            views INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+    """)
+    _add_column_if_missing(cur, "sensor_sync_state", "views", "INTEGER NOT NULL DEFAULT 0")
+    if _add_column_if_missing(cur, "sensor_sync_state", "last_ts", "INTEGER"):
+        # Migracja: tekstowy znak wodny (czas lokalny) → sekundy UTC
+        cur.execute(f"UPDATE sensor_sync_state SET last_ts = {timestamps.epoch_sql('last_date')} "
+                    f"WHERE last_date IS NOT NULL")
+        cur.execute("ALTER TABLE sensor_sync_state DROP COLUMN last_date")
+    if not sync_state_exists:
+        # Jednorazowo: znaki wodne z istniejących pomiarów
+        cur.execute("""
+            INSERT OR IGNORE INTO sensor_sync_state (sensor_id, last_ts)
+            SELECT sensor_id, MAX(ts)
+            FROM measurements WHERE value IS NOT NULL GROUP BY sensor_id
+        """)
+
+    # Trwały cache geokodowania (app/geocoding.py); klucz to znormalizowane zapytanie,
+    # latitude/longitude NULL oznacza "nie znaleziono"
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS geocode_cache (
+            query TEXT PRIMARY KEY,
+            latitude REAL,
+            longitude REAL,
+            address TEXT,
+            source TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        );
+    """)
+
+    # Licznik zmian tabeli stations – app/spatial.py przebudowuje indeks przestrzenny
+    # tylko wtedy, gdy wersja różni się od tej, z której go zbudowano
     cur.execute("""
-        CREATE TABLE IF NOT EXISTS measurements (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            sensor_id INTEGER,
-            value REAL,
-            date_time TEXT,
-            FOREIGN KEY(sensor_id) REFERENCES sensors(id)
+        CREATE TABLE IF NOT EXISTS stations_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
         );
     """)
+    cur.execute("INSERT OR IGNORE INTO stations_version (id, version) VALUES (1, 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_stations_version_{event.lower()}
+            AFTER {event} ON stations
+            BEGIN
+                UPDATE stations_version SET version = version + 1 WHERE id = 1;
+            END;
+        """)
+
+    # Granica archiwum Parquet sensora (app/archive.py, sekundy UTC): pomiary sprzed
+    # archived_before są tylko w plikach archiwum, first_ts/last_ts – skrajne zarchiwizowane
+    # pomiary. Tworzona przed agregatami – rollups.rebuild nie usuwa kubełków z archiwum.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS archive_state (
+            sensor_id INTEGER PRIMARY KEY,
+            archived_before INTEGER NOT NULL,
+            first_ts INTEGER,
+            last_ts INTEGER
+        ) WITHOUT ROWID;
+    """)
+
+    migrate_measurements_unique(conn)
+    ensure_indexes(conn)
+    rollups.create_rollup_tables(conn)
 
     conn.commit()
-    conn.close()
     logger.info("Tabele utworzone lub już istniały")
 
+def _columns(cur, table):
+    cur.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cur.fetchall()}
+
+def _add_column_if_missing(cur, table, column, definition):
+    # Migracja starszych baz: dodaje kolumnę, jeśli tabela jej jeszcze nie ma. Zwraca True, gdy dodano.
+    if column in _columns(cur, table):
+        return False
+    cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    logger.info(f"Dodano kolumnę {table}.{column}")
+    return True
+
+def migrate_measurements_epoch(conn):
+
+    # Migracja schematu: tekstowa kolumna date_time (czas lokalny GIOŚ) → ts INTEGER (sekundy UTC).
+    # Tabela jest przebudowywana jednym INSERT ... SELECT (SQLite nie zmienia typu kolumny
+    # w miejscu); indeksy powstają potem od nowa. Wiersze bez poprawnej daty są pomijane.
+    # Zwraca liczbę przeniesionych wierszy (0, gdy baza ma już nowy schemat).
+
+    cur = conn.cursor()
+    if "date_time" not in _columns(cur, "measurements"):
+        return 0
+    logger.info("Migracja measurements.date_time (tekst) → ts (sekundy UTC)")
+    cur.execute(f"DROP VIEW IF EXISTS {MEASUREMENTS_VIEW}")
+    cur.execute("DROP TABLE IF EXISTS measurements_epoch")
+    cur.execute(MEASUREMENTS_TABLE_SQL.format(table="measurements_epoch"))
+    cur.execute(f"""
+        INSERT INTO measurements_epoch (id, sensor_id, value, ts)
+        SELECT id, sensor_id, value, {timestamps.epoch_sql("date_time")}
+        FROM measurements WHERE unixepoch(date_time) IS NOT NULL
+    """)
+    moved = cur.rowcount
+    cur.execute("DROP TABLE measurements")
+    cur.execute("ALTER TABLE measurements_epoch RENAME TO measurements")
+    logger.info(f"Przeniesiono {moved} pomiarów do nowego schematu")
+    return moved
+
+def _has_index(cur, name):
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,))
+    return cur.fetchone() is not None
+
+def dedupe_measurements(conn):
+    # Usuwa zduplikowane pomiary (sensor_id, ts), zostawiając najnowszy wpis. Zwraca liczbę usuniętych.
+    cur = conn.execute("""
+        DELETE FROM measurements
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM measurements GROUP BY sensor_id, ts
+        )
+    """)
+    return cur.rowcount
+
+def migrate_measurements_unique(conn):
+
+    # Migracja schematu: klucz unikalny (sensor_id, ts) w tabeli measurements.
+    # Istniejące duplikaty są usuwane przed utworzeniem indeksu. Zwraca liczbę usuniętych wierszy.
+
+    cur = conn.cursor()
+    if _has_index(cur, MEASUREMENTS_UNIQUE_INDEX):
+        return 0
+
+    removed = dedupe_measurements(conn)
+    if removed:
+        logger.info(f"Usunięto {removed} zduplikowanych pomiarów")
+    cur.execute(f"""
+        CREATE UNIQUE INDEX IF NOT EXISTS {MEASUREMENTS_UNIQUE_INDEX}
+        ON measurements (sensor_id, ts)
+    """)
+    return removed
+
+def ensure_indexes(conn):
+
+    # Tworzy brakujące indeksy z INDEXES i usuwa przestarzałe indeksy "idx_*",
+    # których już nie ma na liście. Zwraca (utworzone, usunięte).
+
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name GLOB ?",
+                (MANAGED_INDEX_PREFIX + "*",))
+    existing = {row[0] for row in cur.fetchall()}
+
+    created = [name for name in INDEXES if name not in existing]
+    dropped = [name for name in existing if name not in INDEXES]
+    for name in dropped:
+        cur.execute(f"DROP INDEX IF EXISTS {name}")
+    for name in created:
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} {INDEXES[name]}")
+    if created or dropped:
+        logger.info(f"Indeksy: utworzono {created}, usunięto {dropped}")
+    return created, dropped
+
+def compact_database(conn=None):
+
+    # Jednorazowe porządkowanie istniejącej bazy: migracja dat i klucza unikalnego, usunięcie
+    # duplikatów, VACUUM i odświeżenie statystyk planera. Zwraca słownik z podsumowaniem.
+
+    if conn is None:
+        conn = get_connection()
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    pages_before = conn.execute("PRAGMA page_count").fetchone()[0]
+
+    with conn:
+        migrate_measurements_epoch(conn)
+        removed = migrate_measurements_unique(conn) + dedupe_measurements(conn)
+    create_tables(conn)  # brakujące tabele i indeksy zarządzane
+    conn.execute("VACUUM")
+    conn.execute("ANALYZE")
+
+    pages_after = conn.execute("PRAGMA page_count").fetchone()[0]
+    summary = {
+        "removed_rows": removed,
+        "bytes_before": pages_before * page_size,
+        "bytes_after": pages_after * page_size,
+    }
+    logger.info(f"Kompaktowanie bazy zakończone: {summary}")
+    return summary
+
 def insert_station(station):
     logger.info(f"Wstawianie stacji do bazy: {station['stationName']}, ID: {station['id']}")
-    conn = connect()
+    conn = get_connection()
     cur = conn.cursor()
-    cur.execute("""
-        INSERT OR IGNORE INTO stations (id, station_name, city, commune, province, latitude, longitude)
-        VALUES (?, ?, ?, ?, ?, ?, ?);
-    """, (
-        station['id'],
-        station['stationName'],
-        station['city']['name'],
-        station['city']['commune']['communeName'],
-        station['city']['commune']['provinceName'],
-        float(station['gegrLat']),
-        float(station['gegrLon'])
-    ))
+    cur.execute(INSERT_STATION_SQL, station_row(station))
     conn.commit()
-    conn.close()
     logger.info("Stacja dodana (lub już istniała)")
 
 def insert_sensor(sensor, station_id):
     logger.info(f"Wstawianie sensora ID: {sensor['id']} do stacji ID: {station_id}")
-    conn = connect()
+    conn = get_connection()
     cur = conn.cursor()
-    cur.execute("""
-        INSERT OR IGNORE INTO sensors (id, station_id, param_code, param_name)
-        VALUES (?, ?, ?, ?);
-    """, (
-        sensor['id'],
-        station_id,
-        sensor['param']['paramCode'],
-        sensor['param']['paramName']
-    ))
+    cur.execute(INSERT_SENSOR_SQL, sensor_row(sensor, station_id))
     conn.commit()
-    conn.close()
     logger.info("Sensor dodany (lub już istniał)")
 
+def measurement_ts(measurement):
+    # Czas pomiaru w sekundach UTC: "ts" dodane przez app/api_GIOS.py albo przeliczone z "date".
+    ts = measurement.get('ts')
+    return timestamps.parse_local(measurement['date']) if ts is None else ts
+
+def measurement_batch(values):
+    # Pomiary sensora (lista z API) jako tablice NumPy: ts (int64, sekundy UTC) i wartości
+    # (float64, None → NaN). Bez "ts" w słownikach daty są parsowane wektorowo z "date".
+    import numpy as np
+    value = np.array([v['value'] for v in values], dtype=np.float64)
+    try:
+        ts = np.fromiter((v['ts'] for v in values), dtype=np.int64, count=len(values))
+    except KeyError:
+        ts = timestamps.parse_local_many([v['date'] for v in values])
+    return ts, value
+
 def insert_measurement(sensor_id, measurement):
     if measurement['value'] is not None:
         logger.info(f"Dodawanie pomiaru dla sensora ID: {sensor_id}, data: {measurement['date']}, wartość: {measurement['value']}")
-        conn = connect()
+        conn = get_connection()
         cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO measurements (sensor_id, value, date_time)
-            VALUES (?, ?, ?);
-        """, (
+        cur.execute(INSERT_MEASUREMENT_SQL, (
             sensor_id,
             measurement['value'],
-            measurement['date']
+            measurement_ts(measurement)
         ))
         conn.commit()
-        conn.close()
         logger.info("Pomiar dodany")
     else:
         logger.warning(f"Pominięto pomiar bez wartości dla sensora ID: {sensor_id}")
 
+def advance_sync_state(cur, touched):
+    # Przesuwa znaki wodne sensorów do najnowszego zapisanego ts (touched z rollups.track).
+    # Wywoływać w tej samej transakcji co zapis pomiarów.
+    cur.executemany(ADVANCE_SYNC_STATE_SQL, [(sensor_id, hi) for sensor_id, (_, hi) in touched.items()])
+
+def record_sensor_view(sensor_id, conn=None):
+    if conn is None:
+        conn = get_connection()
+    with conn:
+        conn.execute(RECORD_VIEW_SQL, (sensor_id,))
+
+def insert_measurements(sensor_id, measurements):
+    # Zapisuje (upsert) listę pomiarów sensora w jednej transakcji. Zwraca liczbę zapisanych wartości.
+    rows = [(sensor_id, m['value'], measurement_ts(m)) for m in measurements if m['value'] is not None]
+    touched = {}
+    rollups.track(touched, sensor_id, (row[2] for row in rows))
+    conn = get_connection()
+    with conn:
+        conn.executemany(INSERT_MEASUREMENT_SQL, rows)
+        rollups.refresh(conn, touched)
+        advance_sync_state(conn, touched)
+    logger.info(f"Zapisano {len(rows)} pomiarów dla sensora ID: {sensor_id}")
+    return len(rows)
+
 def api():
     return None
 
+def city_key(city_name: str) -> str:
+    # Klucz porównania nazw miast: bez wielkości liter także poza ASCII ("ŁÓDŹ" = "łódź").
+    return city_name.strip().casefold()
+
 # pobieranie listy stacji z bazy danych
-def get_stations_from_db(city_name):
+def get_stations_from_db(city_name, conn=None):
+
+    # Stacje miasta z tabeli stations w formacie odpowiedzi API GIOŚ (station/findAll).
+
     logger.info(f"Pobieranie stacji z bazy danych dla miasta: {city_name}")
-    conn = connect()
+    if conn is None:
+        conn = get_connection()
+    key = city_key(city_name)
     cur = conn.cursor()
-    cur.execute("""
-        SELECT id, station_name, city, latitude, longitude
-        FROM stations
-        WHERE LOWER(city) = LOWER(?)
-    """, (city_name,))
-    rows = cur.fetchall()
-    conn.close()
+    cur.execute(STATIONS_WITH_CITY_SQL)
+    rows = [row for row in cur.fetchall() if city_key(row[2]) == key]
 
     stations = []
-    for row in rows:
+    for station_id, name, city, commune, province, lat, lon, street in rows:
         station = {
-            "id": row[0],
-            "stationName": row[1],
-            "city": {"name": row[2]},
-            "gegrLat": row[3],
-            "gegrLon": row[4],
-            "addressStreet": "(z bazy)"
+            "id": station_id,
+            "stationName": name,
+            "city": {"name": city, "commune": {"communeName": commune, "provinceName": province}},
+            "gegrLat": lat,
+            "gegrLon": lon,
+            "addressStreet": street
         }
         stations.append(station)
     logger.info(f"Znaleziono {len(stations)} stacji w bazie danych")
     return stations
 
 # pobieranie listy sensorów z bazy danych
-def get_sensors_from_db(station_id):
+def get_sensors_from_db(station_id, conn=None):
+
+    # Sensory stacji z tabeli sensors w formacie odpowiedzi API GIOŚ (station/sensors).
+
     logger.info(f"Pobieranie sensorów z bazy danych dla stacji ID: {station_id}")
-    conn = connect()
+    if conn is None:
+        conn = get_connection()
     cur = conn.cursor()
-    cur.execute("""
-        SELECT id, param_code, param_name
-        FROM sensors
-        WHERE station_id = ?
-    """, (station_id,))
+    cur.execute(SENSORS_BY_STATION_SQL, (station_id,))
     rows = cur.fetchall()
-    conn.close()
 
     sensors = []
     for row in rows:
         sensor = {
             "id": row[0],
+            "stationId": station_id,
             "param": {
                 "paramCode": row[1],
                 "paramName": row[2]
@@ -177,10 +578,129 @@ def get_sensors_from_db(station_id):
     logger.info(f"Znaleziono {len(sensors)} sensorów w bazie danych")
     return sensors
 
+def _sql_bound(value, default):
+
+    # Zamienia granicę zakresu (str, date, datetime, Timestamp; czas lokalny) na tekst w formacie GIOŚ.
+
+    if value is None or value == "":
+        return default
+    if not isinstance(value, (date, datetime)):
+        import pandas as pd
+        value = pd.to_datetime(value)
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    return value.strftime(DATE_TIME_FORMAT)
+
+def date_range_params(date_from=None, date_to=None):
+    # Parametry (od, do) tekstowe – dla kubełków agregatów ("bucket >= ? AND bucket <= ?").
+    return _sql_bound(date_from, _MIN_BOUND), _sql_bound(date_to, _MAX_BOUND)
+
+def ts_range_params(date_from=None, date_to=None):
+    # Parametry (od, do) w sekundach UTC – dla pomiarów ("ts >= ? AND ts <= ?").
+    lo, hi = date_range_params(date_from, date_to)
+    return (timestamps.parse_local(lo) if lo != _MIN_BOUND else MIN_TS,
+            timestamps.parse_local(hi) if hi != _MAX_BOUND else MAX_TS)
+
+def get_measurements_range(sensor_id, date_from=None, date_to=None, conn=None):
+
+    # Zwraca DataFrame (date_time, value) tylko z pomiarami z zakresu [date_from, date_to].
+    # Filtrowanie odbywa się w SQL (indeks sensor_id, ts), a na czas lokalny zamieniany jest wynik.
+    # Część zakresu sprzed granicy archiwum jest czytana z plików Parquet (app/archive.py).
+
+    import pandas as pd
+
+    ts, values = measurement_arrays(sensor_id, *ts_range_params(date_from, date_to), conn=conn)
+    df = pd.DataFrame({"date_time": timestamps.to_local_many(ts), "value": values})
+    logger.info(f"Pobrano {len(df)} pomiarów sensora ID: {sensor_id} z zakresu {date_from} - {date_to}")
+    return df
+
+def measurement_arrays(sensor_id, ts_from, ts_to, conn=None):
+
+    # Pomiary sensora z zakresu ts [ts_from, ts_to] jako tablice (ts, wartości) rosnąco po ts:
+    # część sprzed granicy archiwum z plików Parquet, reszta (i spóźnione wiersze) z SQLite.
+
+    import numpy as np
+    import pandas as pd
+
+    if conn is None:
+        conn = get_connection()
+    params = (sensor_id, ts_from, ts_to)
+    bounds = archived_bounds(conn, sensor_id)
+    parts = []
+    query_sqlite = True
+    if bounds is not None and ts_from < bounds[0]:
+        from app import archive
+        parts.append(archive.read_range(sensor_id, ts_from, ts_to, archive.archive_dir(conn)))
+        # Zakres w całości w archiwum (i bez spóźnionych wierszy w SQLite) – bez odczytu z SQLite
+        query_sqlite = ts_to >= bounds[0] or conn.execute(SENSOR_RANGE_EXISTS_SQL, params).fetchone() is not None
+    if query_sqlite:
+        rows = pd.read_sql_query(SENSOR_RANGE_SQL, conn, params=params)
+        parts.append((rows["ts"].to_numpy(dtype=np.int64), rows["value"].to_numpy(dtype=float)))
+    return parts[0] if len(parts) == 1 else _merge_parts(parts)
+
+def _merge_parts(parts):
+    # Scala (ts, wartości) z archiwum i SQLite: sortowanie po ts, dla powtórzonego ts wygrywa
+    # późniejsza część (spóźnione wiersze sprzed granicy archiwum, które trafiły do SQLite).
+    import numpy as np
+    ts = np.concatenate([part[0] for part in parts])
+    values = np.concatenate([part[1] for part in parts])
+    order = np.argsort(ts, kind="stable")
+    ts, values = ts[order], values[order]
+    keep = np.r_[ts[1:] != ts[:-1], True]
+    return ts[keep], values[keep]
+
+def archived_bounds(conn, sensor_id):
+    # (granica archiwum, najstarszy, najnowszy zarchiwizowany pomiar) sensora albo None.
+    return conn.execute(ARCHIVE_BOUNDS_SQL, (sensor_id,)).fetchone()
+
+def get_series(sensor_id, date_from=None, date_to=None, conn=None, min_points=rollups.DEFAULT_MIN_POINTS):
+
+    # Szereg do wykresu/analizy: dla krótkich zakresów surowe pomiary, dla dłuższych
+    # najgrubszy poziom agregatów (godzinowe/dzienne/miesięczne), który daje co najmniej
+    # min_points punktów. Zwraca (DataFrame, poziom) – poziom None oznacza surowe dane,
+    # a DataFrame agregatów ma dodatkowo kolumny min i max kubełków.
+
+    import pandas as pd
+
+    if conn is None:
+        conn = get_connection()
+    level = series_level(sensor_id, date_from, date_to, conn=conn, min_points=min_points)
+    if level is None:
+        return get_measurements_range(sensor_id, date_from, date_to, conn=conn), None
+
+    df = pd.read_sql_query(rollups.range_sql(level), conn,
+                           params=(sensor_id, *date_range_params(date_from, date_to)))
+
+    df["date_time"] = pd.to_datetime(df["date_time"], format=DATE_TIME_FORMAT)
+    logger.info(f"Pobrano {len(df)} punktów ({level}) sensora ID: {sensor_id} z zakresu {date_from} - {date_to}")
+    return df, level
+
+def series_level(sensor_id, date_from=None, date_to=None, conn=None, min_points=rollups.DEFAULT_MIN_POINTS):
+    # Poziom agregatów (lub None – surowe dane) odpowiedni dla zakresu dat sensora.
+    if conn is None:
+        conn = get_connection()
+    return rollups.choose_level(_span_seconds(conn, sensor_id, date_from, date_to), min_points)
+
+def _span_seconds(conn, sensor_id, date_from, date_to):
+    # Długość zakresu w sekundach; otwarte końce są zastępowane skrajnymi pomiarami sensora.
+    import pandas as pd
+    if date_from is None or date_to is None:
+        first, last = conn.execute(
+            "SELECT MIN(ts), MAX(ts) FROM measurements WHERE sensor_id = ?", (sensor_id,)
+        ).fetchone()
+        bounds = archived_bounds(conn, sensor_id)
+        if bounds is not None:
+            first = bounds[1] if first is None else min(first, bounds[1])
+            last = bounds[2] if last is None else max(last, bounds[2])
+        if first is None:
+            return 0
+        date_from = timestamps.to_local_text(first) if date_from is None else date_from
+        date_to = timestamps.to_local_text(last) if date_to is None else date_to
+    return (pd.to_datetime(date_to) - pd.to_datetime(date_from)).total_seconds()
+
 def get_city_names():
-    conn = connect()
+    conn = get_connection()
     cur = conn.cursor()
     cur.execute("SELECT DISTINCT city FROM stations ORDER BY city")
     rows = cur.fetchall()
-    conn.close()
     return [row[0] for row in rows if row[0]]
@@ -0,0 +1,183 @@
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Callable, NamedTuple
+
+from app.constants import CITY_NAMES
+from app.database import city_key, get_connection
+
+log = logging.getLogger(__name__)
+
+# Wyniki geokodowania praktycznie się nie zmieniają – po 90 dniach pytamy ponownie
+CACHE_TTL = 90 * 24 * 3600
+# "Nie znaleziono" pamiętamy krócej (literówki poprawione po stronie OSM itp.)
+NEGATIVE_TTL = 24 * 3600
+# Limit wpisów z geokodera – nadmiar usuwany od najdawniej używanych (LRU)
+MAX_ENTRIES = 5000
+# last_used jest aktualizowane najwyżej raz na tyle sekund – trafienie nie wymaga zapisu
+TOUCH_INTERVAL = 3600
+
+SOURCE_BACKEND = "backend"
+SOURCE_STATIONS = "stations"
+
+
+class GeocodeResult(NamedTuple):
+    latitude: float
+    longitude: float
+    address: str | None = None
+
+
+# Backend: query → GeocodeResult lub None (nie znaleziono). Wyjątek = błąd usługi.
+Backend = Callable[[str], GeocodeResult | None]
+
+
+class NominatimBackend:
+
+    # Geokoder OSM Nominatim z limitem zapytań (polityka Nominatim: 1 zapytanie/s).
+
+    def __init__(self, user_agent: str = "aq-app", min_delay_seconds: float = 1.0, timeout: float = 10):
+        from geopy.extra.rate_limiter import RateLimiter
+        from geopy.geocoders import Nominatim
+
+        self._geocode = RateLimiter(Nominatim(user_agent=user_agent, timeout=timeout).geocode,
+                                    min_delay_seconds=min_delay_seconds, swallow_exceptions=False)
+
+    def __call__(self, query: str) -> GeocodeResult | None:
+        location = self._geocode(query)
+        if location is None:
+            return None
+        return GeocodeResult(location.latitude, location.longitude, location.address)
+
+
+_backend: Backend | None = None
+_backend_lock = threading.Lock()
+
+
+def set_backend(backend: Backend | None) -> None:
+    # Podmienia geokoder (np. atrapa w testach); None przywraca domyślny Nominatim.
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def get_backend() -> Backend:
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = NominatimBackend()
+        return _backend
+
+
+def normalize_query(query: str) -> str:
+    # Klucz cache'u: NFC, bez wielkości liter i nadmiarowych spacji ("  kraków " == "Kraków").
+    return " ".join(unicodedata.normalize("NFC", query).casefold().split())
+
+
+_CITY_KEYS = {normalize_query(name): name for name in CITY_NAMES}
+
+_LOOKUP_SQL = "SELECT latitude, longitude, address, created_at, last_used, source FROM geocode_cache WHERE query = ?"
+
+_STORE_SQL = """
+    INSERT INTO geocode_cache (query, latitude, longitude, address, source, created_at, last_used)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(query) DO UPDATE SET
+        latitude = excluded.latitude, longitude = excluded.longitude, address = excluded.address,
+        source = excluded.source, created_at = excluded.created_at, last_used = excluded.last_used
+"""
+
+# Współrzędne stacji pomiarowych – środek miasta to ich średnia. Grupowanie po mieście
+# w Pythonie (database.city_key), bo LOWER() w SQLite zmienia tylko litery ASCII
+_STATION_COORDS_SQL = """
+    SELECT city, latitude, longitude
+    FROM stations
+    WHERE city IS NOT NULL AND latitude IS NOT NULL AND longitude IS NOT NULL
+"""
+
+
+def _city_centroids(conn: sqlite3.Connection) -> list[tuple[str, float, float]]:
+    # (miasto w pierwszej napotkanej pisowni, średnia szerokość, średnia długość)
+    groups: dict[str, tuple[str, list[float], list[float]]] = {}
+    for city, lat, lon in conn.execute(_STATION_COORDS_SQL):
+        _, lats, lons = groups.setdefault(city_key(city), (city, [], []))
+        lats.append(lat)
+        lons.append(lon)
+    return [(city, sum(lats) / len(lats), sum(lons) / len(lons)) for city, lats, lons in groups.values()]
+
+
+def seed_cities(conn: sqlite3.Connection | None = None) -> int:
+
+    # Wypełnia cache współrzędnymi miast z constants.CITY_NAMES (centroidy ich stacji
+    # z tabeli stations). Wpisy z tego źródła nie podlegają wygasaniu ani LRU.
+    # Zwraca liczbę zapisanych miast.
+
+    if conn is None:
+        conn = get_connection()
+    now = time.time()
+    rows = [
+        (normalize_query(city), lat, lon, _CITY_KEYS[normalize_query(city)], SOURCE_STATIONS, now, now)
+        for city, lat, lon in _city_centroids(conn)
+        if normalize_query(city) in _CITY_KEYS
+    ]
+    with conn:
+        conn.executemany(_STORE_SQL, rows)
+    log.info("Geokodowanie: zapisano współrzędne %d/%d miast", len(rows), len(_CITY_KEYS))
+    return len(rows)
+
+
+def _evict(conn: sqlite3.Connection, max_entries: int) -> None:
+    conn.execute("""
+        DELETE FROM geocode_cache
+        WHERE source = ? AND query NOT IN (
+            SELECT query FROM geocode_cache WHERE source = ? ORDER BY last_used DESC LIMIT ?
+        )
+    """, (SOURCE_BACKEND, SOURCE_BACKEND, max_entries))
+
+
+def geocode(
+        query: str,
+        *,
+        conn: sqlite3.Connection | None = None,
+        backend: Backend | None = None,
+        max_age: float = CACHE_TTL,
+        max_entries: int = MAX_ENTRIES
+) -> GeocodeResult | None:
+
+    # Współrzędne miejsca z lokalnego cache'u; geokoder jest pytany tylko przy braku
+    # lub wygaśnięciu wpisu. Gdy geokoder nie działa, zwracany jest wygasły wpis (jeśli jest).
+    # None oznacza, że miejsca nie znaleziono.
+
+    key = normalize_query(query)
+    if not key:
+        return None
+    if conn is None:
+        conn = get_connection()
+    now = time.time()
+
+    row = conn.execute(_LOOKUP_SQL, (key,)).fetchone()
+    if row is None and key in _CITY_KEYS and seed_cities(conn):
+        row = conn.execute(_LOOKUP_SQL, (key,)).fetchone()
+
+    if row is not None:
+        lat, lon, address, created_at, last_used, source = row
+        ttl = max_age if lat is not None else NEGATIVE_TTL
+        if source == SOURCE_STATIONS or now - created_at <= ttl:
+            if now - last_used > TOUCH_INTERVAL:
+                with conn:
+                    conn.execute("UPDATE geocode_cache SET last_used = ? WHERE query = ?", (now, key))
+            return GeocodeResult(lat, lon, address) if lat is not None else None
+
+    try:
+        result = (backend or get_backend())(query.strip())
+    except Exception:
+        if row is not None and row[0] is not None:
+            log.warning("Geokoder niedostępny – używam wygasłego wpisu dla '%s'", key)
+            return GeocodeResult(row[0], row[1], row[2])
+        raise
+
+    with conn:
+        conn.execute(_STORE_SQL, (key, *(result or (None, None, None)), SOURCE_BACKEND, now, now))
+        _evict(conn, max_entries)
+    log.info("Geokodowanie '%s': %s", key, "nie znaleziono" if result is None else f"{result[0]:.4f}, {result[1]:.4f}")
+    return result
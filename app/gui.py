@@ -1,23 +1,23 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from geopy.geocoders import Nominatim
-from geopy.distance import geodesic
 import logging
 from datetime import datetime, timedelta
-import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import folium
 import tempfile
 import webbrowser
 
 from app.update_db import update_city_measurements
 from app import api_GIOS
 from app.analysis import analyze_measurements_to_text
-from app.database import create_tables, connect, insert_sensor, insert_measurement
+from app.database import (
+    create_tables, get_connection, close_connections, insert_sensor, insert_measurements, get_series,
+    record_sensor_view, city_key, STATIONS_WITH_CITY_SQL
+)
 from app.sensor_selection import get_sensors_for_station
 from app.station_selection import get_stations_in_city
 from app.constants import CITY_NAMES
+from app.tasks import TaskExecutor, TaskCancelled
+from app.geocoding import geocode
+from app import startup
 
 # Logger
 logger = logging.getLogger("AirQualityApp")
@@ -60,6 +60,10 @@ class AirQualityApp:
         self.root.configure(bg=THEME["bg_color"])
         self._setup_style()
 
+        # Operacje sieciowe i zapis do bazy w tle – wątek Tk tylko odbiera wyniki
+        self.tasks = TaskExecutor(root)
+        self.radius_results = []
+
         self.notebook = ttk.Notebook(root)
         self.notebook.pack(fill="both", expand=True)
 
@@ -195,30 +199,40 @@ class AirQualityApp:
         except ValueError:
             return messagebox.showerror("Błąd", "Nieprawidłowy promień")
         loc = self.entry_lokalizacja.get()
-        geo = Nominatim(user_agent="aq-app").geocode(loc)
-        if not geo:
+
+        def search(task):
+            # Geokodowanie (lokalny cache, w razie potrzeby Nominatim) i indeks przestrzenny stacji
+            # (numpy – importowany przy pierwszym wyszukiwaniu, nie przy starcie)
+            from app.spatial import stations_within
+
+            geo = geocode(loc)
+            return None if geo is None else stations_within(geo.latitude, geo.longitude, prom)
+
+        self.tasks.submit(
+            search, name=f"radius:{loc}",
+            on_done=self._show_radius_results,
+            on_error=lambda e: messagebox.showerror("Błąd", f"Nie udało się wyszukać lokalizacji:\n{e}")
+        )
+        return None
+
+    def _show_radius_results(self, results):
+        if results is None:
             return messagebox.showerror("Błąd", "Nie znaleziono lokalizacji")
-        conn = connect(); cur = conn.cursor()
-        cur.execute("SELECT station_name, latitude, longitude FROM stations")
-        rows = cur.fetchall(); conn.close()
-        results = [r for r in rows if geodesic((geo.latitude, geo.longitude),(r[1],r[2])).km <= prom]
+        # Wszystkie trafienia, od najbliższej
+        self.radius_results = results
         self.listbox_wyniki.delete(0, tk.END)
-        if not results:
+        if not self.radius_results:
             return self.listbox_wyniki.insert(tk.END, "Błędna nazwa lub brak stacji w promieniu")
-        for r in results:
-            self.listbox_wyniki.insert(tk.END, f"{r[0]}")
-            return None
+        for _, name, _, km in self.radius_results:
+            self.listbox_wyniki.insert(tk.END, f"{name} ({km:.1f} km)")
         return None
 
     def _on_station_selected_from_radius(self, event):
         sel = self.listbox_wyniki.curselection()
-        if not sel: return
-        name = self.listbox_wyniki.get(sel[0])
-        conn = connect(); cur = conn.cursor()
-        cur.execute("SELECT city FROM stations WHERE station_name=?", (name,))
-        ct = cur.fetchone(); conn.close()
-        if ct: self.city_entry.set(ct[0]); self.fetch_stations()
-        self.root.after(200, lambda: self._select_station_and_fetch(name))
+        if not sel or sel[0] >= len(self.radius_results): return
+        _, name, city, _ = self.radius_results[sel[0]]
+        self.city_entry.set(city)
+        self.fetch_stations(then=lambda: self._select_station_and_fetch(name))
 
     def _select_station_and_fetch(self, station_name):
         for i,val in enumerate(self.station_list["values"]):
@@ -237,7 +251,7 @@ class AirQualityApp:
         # Okno ładowania
         loading_window = tk.Toplevel(self.root)
         loading_window.title("Ładowanie")
-        loading_window.geometry("300x100")
+        loading_window.geometry("300x140")
         loading_window.configure(bg=THEME["bg_color"])
         loading_window.resizable(False, False)
         loading_window.grab_set()  # blokuje interakcje z innymi oknami
@@ -245,9 +259,16 @@ class AirQualityApp:
         label = tk.Label(loading_window, text="Trwa pobieranie danych...", font=THEME["font"], bg=THEME["bg_color"])
         label.pack(pady=10)
 
-        progress = ttk.Progressbar(loading_window, mode='indeterminate')
-        progress.pack(fill='x', padx=20, pady=10)
-        progress.start()
+        # Postęp określony: liczba przetworzonych sensorów z progress_cb
+        progress = ttk.Progressbar(loading_window, mode='determinate', maximum=1)
+        progress.pack(fill='x', padx=20, pady=5)
+
+        cancel_btn = tk.Button(
+            loading_window, text="Anuluj",
+            bg=THEME["btn_bg"], fg=THEME["btn_fg"], activebackground=THEME["btn_active"],
+            font=THEME["font"], relief="flat", bd=0
+        )
+        cancel_btn.pack(pady=5)
 
         # Wyśrodkowanie względem głównego okna
         self.root.update_idletasks()
@@ -255,31 +276,49 @@ class AirQualityApp:
         root_y = self.root.winfo_y()
         root_w = self.root.winfo_width()
         root_h = self.root.winfo_height()
-        win_w, win_h = 300, 100
+        win_w, win_h = 300, 140
         pos_x = root_x + (root_w - win_w) // 2
         pos_y = root_y + (root_h - win_h) // 2
         loading_window.geometry(f"{win_w}x{win_h}+{pos_x}+{pos_y}")
-        self.root.update()
 
-        try:
-            update_city_measurements(city)
-            progress.stop()
+        def close_loading():
             loading_window.grab_release()
             loading_window.destroy()
 
-            self.root.after(100, lambda: self.show_success_window(
-                f"Dane dla miasta '{city}' zostały zaktualizowane.", pos_x, pos_y
-            ))
+        def on_progress(done, total):
+            progress.configure(maximum=max(total, 1), value=done)
+            label.configure(text=f"Pobrano {done}/{total} sensorów...")
 
+        def on_done(inserted):
+            close_loading()
+            self.show_success_window(
+                f"Dane dla miasta '{city}' zostały zaktualizowane ({inserted} nowych pomiarów).", pos_x, pos_y
+            )
             logger.info(f"Pomyślnie zaktualizowano dane dla miasta: {city}")
 
-        except Exception as e:
-            progress.stop()
-            loading_window.grab_release()
-            loading_window.destroy()
+        def on_error(e):
+            close_loading()
+            messagebox.showerror("Błąd", f"Nie udało się zaktualizować danych:\n{e}")
+
+        def on_cancel():
+            # Zapisane partie zostają w bazie (razem z agregatami i znakami wodnymi swoich
+            # sensorów); pozostałe sensory zostaną odpytane przy następnej aktualizacji
+            close_loading()
+            logger.info(f"Anulowano aktualizację danych dla miasta: {city}")
+            messagebox.showinfo("Anulowano", "Aktualizacja została przerwana, zapisano pobrane dotąd pomiary.")
+
+        task = self.tasks.submit(
+            lambda t: update_city_measurements(city, progress_cb=t.progress),
+            name=f"update:{city}",
+            on_done=on_done, on_error=on_error, on_progress=on_progress, on_cancel=on_cancel
+        )
+
+        def cancel():
+            cancel_btn.configure(state="disabled", text="Anulowanie...")
+            task.cancel()
 
-            self.root.after(100, lambda: messagebox.showerror("Błąd", f"Nie udało się zaktualizować danych:\n{e}"))
-            logger.exception("Błąd podczas aktualizacji danych")
+        cancel_btn.configure(command=cancel)
+        loading_window.protocol("WM_DELETE_WINDOW", cancel)
 
     def _add_button(self, parent, text, command, pady=10):
         tk.Button(
@@ -292,6 +331,7 @@ class AirQualityApp:
     def _build_result_tab(self):
         self.canvas_frame = ttk.Frame(self.result_frame)
         self.canvas_frame.pack(fill="both", expand=True)
+        self.chart = None
 
         self.analysis_text = tk.Text(
             self.result_frame, height=8, font=("Courier New", 10),
@@ -299,7 +339,7 @@ class AirQualityApp:
         )
         self.analysis_text.pack(fill="x", padx=10, pady=10)
 
-    def fetch_stations(self):
+    def fetch_stations(self, then=None):
         city = self.city_entry.get()
         logger.info(f"Pobieranie stacji dla miasta: {city}")
 
@@ -314,7 +354,14 @@ class AirQualityApp:
             messagebox.showwarning("Uwaga", "Wpisz nazwę miasta.")
             return
 
-        stations = get_stations_in_city(city)
+        self.tasks.submit(
+            lambda t: get_stations_in_city(city),
+            name=f"stations:{city}",
+            on_done=lambda stations: self._show_stations(city, stations, then),
+            on_error=lambda e: messagebox.showerror("Błąd", f"Nie udało się pobrać stacji:\n{e}")
+        )
+
+    def _show_stations(self, city, stations, then=None):
         if not stations:
             logger.warning(f"Brak stacji dla miasta: {city}")
             messagebox.showinfo("Brak", "Brak takiego miasta lub brak stacji w tym mieście.")
@@ -330,8 +377,10 @@ class AirQualityApp:
         self.station_list["values"] = values
         logger.info(f"Znaleziono {len(values)} stacji w mieście: {city}")
 
+        if then is not None:
+            then()
         # Automatyczneustawienie pierwszej stacji
-        if values:
+        elif values:
             self.station_list.current(0)
             self.selected_station_id = self.stations_map[values[0]]
             self.fetch_sensors()
@@ -346,7 +395,14 @@ class AirQualityApp:
         station_id = self.stations_map[station_name]
         self.selected_station_id = station_id
 
-        sensors = get_sensors_for_station(station_id)
+        self.tasks.submit(
+            lambda t: get_sensors_for_station(station_id),
+            name=f"sensors:{station_id}",
+            on_done=lambda sensors: self._show_sensors(station_name, sensors),
+            on_error=lambda e: messagebox.showerror("Błąd", f"Nie udało się pobrać sensorów:\n{e}")
+        )
+
+    def _show_sensors(self, station_name, sensors):
         if not sensors:
             logger.warning(f"Brak sensorów dla stacji: {station_name}")
             messagebox.showinfo("Brak", "Brak sensorów.")
@@ -362,7 +418,6 @@ class AirQualityApp:
         # AUTOMATYCZNE wybranie pierwszego sensora
         if values:
             self.sensor_list.current(0)
-            selected_sensor = self.sensors_map[values[0]]
             logger.info(f"Automatycznie wybrano sensor: {values[0]}")
 
     def get_data_and_plot(self):
@@ -376,24 +431,44 @@ class AirQualityApp:
         sensor_id = sensor_data["id"]
         station_id = self.selected_station_id
 
-        insert_sensor(sensor_data, station_id)
+        selected_range = self.range_choice.get()
+        days = 10 if "10" in selected_range else 3 if "3" in selected_range else 30
+
+        self.tasks.submit(
+            self._fetch_sensor_data, sensor_data, station_id,
+            name=f"plot:{sensor_id}",
+            on_done=lambda ok: self._plot_after_fetch(sensor_id, days, ok)
+        )
+
+    @staticmethod
+    def _fetch_sensor_data(task, sensor_data, station_id) -> bool:
 
+        # Wątek roboczy: pobranie pomiarów z API i zapis do bazy. Zwraca False przy błędzie API.
+
+        sensor_id = sensor_data["id"]
+        insert_sensor(sensor_data, station_id)
+        record_sensor_view(sensor_id)
         try:
             logger.info(f"Pobieranie danych z API dla sensora ID: {sensor_id}")
             measurements = api_GIOS.get_measurements_for_sensor(sensor_id)
             if not measurements.get("values"):
                 raise ValueError("Brak danych z API")
 
-            for m in measurements["values"]:
-                insert_measurement(sensor_id, m)
+            task.check_cancelled()
+            insert_measurements(sensor_id, measurements["values"])
             logger.info(f"Pobrano i zapisano {len(measurements['values'])} pomiarów.")
+            return True
+        except TaskCancelled:
+            raise
         except Exception as e:
             logger.warning(f"Błąd podczas pobierania danych z API: {e}")
-            if not messagebox.askyesno("Błąd połączenia", "Nie udało się pobrać danych z API. Użyć danych z bazy?"):
-                return
+            return False
+
+    def _plot_after_fetch(self, sensor_id, days, fetched):
+        if not fetched and not messagebox.askyesno(
+                "Błąd połączenia", "Nie udało się pobrać danych z API. Użyć danych z bazy?"):
+            return
 
-        selected_range = self.range_choice.get()
-        days = 10 if "10" in selected_range else 3 if "3" in selected_range else 30
         date_to = datetime.now()
         date_from = date_to - timedelta(days=days)
 
@@ -403,41 +478,36 @@ class AirQualityApp:
         self.notebook.select(self.result_frame)
 
     def show_plot(self, sensor_id, date_from, date_to):
-        for widget in self.canvas_frame.winfo_children():
-            widget.destroy()
-
-        conn = connect()
-        df = pd.read_sql_query("SELECT date_time, value FROM measurements WHERE sensor_id = ? ORDER BY date_time", conn, params=(sensor_id,))
-        conn.close()
-
-        df["date_time"] = pd.to_datetime(df["date_time"], errors='coerce')
-        df.dropna(subset=["date_time"], inplace=True)
-
         try:
-            df = df[(df["date_time"] >= pd.to_datetime(date_from)) & (df["date_time"] <= pd.to_datetime(date_to))]
+            df, level = get_series(sensor_id, date_from, date_to)
         except ValueError:
             logger.error("Nieprawidłowy zakres dat.")
             messagebox.showerror("Błąd", "Nieprawidłowy zakres dat.")
             return
 
+        chart = self._get_chart()
         if df.empty:
+            chart.clear()
             logger.warning("Brak danych w podanym zakresie.")
             messagebox.showinfo("Brak danych", "Brak danych w podanym zakresie.")
             return
 
-        fig, ax = plt.subplots(figsize=(7, 4))
-        ax.plot(df["date_time"], df["value"], marker='o', linestyle='-')
-        ax.set_title(f"Stężenie {self.sensor_list.get()}")
-        ax.set_xlabel("Data")
-        ax.set_ylabel("Wartość [µg/m³]")
-        ax.grid(True, linestyle="--", alpha=0.6)
-        ax.set_facecolor("#f9f9f9")
-        fig.patch.set_facecolor("#f9f9f9")
-        fig.autofmt_xdate()
+        chart.update(
+            df["date_time"].to_numpy(), df["value"].to_numpy(),
+            lo=df["min"].to_numpy() if level else None,
+            hi=df["max"].to_numpy() if level else None,
+            title=f"Stężenie {self.sensor_list.get()}"
+        )
+
+    def _get_chart(self):
+        # Jeden wykres na całą sesję – kolejne serie tylko podmieniają jego dane
+        # (matplotlib ładowany przy pierwszym wykresie, zwykle już wcześniej w tle, startup.preload)
+        if self.chart is None:
+            from app.visualizations.chart import SeriesChart
 
-        canvas = FigureCanvasTkAgg(fig, master=self.canvas_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill="both", expand=True)
+            self.chart = SeriesChart(self.canvas_frame)
+            self.chart.widget.pack(fill="both", expand=True)
+        return self.chart
 
     def show_analysis(self, sensor_id, date_from, date_to):
         logger.info("Generowanie analizy danych")
@@ -452,17 +522,17 @@ class AirQualityApp:
             messagebox.showwarning("Uwaga", "Wpisz nazwę miasta.")
             return
 
-        conn = connect()
-        cur = conn.cursor()
-        cur.execute("SELECT station_name, latitude, longitude FROM stations WHERE LOWER(city) = LOWER(?)", (city,))
-        stations = cur.fetchall()
-        conn.close()
+        cur = get_connection().cursor()
+        cur.execute(STATIONS_WITH_CITY_SQL)
+        stations = [(row[1], row[5], row[6]) for row in cur.fetchall() if city_key(row[2]) == city_key(city)]
 
         if not stations:
             logger.warning(f"Brak stacji w mieście: {city}")
             messagebox.showinfo("Brak", f"Brak stacji w mieście {city}")
             return
 
+        import folium
+
         # Środek mapy: pierwsza stacja
         map_center = [stations[0][1], stations[0][2]]
         fmap = folium.Map(location=map_center, zoom_start=12)
@@ -498,4 +568,14 @@ class AirQualityApp:
 def run_gui_with_tabs():
     root = tk.Tk()
     app = AirQualityApp(root)
-    root.mainloop()
\ No newline at end of file
+
+    def window_ready():
+        # Okno jest już narysowane – ciężkie biblioteki doładowujemy w tle
+        startup.mark("okno gotowe")
+        logger.info(f"Okno gotowe po {startup.elapsed():.2f} s od startu")
+        startup.preload()
+
+    root.after_idle(window_ready)
+    root.mainloop()
+    app.tasks.shutdown()
+    close_connections()
\ No newline at end of file
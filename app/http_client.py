@@ -0,0 +1,257 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+log = logging.getLogger(__name__)
+
+# Liczba równoległych zapytań do GIOŚ (i rozmiar puli połączeń na host)
+DEFAULT_WORKERS = 8
+
+# Limit czasu (nawiązanie połączenia, odczyt odpowiedzi) w sekundach – zawieszone
+# gniazdo nie blokuje już odświeżania w nieskończoność
+DEFAULT_TIMEOUT = (3.05, 20)
+
+# Ponowienia przy błędach przejściowych: opóźnienie losowe z [0, min(MAX, BASE * 2^próba)]
+RETRIES = 3
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 10.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Bezpiecznik endpointu: po tylu kolejnych nieudanych wywołaniach zapytania są odrzucane
+# od razu przez BREAKER_RESET_TIMEOUT sekund, potem przepuszczane jest jedno próbne
+BREAKER_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30.0
+
+_session: requests.Session | None = None
+_pool_size = DEFAULT_WORKERS
+_transport: BaseAdapter | None = None
+_retry_budget: Callable[[], None] | None = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _build_session(pool_size: int) -> requests.Session:
+    session = requests.Session()
+    adapter = _transport or HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+
+    # Wspólna sesja HTTP – połączenia TCP/TLS do hosta GIOŚ są utrzymywane i ponownie używane.
+
+    global _session
+    with _lock:
+        if _session is None:
+            _session = _build_session(_pool_size)
+        return _session
+
+
+def configure(workers: int = DEFAULT_WORKERS) -> None:
+
+    # Ustawia rozmiar puli połączeń (co najmniej tyle, ile wątków pobierających).
+
+    global _session, _pool_size
+    with _lock:
+        _pool_size = max(1, workers)
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def ensure_pool_size(workers: int) -> None:
+
+    # Powiększa pulę połączeń, gdy wątków pobierających jest więcej niż połączeń na host –
+    # inaczej nadmiarowe połączenia są zamykane po każdym zapytaniu. Mniejsza liczba wątków
+    # nie zmienia puli (sesja z otwartymi połączeniami zostaje).
+
+    if workers > _pool_size:
+        configure(workers)
+
+
+def set_transport(adapter: BaseAdapter | None = None) -> None:
+
+    # Podmienia warstwę transportową wspólnej sesji, np. na nagrywanie/odtwarzanie
+    # odpowiedzi (benchmarks/replay.py). None przywraca zwykłe połączenia HTTP.
+
+    global _session, _transport
+    with _lock:
+        _transport = adapter
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+@contextmanager
+def retry_budget(acquire: Callable[[], None]) -> Iterator[None]:
+
+    # W tym bloku każde ponowienie zapytania (z dowolnego wątku) czeka najpierw na acquire(),
+    # np. żeton RequestBudget harmonogramu – ponowienia zużywają ten sam budżet co zapytania.
+    # Pierwszą próbę rozlicza ten, kto zleca zapytanie.
+
+    global _retry_budget
+    previous, _retry_budget = _retry_budget, acquire
+    try:
+        yield
+    finally:
+        _retry_budget = previous
+
+
+@contextmanager
+def cancel_on(event: threading.Event) -> Iterator[None]:
+
+    # Zapytania z tego wątku w tym bloku są przerywane po ustawieniu event: oczekiwanie
+    # na ponowienie kończy się od razu, a kolejna próba nie jest wysyłana (RequestCancelled).
+    # Zapytanie już wysłane kończy się najpóźniej po limicie czasu.
+
+    previous = getattr(_local, "cancel", None)
+    _local.cancel = event
+    try:
+        yield
+    finally:
+        _local.cancel = previous
+
+
+class RequestCancelled(requests.RequestException):
+    # Zapytanie przerwane przed kolejną próbą (cancel_on) – nie liczy się do bezpiecznika.
+    pass
+
+
+class CircuitOpenError(requests.RequestException):
+    # Bezpiecznik endpointu jest otwarty – zapytanie nie zostało wysłane.
+    pass
+
+
+class CircuitBreaker:
+
+    # Stany: zamknięty (zapytania przechodzą), otwarty (odrzucane od razu) i półotwarty
+    # (po reset_timeout jedno próbne zapytanie decyduje, czy zamknąć, czy otworzyć ponownie).
+
+    def __init__(self, name: str, threshold: int = BREAKER_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self._opened_at: float | None = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half-open" if self.clock() - self._opened_at >= self.reset_timeout else "open"
+
+    def before_call(self) -> None:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return
+        raise CircuitOpenError(f"Bezpiecznik '{self.name}' otwarty – pomijam zapytanie")
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                log.info("Bezpiecznik '%s' zamknięty", self.name)
+            self.failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                if self._opened_at is None or self._trial:
+                    log.warning("Bezpiecznik '%s' otwarty po %d błędach", self.name, self.failures)
+                self._opened_at = self.clock()
+            self._trial = False
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def breaker(endpoint: str) -> CircuitBreaker:
+    with _lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker(endpoint)
+        return _breakers[endpoint]
+
+
+def reset_breakers() -> None:
+    with _lock:
+        _breakers.clear()
+
+
+def _retry_delay(attempt: int, response: requests.Response | None) -> float:
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), RETRY_MAX_DELAY)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def request(
+        url: str,
+        *,
+        endpoint: str,
+        headers: dict | None = None,
+        timeout=None,
+        retries: int | None = None
+) -> requests.Response:
+
+    # GET przez wspólną sesję z limitem czasu, ponowieniami błędów przejściowych
+    # (połączenie, timeout, 429/5xx) i bezpiecznikiem endpointu. Zwraca odpowiedź 2xx/304;
+    # w pozostałych przypadkach zgłasza requests.RequestException (CircuitOpenError,
+    # gdy bezpiecznik jest otwarty). Inne błędy 4xx i pozostałe wyjątki nie są ponawiane.
+    # Każda próba, także ponowienie, przechodzi przez bezpiecznik (nieudana liczy się jako
+    # błąd, otwarty bezpiecznik przerywa ponowienia) i budżet ponowień (retry_budget).
+
+    cb = breaker(endpoint)
+    cancel = getattr(_local, "cancel", None)
+    attempts = 1 + (RETRIES if retries is None else retries)
+    for attempt in range(attempts):
+        if cancel is not None and cancel.is_set():
+            raise RequestCancelled(f"{endpoint}: zapytanie przerwane")
+        cb.before_call()
+        budget = _retry_budget
+        if attempt and budget is not None:
+            budget()
+        response = None
+        try:
+            response = get_session().get(url, headers=headers, timeout=timeout or DEFAULT_TIMEOUT)
+            if response.status_code in RETRY_STATUSES:
+                raise requests.HTTPError(f"{response.status_code} dla {url}", response=response)
+            break
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+            cb.record_failure()
+            if attempt + 1 == attempts:
+                raise
+            delay = _retry_delay(attempt, response)
+            log.warning("%s: %s – ponowienie %d/%d za %.2f s", endpoint, e, attempt + 1, attempts - 1, delay)
+            if cancel is not None:
+                cancel.wait(delay)
+            else:
+                time.sleep(delay)
+        except Exception:
+            # Pozostałe błędy (np. ChunkedEncodingError, TooManyRedirects) nie są ponawiane,
+            # ale liczą się do bezpiecznika – inaczej próba w stanie półotwartym nigdy się nie kończy
+            cb.record_failure()
+            raise
+
+    # Serwer odpowiedział – endpoint działa, nawet jeśli zwrócił np. 404
+    cb.record_success()
+    response.raise_for_status()
+    return response
+
@@ -1,6 +1,13 @@
 import logging
-from app import api_GIOS
-from app.database import create_tables, insert_station, insert_sensor, insert_measurement
+import sqlite3
+import time
+
+from app import api_GIOS, metadata, pipeline, rollups
+from app.database import (
+    create_tables, get_connection, station_row, sensor_row, advance_sync_state,
+    INSERT_STATION_SQL, INSERT_SENSOR_SQL, INSERT_MEASUREMENT_SQL
+)
+from app.update_db import new_rows
 
 # Logger setup
 logger = logging.getLogger("FetchSave")
@@ -11,40 +18,199 @@ if not logger.hasHandlers():
     handler.setFormatter(formatter)
     logger.addHandler(handler)
 
+DEFAULT_BATCH_SIZE = 5000
+
+
+class BulkIngestor:
+
+    # Zbiera stacje, sensory i pomiary w partiach i zapisuje je przez executemany
+    # na jednym, długo żyjącym połączeniu. Commit następuje przy flush() – po każdej
+    # stacji albo po przekroczeniu batch_size oczekujących wierszy. Agregaty i znaki
+    # wodne są odświeżane raz na batch_size zapisanych pomiarów i w finish(), a nie
+    # przy każdym commicie stacji.
+
+    def __init__(self, conn: sqlite3.Connection, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.conn = conn
+        self.batch_size = batch_size
+        self._stations = []
+        self._sensors = []
+        self._measurements = []
+        self._touched = {}
+        self._unrefreshed = 0
+        self.rows_written = 0
+        self.commits = 0
+        self._started = time.perf_counter()
+
+    @property
+    def pending(self) -> int:
+        return len(self._stations) + len(self._sensors) + len(self._measurements)
+
+    def add_station(self, station):
+        self._stations.append(station_row(station))
+        self._maybe_flush()
+
+    def add_sensor(self, sensor, station_id):
+        self._sensors.append(sensor_row(sensor, station_id))
+        self._maybe_flush()
+
+    def add_measurements(self, sensor_id, values) -> int:
+
+        # Dodaje pomiary sensora do partii (pomija wartości None). Zwraca liczbę dodanych.
+
+        return self.add_rows(sensor_id, new_rows(sensor_id, values, None))
+
+    def add_rows(self, sensor_id, rows) -> int:
+
+        # Dodaje gotowe wiersze (sensor_id, value, ts) jednego sensora, np. z etapu parsowania potoku.
+
+        self._measurements.extend(rows)
+        rollups.track(self._touched, sensor_id, (row[2] for row in rows))
+        self._maybe_flush()
+        return len(rows)
+
+    def _maybe_flush(self):
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self, refresh: bool = False):
+
+        # Zapisuje oczekujące wiersze w jednej transakcji. Agregaty i znaki wodne sensorów
+        # zapisanych od ostatniego odświeżenia – gdy uzbierało się batch_size pomiarów
+        # albo refresh=True.
+
+        if not self.pending and not (refresh and self._touched):
+            return
+        self._unrefreshed += len(self._measurements)
+        refresh = refresh or self._unrefreshed >= self.batch_size
+        # Kolejność ma znaczenie ze względu na klucze obce: stacje → sensory → pomiary
+        with self.conn:
+            cur = self.conn.cursor()
+            if self._stations:
+                cur.executemany(INSERT_STATION_SQL, self._stations)
+            if self._sensors:
+                cur.executemany(INSERT_SENSOR_SQL, self._sensors)
+            if self._measurements:
+                cur.executemany(INSERT_MEASUREMENT_SQL, self._measurements)
+            if refresh and self._touched:
+                rollups.refresh(cur, self._touched)
+                advance_sync_state(cur, self._touched)
+        self.rows_written += self.pending
+        self.commits += 1
+        self._stations.clear()
+        self._sensors.clear()
+        self._measurements.clear()
+        if refresh:
+            self._touched.clear()
+            self._unrefreshed = 0
+
+    def finish(self):
+        # Zapis reszty partii i odświeżenie agregatów wszystkich jeszcze nieodświeżonych sensorów.
+        self.flush(refresh=True)
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self._started
+        return {
+            "rows": self.rows_written,
+            "commits": self.commits,
+            "seconds": elapsed,
+            "rows_per_sec": self.rows_written / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+def _fetch_station(station) -> list[tuple[dict, dict | None, Exception | None]]:
+
+    # Pobiera sensory stacji i ich pomiary – uruchamiane w wątku pobierającym potoku.
+    # Błąd pobrania listy sensorów jest błędem stacji (nie oznaczamy jej jako zsynchronizowanej).
+    # Błąd pobrania pomiarów sensora jest zwracany obok sensora – nieudane pobranie nie może
+    # wyglądać jak sensor bez danych.
+
+    sensors = api_GIOS.get_sensors_for_station(station["id"], raise_errors=True)
+    fetched = []
+    for sensor in sensors:
+        try:
+            fetched.append((sensor, api_GIOS.get_measurements_for_sensor(sensor["id"], raise_errors=True), None))
+        except Exception as e:
+            fetched.append((sensor, None, e))
+    return fetched
+
+
+def _parse_station(station, fetched: list[tuple[dict, dict | None, Exception | None]]
+                   ) -> list[tuple[dict, list, Exception | None]]:
+    # Etap parsowania potoku: pomiary każdego sensora stacji jako wiersze do zapisu.
+    return [(sensor, new_rows(sensor["id"], (measurements or {}).get("values", []), None), error)
+            for sensor, measurements, error in fetched]
+
+
+def fetch_and_save_all_data(
+        *,
+        conn: sqlite3.Connection | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        commit_per_station: bool = True,
+        workers: int | None = None
+) -> dict:
+
+    # Pobiera wszystkie stacje, sensory i pomiary z GIOŚ i zapisuje je wsadowo.
+    # Pobieranie stacji (workers wątków), parsowanie pomiarów i zapis w bieżącym wątku
+    # działają jednocześnie jako potok (app/pipeline.py). Zwraca statystyki zapisu
+    # (liczba wierszy, commitów, czas, wiersze/s) i metryki etapów potoku ("pipeline").
 
-def fetch_and_save_all_data():
     logger.info("Rozpoczynanie pobierania i zapisywania danych z GIOS")
 
-    create_tables()
+    if conn is None:
+        conn = get_connection()
+    create_tables(conn)
     logger.info("Tabele w bazie danych zostały utworzone (jeśli nie istniały)")
 
     stations = api_GIOS.get_all_stations()
     logger.info(f"Pobrano {len(stations)} stacji z API GIOŚ")
 
-    for station in stations:
-        insert_station(station)
+    ingestor = BulkIngestor(conn, batch_size=batch_size)
+    synced_stations = []
+
+    flow = pipeline.Pipeline(_fetch_station, _parse_station, fetch_workers=workers)
+    for station, parsed, error in flow.run(stations):
+        ingestor.add_station(station)
         station_id = station["id"]
-        logger.info(f"Dodano stację: {station['stationName']} ({station['city']['name']})")
 
-        sensors = api_GIOS.get_sensors_for_station(station_id)
-        if not sensors:
+        if error is not None:
+            logger.error(f"Błąd pobierania danych stacji ID: {station_id}: {error}")
+            continue
+        if not parsed:
             logger.warning(f"Brak sensorów dla stacji ID: {station_id}")
             continue
 
-        for sensor in sensors:
-            insert_sensor(sensor, station_id)
-            sensor_id = sensor["id"]
-            logger.info(f"Dodano sensor: {sensor['param']['paramName']} (ID: {sensor_id})")
-
-            measurements = api_GIOS.get_measurements_for_sensor(sensor_id)
-            count = 0
-            for m in measurements.get("values", []):
-                insert_measurement(sensor_id, m)
-                count += 1
+        count = 0
+        failed = []
+        for sensor, rows, sensor_error in parsed:
+            ingestor.add_sensor(sensor, station_id)
+            if sensor_error is not None:
+                logger.error(f"Błąd pobierania danych z API dla sensora {sensor['id']}: {sensor_error}")
+                failed.append(sensor["id"])
+                continue
+            count += ingestor.add_rows(sensor["id"], rows)
+        # Stacja z nieudanym sensorem nie jest oznaczana jako zsynchronizowana (jak w update_db) –
+        # następne pobranie ją powtórzy
+        if not failed:
+            synced_stations.append(station_id)
 
-            logger.info(f"Zapisano {count} pomiarów dla sensora ID: {sensor_id}")
+        if commit_per_station:
+            ingestor.flush()
+        logger.info(f"Stacja {station['stationName']} ({station['city']['name']}): "
+                    f"{len(parsed)} sensorów, {count} pomiarów")
 
+    ingestor.finish()
+    if stations:
+        # Pełne pobranie odświeża też cache metadanych używany przy wyborze stacji w GUI
+        with conn:
+            metadata.mark_synced(conn, metadata.STATIONS_RESOURCE,
+                                 *(metadata.sensors_resource(sid) for sid in synced_stations))
+    stats = ingestor.stats()
+    stats["pipeline"] = flow.metrics.as_dict()
+    logger.info(f"Potok pobierania: {flow.metrics.summary()}")
+    logger.info(f"Zapisano {stats['rows']} wierszy w {stats['seconds']:.2f} s "
+                f"({stats['rows_per_sec']:.0f} wierszy/s, {stats['commits']} commitów)")
     logger.info("Wszystkie dane zostały pobrane i zapisane do bazy danych.")
+    return stats
 
 
 if __name__ == "__main__":
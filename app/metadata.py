@@ -0,0 +1,166 @@
+import logging
+import sqlite3
+import threading
+import time
+
+import requests
+
+from app import api_GIOS, geocoding
+from app.database import (
+    get_connection, get_stations_from_db, get_sensors_from_db,
+    station_row, sensor_row, INSERT_STATION_SQL, INSERT_SENSOR_SQL
+)
+
+log = logging.getLogger(__name__)
+
+# Po jakim czasie (s) lista stacji / sensory stacji są pobierane z GIOŚ ponownie.
+# Sieć pomiarowa zmienia się rzadko, więc doba w zupełności wystarcza.
+STATIONS_TTL = 24 * 3600
+SENSORS_TTL = 24 * 3600
+
+STATIONS_RESOURCE = "stations"
+
+_refreshing: set[str] = set()
+_refresh_lock = threading.Lock()
+
+
+def sensors_resource(station_id: int) -> str:
+    return f"sensors:{station_id}"
+
+
+def synced_at(conn: sqlite3.Connection, resource: str) -> float | None:
+    row = conn.execute("SELECT synced_at FROM metadata_sync WHERE resource = ?", (resource,)).fetchone()
+    return row[0] if row else None
+
+
+def is_stale(conn: sqlite3.Connection, resource: str, max_age: float, now: float | None = None) -> bool:
+    last = synced_at(conn, resource)
+    return last is None or (now if now is not None else time.time()) - last > max_age
+
+
+def mark_synced(conn: sqlite3.Connection, *resources: str, when: float | None = None) -> None:
+    # Zapisuje czas synchronizacji zasobów (wywoływać w transakcji zapisu metadanych).
+    when = when if when is not None else time.time()
+    conn.executemany(
+        "INSERT INTO metadata_sync (resource, synced_at) VALUES (?, ?) "
+        "ON CONFLICT(resource) DO UPDATE SET synced_at = excluded.synced_at",
+        [(resource, when) for resource in resources]
+    )
+
+
+def invalidate(conn: sqlite3.Connection | None = None) -> None:
+    # Unieważnia cały cache – następne odczyty pobiorą metadane z GIOŚ.
+    if conn is None:
+        conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM metadata_sync")
+
+
+def refresh_stations(conn: sqlite3.Connection | None = None) -> int:
+
+    # Pobiera pełną listę stacji z GIOŚ i nadpisuje nią tabelę stations.
+    # Błąd pobrania (i pusta lista) nie zmienia cache'u. Zwraca liczbę zapisanych stacji.
+
+    if conn is None:
+        conn = get_connection()
+    try:
+        stations = api_GIOS.get_all_stations(raise_errors=True)
+    except requests.RequestException as e:
+        log.warning("Nie udało się odświeżyć listy stacji (%s) – używam danych z bazy", e)
+        return 0
+    if not stations:
+        log.warning("GIOŚ zwrócił pustą listę stacji – używam danych z bazy")
+        return 0
+    with conn:
+        conn.executemany(INSERT_STATION_SQL, [station_row(s) for s in stations])
+        mark_synced(conn, STATIONS_RESOURCE)
+    # Środki miast z CITY_NAMES w cache'u geokodowania liczone są ze współrzędnych stacji
+    geocoding.seed_cities(conn)
+    log.info("Odświeżono metadane %d stacji", len(stations))
+    return len(stations)
+
+
+def refresh_sensors(station_id: int, conn: sqlite3.Connection | None = None) -> int:
+
+    # Jak refresh_stations, dla sensorów jednej stacji. Stacja bez sensorów to poprawna
+    # odpowiedź – jest zapamiętywana; cache zostaje bez zmian tylko przy błędzie pobrania.
+
+    if conn is None:
+        conn = get_connection()
+    try:
+        sensors = api_GIOS.get_sensors_for_station(station_id, raise_errors=True)
+    except requests.RequestException as e:
+        log.warning("Nie udało się odświeżyć sensorów stacji %d (%s) – używam danych z bazy", station_id, e)
+        return 0
+    with conn:
+        conn.executemany(INSERT_SENSOR_SQL, [sensor_row(s, station_id) for s in sensors])
+        mark_synced(conn, sensors_resource(station_id))
+    log.info("Odświeżono metadane %d sensorów stacji %d", len(sensors), station_id)
+    return len(sensors)
+
+
+def _refresh_later(resource: str, fn, *args) -> None:
+
+    # Odświeżenie w tle (stale-while-revalidate) – najwyżej jedno naraz dla danego zasobu.
+    # Wątek korzysta z własnego połączenia z puli.
+
+    with _refresh_lock:
+        if resource in _refreshing:
+            return
+        _refreshing.add(resource)
+
+    def run():
+        try:
+            fn(*args)
+        except Exception:
+            log.exception("Błąd odświeżania metadanych: %s", resource)
+        finally:
+            with _refresh_lock:
+                _refreshing.discard(resource)
+
+    threading.Thread(target=run, name=f"metadata-{resource}", daemon=True).start()
+
+
+def get_stations_in_city(
+        city_name: str,
+        *,
+        conn: sqlite3.Connection | None = None,
+        max_age: float = STATIONS_TTL
+) -> list[dict]:
+
+    # Stacje miasta z lokalnej bazy. Z GIOŚ pobierana jest tylko przeterminowana lista:
+    # jeśli w bazie są już stacje miasta, zwracamy je od razu, a odświeżenie idzie w tle
+    # (tylko przy połączeniu z puli, czyli conn=None); bez danych w bazie – synchronicznie.
+
+    background = conn is None
+    if conn is None:
+        conn = get_connection()
+    stations = get_stations_from_db(city_name, conn=conn)
+    if is_stale(conn, STATIONS_RESOURCE, max_age):
+        if stations and background:
+            _refresh_later(STATIONS_RESOURCE, refresh_stations)
+        elif refresh_stations(conn):
+            stations = get_stations_from_db(city_name, conn=conn)
+    return stations
+
+
+def get_sensors_for_station(
+        station_id: int,
+        *,
+        conn: sqlite3.Connection | None = None,
+        max_age: float = SENSORS_TTL
+) -> list[dict]:
+
+    # Sensory stacji z lokalnej bazy, odświeżane z GIOŚ na tych samych zasadach co stacje.
+
+    background = conn is None
+    if conn is None:
+        conn = get_connection()
+    resource = sensors_resource(station_id)
+    sensors = get_sensors_from_db(station_id, conn=conn)
+    if is_stale(conn, resource, max_age):
+        if sensors and background:
+            _refresh_later(resource, refresh_sensors, station_id)
+        elif refresh_sensors(station_id, conn):
+            sensors = get_sensors_from_db(station_id, conn=conn)
+    return sensors
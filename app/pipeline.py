@@ -0,0 +1,247 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Generic, Iterable, Iterator, TypeVar
+
+from app import http_client
+
+log = logging.getLogger(__name__)
+
+# Potok pobierania: wątki pobierające (sieć) → wątki parsujące (wybór nowych pomiarów)
+# → zapis w wątku wywołującego (połączenie SQLite zostaje w swoim wątku, jeden pisarz).
+# Etapy łączą kolejki o ograniczonej pojemności: gdy zapis nie nadąża, parsowanie czeka
+# na miejsce w kolejce, a pobieranie na parsowanie (backpressure) – w pamięci jest
+# najwyżej queue_size wyników na kolejkę, a sieć, CPU i dysk pracują jednocześnie.
+#
+# Metryki etapów (elementy, czas pracy, wykorzystanie wątków, czas blokady na pełnej
+# kolejce) i kolejek (średnia i maksymalna głębokość) pokazują wąskie gardło: pełne
+# kolejki przed zapisem – dysk, puste przy zajętych wątkach pobierających – sieć.
+
+DEFAULT_PARSE_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 32
+
+# Co ile sekund zablokowany wątek sprawdza, czy potok nie został przerwany
+_POLL_INTERVAL = 0.1
+
+K = TypeVar("K")
+F = TypeVar("F")
+P = TypeVar("P")
+
+_DONE = object()
+
+
+class StageMetrics:
+
+    # Licznik jednego etapu; aktualizowany z wielu wątków.
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, busy: float, blocked: float = 0.0, error: bool = False) -> None:
+        with self._lock:
+            self.items += 1
+            self.errors += error
+            self.busy_seconds += busy
+            self.blocked_seconds += blocked
+
+    def as_dict(self, elapsed: float) -> dict:
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "errors": self.errors,
+            "busy_s": self.busy_seconds,
+            "blocked_s": self.blocked_seconds,
+            "items_per_s": self.items / elapsed if elapsed > 0 else 0.0,
+            "utilization": self.busy_seconds / (self.workers * elapsed) if elapsed > 0 else 0.0,
+        }
+
+
+class QueueMetrics:
+
+    # Głębokość kolejki próbkowana przy każdym włożeniu elementu.
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = capacity
+        self.samples = 0
+        self.total_depth = 0
+        self.max_depth = 0
+        self._lock = threading.Lock()
+
+    def sample(self, depth: int) -> None:
+        with self._lock:
+            self.samples += 1
+            self.total_depth += depth
+            self.max_depth = max(self.max_depth, depth)
+
+    def as_dict(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "mean_depth": self.total_depth / self.samples if self.samples else 0.0,
+            "max_depth": self.max_depth,
+        }
+
+
+class PipelineMetrics:
+
+    def __init__(self):
+        self.stages: dict[str, StageMetrics] = {}
+        self.queues: dict[str, QueueMetrics] = {}
+        self.seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "seconds": self.seconds,
+            "stages": {name: stage.as_dict(self.seconds) for name, stage in self.stages.items()},
+            "queues": {name: q.as_dict() for name, q in self.queues.items()},
+        }
+
+    def bottleneck(self) -> str | None:
+        # Etap o największym wykorzystaniu wątków (czas pracy / (wątki × czas potoku)).
+        if not self.stages or self.seconds <= 0:
+            return None
+        return max(self.stages.values(), key=lambda s: s.busy_seconds / s.workers).name
+
+    def summary(self) -> str:
+        # Jednowierszowe podsumowanie do logu/CLI.
+        summary = self.as_dict()
+        parts = [f"{name}: {s['items']} ({s['items_per_s']:.1f}/s, wykorzystanie {s['utilization']:.0%})"
+                 for name, s in summary["stages"].items()]
+        parts += [f"kolejka {name}: śr. {q['mean_depth']:.1f}, maks. {q['max_depth']}/{q['capacity']}"
+                  for name, q in summary["queues"].items()]
+        return "; ".join(parts) + f" – wąskie gardło: {self.bottleneck() or '-'}"
+
+
+class Pipeline(Generic[K, F, P]):
+
+    # fetch(key) → wynik pobrania (wątki fetch), parse(key, wynik) → wynik dla pisarza
+    # (wątki parse). run(keys) zwraca (key, wynik parse, wyjątek) w kolejności ukończenia;
+    # wyjątek pobrania albo parsowania nie przerywa potoku.
+    # Czas między kolejnymi elementami po stronie wywołującego liczy się jako etap "write".
+
+    def __init__(
+            self,
+            fetch: Callable[[K], F],
+            parse: Callable[[K, F], P],
+            *,
+            fetch_workers: int | None = None,
+            parse_workers: int = DEFAULT_PARSE_WORKERS,
+            queue_size: int = DEFAULT_QUEUE_SIZE,
+            metrics: PipelineMetrics | None = None
+    ):
+        self.fetch = fetch
+        self.parse = parse
+        self.fetch_workers = max(1, fetch_workers or http_client.DEFAULT_WORKERS)
+        self.parse_workers = max(1, parse_workers)
+        self.queue_size = queue_size
+        self.metrics = metrics if metrics is not None else PipelineMetrics()
+
+    def run(self, keys: Iterable[K]) -> Iterator[tuple[K, P | None, Exception | None]]:
+        keys = list(keys)
+        metrics = self.metrics
+        fetch_stage = metrics.stages["fetch"] = StageMetrics("fetch", min(self.fetch_workers, max(len(keys), 1)))
+        parse_stage = metrics.stages["parse"] = StageMetrics("parse", self.parse_workers)
+        write_stage = metrics.stages["write"] = StageMetrics("write", 1)
+        fetched_q = metrics.queues["fetched"] = QueueMetrics("fetched", self.queue_size)
+        parsed_q = metrics.queues["parsed"] = QueueMetrics("parsed", self.queue_size)
+        http_client.ensure_pool_size(fetch_stage.workers)
+        started = time.perf_counter()
+
+        todo: queue.SimpleQueue = queue.SimpleQueue()
+        for key in keys:
+            todo.put(key)
+        fetched: queue.Queue = queue.Queue(self.queue_size)
+        parsed: queue.Queue = queue.Queue(self.queue_size)
+        stop = threading.Event()
+        remaining = {"fetch": fetch_stage.workers, "parse": parse_stage.workers}
+        remaining_lock = threading.Lock()
+
+        def put(target: queue.Queue, q_metrics: QueueMetrics, item) -> float:
+            # Wkłada element, czekając na miejsce (backpressure). Zwraca czas blokady.
+            start = time.perf_counter()
+            while not stop.is_set():
+                try:
+                    target.put(item, timeout=_POLL_INTERVAL)
+                    q_metrics.sample(target.qsize())
+                    break
+                except queue.Full:
+                    continue
+            return time.perf_counter() - start
+
+        def finish(stage: str, target: queue.Queue, q_metrics: QueueMetrics, consumers: int) -> None:
+            # Ostatni wątek etapu przekazuje znacznik końca każdemu konsumentowi.
+            with remaining_lock:
+                remaining[stage] -= 1
+                last = remaining[stage] == 0
+            if last:
+                for _ in range(consumers):
+                    put(target, q_metrics, _DONE)
+
+        def fetch_worker():
+            # Zapytania HTTP tego wątku są przerywane razem z potokiem (oczekiwanie na ponowienie)
+            with http_client.cancel_on(stop):
+                while not stop.is_set():
+                    try:
+                        key = todo.get_nowait()
+                    except queue.Empty:
+                        break
+                    start = time.perf_counter()
+                    try:
+                        item = (key, self.fetch(key), None)
+                    except Exception as e:
+                        item = (key, None, e)
+                    busy = time.perf_counter() - start
+                    fetch_stage.record(busy, put(fetched, fetched_q, item), item[2] is not None)
+            finish("fetch", fetched, fetched_q, parse_stage.workers)
+
+        def parse_worker():
+            while not stop.is_set():
+                try:
+                    item = fetched.get(timeout=_POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    break
+                key, result, error = item
+                if error is not None:
+                    # Błąd pobrania przechodzi do pisarza bez parsowania
+                    put(parsed, parsed_q, item)
+                    continue
+                start = time.perf_counter()
+                try:
+                    item = (key, self.parse(key, result), None)
+                except Exception as e:
+                    item = (key, None, e)
+                busy = time.perf_counter() - start
+                parse_stage.record(busy, put(parsed, parsed_q, item), item[2] is not None)
+            finish("parse", parsed, parsed_q, 1)
+
+        threads = [threading.Thread(target=fetch_worker, name=f"pipeline-fetch-{i}", daemon=True)
+                   for i in range(fetch_stage.workers)]
+        threads += [threading.Thread(target=parse_worker, name=f"pipeline-parse-{i}", daemon=True)
+                    for i in range(parse_stage.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                item = parsed.get()
+                if item is _DONE:
+                    break
+                start = time.perf_counter()
+                yield item
+                write_stage.record(time.perf_counter() - start, error=item[2] is not None)
+        finally:
+            # Przerwanie iteracji (np. anulowanie zadania GUI) zatrzymuje wątki – zapytania
+            # jeszcze niewysłane są porzucane, oczekujące na ponowienie przerywane
+            # (http_client.cancel_on), a wysłane kończą się przed powrotem
+            stop.set()
+            for thread in threads:
+                thread.join()
+            metrics.seconds = time.perf_counter() - started
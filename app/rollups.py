@@ -0,0 +1,219 @@
+import logging
+import sqlite3
+from typing import Iterable
+
+from app import timestamps
+
+log = logging.getLogger(__name__)
+
+# Poziomy agregacji: nazwa → (tabela, długość kubełka w sekundach, format początku kubełka,
+# jednostka kalendarza dla timestamps.local_floor). Od najdrobniejszego do najgrubszego.
+# Kubełki to tekst czasu lokalnego – doba i miesiąc zaczynają się o północy w Polsce.
+LEVELS = {
+    "hourly": ("measurements_hourly", 3600, "%Y-%m-%d %H:00:00", "hour"),
+    "daily": ("measurements_daily", 86400, "%Y-%m-%d 00:00:00", "day"),
+    "monthly": ("measurements_monthly", 30 * 86400, "%Y-%m-01 00:00:00", "month"),
+}
+
+# Wykres/analiza korzysta z najgrubszego poziomu, który daje co najmniej tyle punktów
+DEFAULT_MIN_POINTS = 100
+
+# Rozdzielczość surowych pomiarów GIOŚ (s) – poziom o kubełkach nie dłuższych niż ona
+# niczego nie zmniejsza, a odbiera analizie percentyle liczone z surowych wierszy
+SOURCE_RESOLUTION = 3600
+
+_CREATE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        sensor_id INTEGER NOT NULL,
+        bucket TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        min REAL,
+        max REAL,
+        sum REAL,
+        sumsq REAL,
+        PRIMARY KEY (sensor_id, bucket)
+    ) WITHOUT ROWID
+"""
+
+# Przeliczenie kubełków jednego sensora w zakresie ts [początek kubełka najstarszego pomiaru,
+# początek kubełka po najnowszym) – granice liczone w Pythonie (refresh), filtr po indeksie.
+_REFRESH_SQL = """
+    INSERT OR REPLACE INTO {table} (sensor_id, bucket, count, min, max, sum, sumsq)
+    SELECT sensor_id, bucket, COUNT(*), MIN(value), MAX(value), SUM(value), SUM(value * value)
+    FROM (
+        SELECT sensor_id, value, strftime('{fmt}', {local}) AS bucket
+        FROM measurements
+        WHERE sensor_id = ? AND ts >= ? AND ts < ? AND value IS NOT NULL
+    )
+    GROUP BY sensor_id, bucket
+"""
+
+# Pomiary sprzed granicy archiwum (spóźnione wiersze) są pomijane – ich kubełki przelicza
+# _refresh_archived ze scalonego szeregu archiwum + SQLite
+_REBUILD_SQL = """
+    INSERT OR REPLACE INTO {table} (sensor_id, bucket, count, min, max, sum, sumsq)
+    SELECT sensor_id, bucket, COUNT(*), MIN(value), MAX(value), SUM(value), SUM(value * value)
+    FROM (
+        SELECT m.sensor_id, m.value, strftime('{fmt}', {local}) AS bucket
+        FROM measurements m
+        WHERE m.value IS NOT NULL AND NOT EXISTS (
+            SELECT 1 FROM archive_state a WHERE a.sensor_id = m.sensor_id AND m.ts < a.archived_before
+        )
+    )
+    GROUP BY sensor_id, bucket
+"""
+
+_UPSERT_SQL = """
+    INSERT OR REPLACE INTO {table} (sensor_id, bucket, count, min, max, sum, sumsq)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Granica archiwum Parquet sensora (app/archive.py)
+_ARCHIVED_BEFORE_SQL = "SELECT archived_before FROM archive_state WHERE sensor_id = ?"
+
+# Sensory ze spóźnionymi pomiarami sprzed granicy archiwum i ich zakres ts
+_LATE_ROWS_SQL = """
+    SELECT m.sensor_id, MIN(m.ts), MAX(m.ts)
+    FROM measurements m
+    JOIN archive_state a ON a.sensor_id = m.sensor_id
+    WHERE m.ts < a.archived_before
+    GROUP BY m.sensor_id
+"""
+
+_LOCAL_TS = timestamps.local_text_sql("ts")
+_LOCAL_M_TS = timestamps.local_text_sql("m.ts")
+
+# Szereg z poziomu agregacji: średnia kubełka jako wartość, min/max zachowują szczyty.
+# Pusta dolna granica ("" – od początku historii) daje w strftime NULL, stąd COALESCE
+ROLLUP_RANGE_SQL = """
+    SELECT bucket AS date_time, sum / count AS value, min, max
+    FROM {table}
+    WHERE sensor_id = ? AND bucket >= COALESCE(strftime('{fmt}', ?), '') AND bucket <= ?
+    ORDER BY bucket
+"""
+
+
+def create_rollup_tables(conn: sqlite3.Connection) -> bool:
+
+    # Tworzy tabele agregatów. Jeśli powstały teraz, a surowe pomiary już są w bazie,
+    # wypełnia je w całości. Zwraca True, gdy tabele zostały utworzone.
+
+    cur = conn.cursor()
+    tables = [table for table, *_ in LEVELS.values()]
+    cur.execute(f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ({','.join('?' * len(tables))})",
+                tables)
+    created = cur.fetchone()[0] < len(tables)
+    for table in tables:
+        cur.execute(_CREATE_SQL.format(table=table))
+    if created:
+        rebuild(conn)
+    return created
+
+
+# Kubełki sprzed granicy archiwum (app/archive.py) nie mają już surowych pomiarów w SQLite –
+# pełne przeliczenie ich nie usuwa. Granica jest wyrównana do miesiąca, więc kubełek
+# każdego poziomu leży w całości po jednej jej stronie.
+_DELETE_UNARCHIVED_SQL = """
+    DELETE FROM {table}
+    WHERE NOT EXISTS (
+        SELECT 1 FROM archive_state a
+        WHERE a.sensor_id = {table}.sensor_id AND {table}.bucket < {archived_before}
+    )
+"""
+
+
+def rebuild(conn: sqlite3.Connection) -> None:
+    # Pełne przeliczenie wszystkich poziomów z tabeli measurements (poza zarchiwizowanymi kubełkami).
+    for name, (table, _, fmt, _) in LEVELS.items():
+        conn.execute(_DELETE_UNARCHIVED_SQL.format(
+            table=table, archived_before=timestamps.local_text_sql("a.archived_before")))
+        conn.execute(_REBUILD_SQL.format(table=table, fmt=fmt, local=_LOCAL_M_TS))
+        log.info("Przeliczono agregaty %s", name)
+    late = {sensor_id: (lo, hi) for sensor_id, lo, hi in conn.execute(_LATE_ROWS_SQL).fetchall()}
+    if late:
+        refresh(conn, late)
+
+
+def refresh(cur: sqlite3.Cursor | sqlite3.Connection, touched: dict[int, tuple[int, int]]) -> None:
+
+    # Przyrostowa aktualizacja agregatów tylko dla kubełków, w które trafiły nowe pomiary.
+    # touched: sensor_id → (najstarszy, najnowszy) ts zapisanych pomiarów.
+    # Wywoływać w tej samej transakcji co zapis pomiarów. Kubełki sprzed granicy archiwum
+    # (spóźnione pomiary) są przeliczane ze scalonego szeregu archiwum + SQLite – samo SQLite
+    # nadpisałoby je statystykami kilku spóźnionych wierszy. Granica jest wyrównana do
+    # miesiąca, więc kubełek każdego poziomu leży w całości po jednej jej stronie.
+
+    current = {}
+    for sensor_id, (lo, hi) in touched.items():
+        row = cur.execute(_ARCHIVED_BEFORE_SQL, (sensor_id,)).fetchone()
+        if row is not None and lo < row[0]:
+            _refresh_archived(cur, sensor_id, lo, min(hi, row[0] - 1), row[0])
+            if hi < row[0]:
+                continue
+            lo = row[0]
+        current[sensor_id] = (lo, hi)
+
+    for name, (table, _, fmt, unit) in LEVELS.items():
+        sql = _REFRESH_SQL.format(table=table, fmt=fmt, local=_LOCAL_TS)
+        cur.executemany(sql, [
+            (sensor_id, timestamps.local_floor(lo, unit), timestamps.local_next(hi, unit))
+            for sensor_id, (lo, hi) in current.items()
+        ])
+
+
+def _refresh_archived(cur: sqlite3.Cursor | sqlite3.Connection, sensor_id: int, lo: int, hi: int,
+                      archived_before: int) -> None:
+
+    # Przelicza kubełki miesięcy [lo, hi] sprzed granicy archiwum z pomiarów archiwum
+    # i SQLite (database.measurement_arrays – spóźniony wiersz wygrywa z archiwum).
+
+    import numpy as np
+
+    from app import database
+
+    conn = getattr(cur, "connection", cur)
+    ts_from = timestamps.local_floor(lo, "month")
+    ts_to = min(timestamps.local_next(hi, "month"), archived_before) - 1
+    ts, values = database.measurement_arrays(sensor_id, ts_from, ts_to, conn=conn)
+    keep = ~np.isnan(values)
+    ts, values = ts[keep].tolist(), values[keep].tolist()
+    for name, (table, _, _, unit) in LEVELS.items():
+        buckets: dict[int, list[float]] = {}
+        for t, value in zip(ts, values):
+            buckets.setdefault(timestamps.local_floor(t, unit), []).append(value)
+        cur.executemany(_UPSERT_SQL.format(table=table), [
+            (sensor_id, timestamps.to_local_text(start), len(vs), min(vs), max(vs), sum(vs), sum(v * v for v in vs))
+            for start, vs in buckets.items()
+        ])
+    log.info("Przeliczono agregaty zarchiwizowanych miesięcy sensora %d (spóźnione pomiary)", sensor_id)
+
+
+def track(touched: dict[int, tuple[int, int]], sensor_id: int, stamps: Iterable[int]) -> None:
+    # Rozszerza zakres (min, max) ts zapisanych dla sensora.
+    stamps = list(stamps)
+    if not stamps:
+        return
+    lo, hi = min(stamps), max(stamps)
+    if sensor_id in touched:
+        old_lo, old_hi = touched[sensor_id]
+        lo, hi = min(lo, old_lo), max(hi, old_hi)
+    touched[sensor_id] = (lo, hi)
+
+
+def choose_level(span_seconds: float, min_points: int = DEFAULT_MIN_POINTS,
+                 source_seconds: float = SOURCE_RESOLUTION) -> str | None:
+
+    # Najgrubszy poziom agregacji, który dla zakresu o danej długości daje co najmniej
+    # min_points punktów. Tylko poziomy grubsze niż surowe dane (source_seconds) – dla
+    # pomiarów godzinowych nigdy "hourly". None oznacza surowe pomiary (krótkie zakresy).
+
+    for name in reversed(LEVELS):
+        seconds = LEVELS[name][1]
+        if seconds > source_seconds and span_seconds / seconds >= min_points:
+            return name
+    return None
+
+
+def range_sql(level: str) -> str:
+    table, _, fmt, _ = LEVELS[level]
+    return ROLLUP_RANGE_SQL.format(table=table, fmt=fmt)
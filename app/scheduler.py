@@ -0,0 +1,225 @@
+import heapq
+import logging
+import math
+import sqlite3
+import threading
+import time
+
+from app import http_client, metadata, update_db
+from app.database import get_connection
+
+log = logging.getLogger(__name__)
+
+# GIOŚ publikuje pomiary co godzinę – docelowy odstęp między odpytaniami sensora
+BASE_INTERVAL = 3600
+# Najczęściej oglądane sensory: nie częściej niż co tyle sekund
+MIN_INTERVAL = update_db.MIN_FETCH_INTERVAL
+# Górna granica odstępu po serii nieudanych/pustych odpytań
+MAX_BACKOFF = 6 * 3600
+# Globalny budżet zapytań do GIOŚ
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_WORKERS = 4
+# Co ile sekund lista sensorów i liczniki wyświetleń są czytane z bazy ponownie
+RELOAD_INTERVAL = 15 * 60
+
+# Wszystkie sensory z ich ostatnim pobraniem i licznikiem wyświetleń w GUI
+_SENSORS_SQL = """
+    SELECT s.id, st.last_fetch, COALESCE(st.views, 0)
+    FROM sensors s
+    LEFT JOIN sensor_sync_state st ON st.sensor_id = s.id
+"""
+
+
+class SystemClock:
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+
+class RequestBudget:
+
+    # Kubełek żetonów: rate zapytań na sekundę, najwyżej burst naraz. Bezpieczny dla wątków –
+    # ponowienia zapytań z wątków pobierających zużywają żetony przez http_client.retry_budget.
+
+    def __init__(self, rate: float, burst: int, clock):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._tokens = float(burst)
+        self._updated = clock.time()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock.time()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def acquire(self) -> None:
+        # Czeka (wg zegara) na żeton i go zużywa.
+        while not self.try_acquire():
+            self.clock.sleep(self.wait_time())
+
+    def wait_time(self) -> float:
+        # Sekundy do pojawienia się następnego żetonu (0 – dostępny od razu).
+        with self._lock:
+            self._refill()
+            return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+
+class RefreshScheduler:
+
+    # Harmonogram odświeżania wszystkich sensorów w kraju. Kolejka priorytetowa (kopiec)
+    # jest uporządkowana po terminie następnego odpytania: termin = ostatnie pobranie +
+    # odstęp, a odstęp skraca się z liczbą wyświetleń sensora w GUI. Przy zaległościach
+    # (budżet nie nadąża) najpierw idą więc sensory najbardziej spóźnione względem swojego
+    # odstępu, a popularne wcześniej od rzadko oglądanych. Każde odpytanie zużywa żeton
+    # z globalnego budżetu, a każde ponowienie po błędzie – kolejny; błędy i odpowiedzi bez nowych danych wydłużają odstęp
+    # wykładniczo (do MAX_BACKOFF), pierwsza udana odpowiedź z danymi go resetuje.
+
+    def __init__(
+            self,
+            conn: sqlite3.Connection | None = None,
+            *,
+            clock=None,
+            requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+            workers: int = DEFAULT_WORKERS,
+            base_interval: float = BASE_INTERVAL,
+            min_interval: float = MIN_INTERVAL,
+            max_backoff: float = MAX_BACKOFF,
+            reload_interval: float = RELOAD_INTERVAL,
+            sync_metadata: bool = True
+    ):
+        self.conn = conn if conn is not None else get_connection()
+        self.clock = clock or SystemClock()
+        self.workers = workers
+        self.budget = RequestBudget(requests_per_minute / 60, burst=max(workers, 1), clock=self.clock)
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_backoff = max_backoff
+        self.reload_interval = reload_interval
+        self.sync_metadata = sync_metadata
+
+        self._heap: list[tuple[float, int]] = []
+        self._due: dict[int, float] = {}
+        self._views: dict[int, int] = {}
+        self._streak: dict[int, int] = {}
+        self._next_reload = -math.inf
+        self.fetched = 0
+
+    def interval(self, sensor_id: int) -> float:
+        # Odstęp docelowy: krótszy dla oglądanych sensorów, dłuższy po serii niepowodzeń.
+        views = self._views.get(sensor_id, 0)
+        interval = max(self.min_interval, self.base_interval / (1 + math.log2(1 + views)))
+        return min(interval * 2 ** self._streak.get(sensor_id, 0), max(self.max_backoff, interval))
+
+    def _schedule(self, sensor_id: int, due: float) -> None:
+        self._due[sensor_id] = due
+        heapq.heappush(self._heap, (due, sensor_id))
+
+    def reload(self) -> None:
+
+        # Wczytuje listę sensorów (nowe sensory, wyświetlenia) i przebudowuje kolejkę.
+        # Terminy już zaplanowanych sensorów zostają; nowe dostają termin z ostatniego pobrania.
+
+        now = self.clock.time()
+        if self.sync_metadata:
+            self._sync_metadata()
+        rows = self.conn.execute(_SENSORS_SQL).fetchall()
+        self._views = {sensor_id: views for sensor_id, _, views in rows}
+        due = {}
+        for sensor_id, last_fetch, _ in rows:
+            if sensor_id in self._due:
+                due[sensor_id] = self._due[sensor_id]
+            else:
+                due[sensor_id] = now if last_fetch is None else min(now, last_fetch + self.interval(sensor_id))
+        self._due = due
+        self._heap = [(when, sensor_id) for sensor_id, when in due.items()]
+        heapq.heapify(self._heap)
+        self._next_reload = now + self.reload_interval
+        log.info("Harmonogram: %d sensorów w kolejce", len(self._heap))
+
+    def _sync_metadata(self) -> None:
+        # Lista stacji i sensory stacji z cache'u metadanych; każde odświeżenie czeka
+        # na żeton z tego samego budżetu co pomiary.
+        with http_client.retry_budget(self.budget.acquire):
+            if metadata.is_stale(self.conn, metadata.STATIONS_RESOURCE, metadata.STATIONS_TTL,
+                                 now=self.clock.time()):
+                self.budget.acquire()
+                metadata.refresh_stations(self.conn)
+            station_ids = [row[0] for row in self.conn.execute("SELECT id FROM stations")]
+            for station_id in station_ids:
+                resource = metadata.sensors_resource(station_id)
+                if metadata.is_stale(self.conn, resource, metadata.SENSORS_TTL, now=self.clock.time()):
+                    self.budget.acquire()
+                    metadata.refresh_sensors(station_id, self.conn)
+
+    def _pop_due(self, now: float, limit: int) -> list[int]:
+        batch = []
+        while self._heap and len(batch) < limit:
+            due, sensor_id = self._heap[0]
+            if self._due.get(sensor_id) != due:
+                heapq.heappop(self._heap)  # nieaktualny wpis
+                continue
+            if due > now or not self.budget.try_acquire():
+                break
+            heapq.heappop(self._heap)
+            batch.append(sensor_id)
+        return batch
+
+    def run_once(self) -> int:
+
+        # Jeden cykl: odpytuje sensory, których termin minął (najwyżej workers naraz,
+        # w granicach budżetu), i planuje je ponownie. Zwraca liczbę odpytanych sensorów.
+
+        now = self.clock.time()
+        if now >= self._next_reload:
+            self.reload()
+        batch = self._pop_due(now, self.workers)
+        if not batch:
+            return 0
+
+        with http_client.retry_budget(self.budget.acquire):
+            outcomes = update_db.update_sensor_measurements(batch, conn=self.conn, workers=self.workers, now=now)
+        for sensor_id in batch:
+            new_rows = outcomes.get(sensor_id)
+            if new_rows:
+                self._streak.pop(sensor_id, None)
+            else:
+                self._streak[sensor_id] = self._streak.get(sensor_id, 0) + 1
+            self._schedule(sensor_id, now + self.interval(sensor_id))
+        self.fetched += len(batch)
+        return len(batch)
+
+    def next_wakeup(self) -> float:
+        # Sekundy do najbliższego zdarzenia: terminu sensora, żetonu budżetu lub przeładowania.
+        now = self.clock.time()
+        until_due = self._heap[0][0] - now if self._heap else math.inf
+        until_reload = self._next_reload - now
+        return max(0.0, min(max(until_due, self.budget.wait_time()), until_reload))
+
+    def run(self, *, until: float | None = None, stop: threading.Event | None = None) -> None:
+
+        # Pętla główna demona: działa do czasu until (wg zegara) lub ustawienia stop.
+
+        log.info("Start harmonogramu odświeżania")
+        while not (stop is not None and stop.is_set()):
+            if until is not None and self.clock.time() >= until:
+                break
+            if self.run_once():
+                continue
+            wait = self.next_wakeup()
+            if until is not None:
+                wait = min(wait, until - self.clock.time())
+            self.clock.sleep(max(wait, 0.01))
+        log.info("Harmonogram zatrzymany, odpytano %d sensorów", self.fetched)
+
@@ -1,5 +1,5 @@
 import logging
-from app import api_GIOS
+from app import api_GIOS, metadata
 
 # Logger setup
 logger = logging.getLogger("SensorSelection")
@@ -45,7 +45,7 @@ def select_sensor_from_station(station_id):
 
 def get_sensors_for_station(station_id):
 
-    # Zwraca listę sensorów w danej stacji (dla GUI).
+    # Zwraca listę sensorów w danej stacji (dla GUI) z cache'u metadanych.
 
     logger.info(f"Pobieranie sensorów dla stacji ID: {station_id} (do GUI)")
-    return api_GIOS.get_sensors_for_station(station_id)
+    return metadata.get_sensors_for_station(station_id)
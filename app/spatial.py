@@ -0,0 +1,177 @@
+import logging
+import math
+import sqlite3
+import threading
+
+import numpy as np
+
+from app.database import get_connection
+
+log = logging.getLogger(__name__)
+
+# Średni promień Ziemi (IUGG). Haversine na sferze różni się od geodezyjnej odległości
+# na elipsoidzie (geopy.geodesic) o najwyżej ~0,5% – przy promieniach wyszukiwania
+# rzędu kilkudziesięciu km to ułamki kilometra.
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Bok komórki siatki w stopniach (~55 km szerokości geograficznej)
+DEFAULT_CELL_DEG = 0.5
+
+_STATIONS_SQL = """
+    SELECT id, station_name, city, latitude, longitude
+    FROM stations
+    WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    ORDER BY id
+"""
+
+
+def stations_version(conn: sqlite3.Connection) -> int:
+    # Licznik zmian tabeli stations (podbijany triggerami z database.create_tables).
+    row = conn.execute("SELECT version FROM stations_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+
+    # Odległości (km) od punktu (lat, lon) do wszystkich punktów tablic – jedna operacja wektorowa.
+
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class StationIndex:
+
+    # Indeks siatkowy współrzędnych stacji. Punkty są posortowane po komórce siatki
+    # (cell_deg × cell_deg stopni), więc zapytanie o promień sprawdza haversinem tylko
+    # stacje z komórek przecinających prostokąt otaczający okrąg.
+
+    def __init__(self, ids, names, cities, lats, lons, cell_deg: float = DEFAULT_CELL_DEG):
+        self.cell_deg = cell_deg
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        rows = np.floor(lats / cell_deg).astype(np.int64)
+        cols = np.floor(lons / cell_deg).astype(np.int64)
+        order = np.lexsort((cols, rows))
+
+        self.ids = np.asarray(ids)[order]
+        self.names = [names[i] for i in order]
+        self.cities = [cities[i] for i in order]
+        self.lats = lats[order]
+        self.lons = lons[order]
+        self._rows = rows[order]
+        self._cols = cols[order]
+
+        # Komórka (wiersz, kolumna) → zakres [start, stop) w posortowanych tablicach
+        self._cells: dict[tuple[int, int], tuple[int, int]] = {}
+        if len(order):
+            change = np.flatnonzero((np.diff(self._rows) != 0) | (np.diff(self._cols) != 0)) + 1
+            starts = np.concatenate(([0], change))
+            stops = np.concatenate((change, [len(order)]))
+            for start, stop in zip(starts.tolist(), stops.tolist()):
+                self._cells[(int(self._rows[start]), int(self._cols[start]))] = (start, stop)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_rows(cls, rows, cell_deg: float = DEFAULT_CELL_DEG) -> "StationIndex":
+        # rows: (id, station_name, city, latitude, longitude)
+        rows = list(rows)
+        return cls([r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows],
+                   [r[3] for r in rows], [r[4] for r in rows], cell_deg=cell_deg)
+
+    def _candidates(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        d_lat = radius_km / KM_PER_DEGREE
+        lat_lo, lat_hi = max(lat - d_lat, -90.0), min(lat + d_lat, 90.0)
+        # Blisko biegunów lub dla ogromnych promieni prostokąt obejmuje wszystkie długości geograficzne
+        max_abs_lat = max(abs(lat_lo), abs(lat_hi))
+        if max_abs_lat >= 89.9 or radius_km / (KM_PER_DEGREE * math.cos(math.radians(max_abs_lat))) >= 180:
+            return np.arange(len(self.ids))
+        d_lon = radius_km / (KM_PER_DEGREE * math.cos(math.radians(max_abs_lat)))
+        if lon - d_lon < -180 or lon + d_lon > 180:
+            # Okrąg przecina antypołudnik – siatka nie jest zawijana
+            return np.arange(len(self.ids))
+
+        row_lo, row_hi = math.floor(lat_lo / self.cell_deg), math.floor(lat_hi / self.cell_deg)
+        col_lo, col_hi = math.floor((lon - d_lon) / self.cell_deg), math.floor((lon + d_lon) / self.cell_deg)
+        if (row_hi - row_lo + 1) * (col_hi - col_lo + 1) > len(self._cells):
+            # Więcej komórek w prostokącie niż niepustych – taniej przejrzeć niepuste
+            spans = [span for (r, c), span in self._cells.items()
+                     if row_lo <= r <= row_hi and col_lo <= c <= col_hi]
+        else:
+            spans = [self._cells[(r, c)]
+                     for r in range(row_lo, row_hi + 1)
+                     for c in range(col_lo, col_hi + 1)
+                     if (r, c) in self._cells]
+        if not spans:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(start, stop) for start, stop in spans])
+
+    def within(self, lat: float, lon: float, radius_km: float) -> list[tuple[int, str, str, float]]:
+
+        # Wszystkie stacje w promieniu radius_km, posortowane rosnąco po odległości.
+        # Zwraca listę (id, nazwa stacji, miasto, odległość w km).
+
+        idx = self._candidates(lat, lon, radius_km)
+        if not len(idx):
+            return []
+        dist = haversine_km(lat, lon, self.lats[idx], self.lons[idx])
+        hit = dist <= radius_km
+        idx, dist = idx[hit], dist[hit]
+        order = np.argsort(dist, kind="stable")
+        return [(int(self.ids[i]), self.names[i], self.cities[i], float(d))
+                for i, d in zip(idx[order].tolist(), dist[order].tolist())]
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> list[tuple[int, str, str, float]]:
+
+        # k najbliższych stacji: promień podwajany od rozmiaru komórki, aż obejmie k stacji.
+        # Wszystkie stacje w promieniu r są znalezione, więc k pierwszych jest dokładnych.
+
+        if k <= 0 or not len(self.ids):
+            return []
+        radius = self.cell_deg * KM_PER_DEGREE
+        while True:
+            found = self.within(lat, lon, radius)
+            if len(found) >= k or radius >= math.pi * EARTH_RADIUS_KM:
+                return found[:k]
+            radius *= 2
+
+
+_cache: dict[str, tuple[int, StationIndex]] = {}
+_cache_lock = threading.Lock()
+
+
+def _database_key(conn: sqlite3.Connection) -> str:
+    # Plik bazy głównej; bazy w pamięci rozróżniane po połączeniu.
+    path = next((row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main"), "")
+    return path or f":memory:{id(conn)}"
+
+
+def get_station_index(conn: sqlite3.Connection | None = None) -> StationIndex:
+
+    # Indeks stacji z bazy – budowany raz i trzymany w pamięci, dopóki tabela stations
+    # się nie zmieni (wersja z triggerów).
+
+    if conn is None:
+        conn = get_connection()
+    key = _database_key(conn)
+    version = stations_version(conn)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        index = StationIndex.from_rows(conn.execute(_STATIONS_SQL).fetchall())
+        _cache[key] = (version, index)
+    log.info("Zbudowano indeks przestrzenny %d stacji (wersja %d)", len(index), version)
+    return index
+
+
+def stations_within(lat: float, lon: float, radius_km: float, conn: sqlite3.Connection | None = None):
+    return get_station_index(conn).within(lat, lon, radius_km)
+
+
+def nearest_stations(lat: float, lon: float, k: int = 1, conn: sqlite3.Connection | None = None):
+    return get_station_index(conn).nearest(lat, lon, k)
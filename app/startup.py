@@ -0,0 +1,78 @@
+import importlib
+import logging
+import re
+import subprocess
+import sys
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Biblioteki potrzebne dopiero do wykresu, analizy i mapy – nie są importowane przy starcie
+# GUI, tylko doładowywane w tle po pokazaniu okna (albo przy pierwszym użyciu)
+HEAVY_MODULES = ("pandas", "app.spatial", "app.visualizations.chart", "matplotlib.backends.backend_tkagg", "folium")
+
+# Początek pomiaru czasu startu: import tego modułu (main.py importuje go jako pierwszy)
+STARTED = time.perf_counter()
+
+_marks: list[tuple[str, float]] = []
+_preload_thread: threading.Thread | None = None
+_lock = threading.Lock()
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)")
+
+
+def elapsed() -> float:
+    return time.perf_counter() - STARTED
+
+
+def mark(label: str) -> None:
+    # Zapisuje punkt kontrolny startu (sekundy od STARTED).
+    _marks.append((label, elapsed()))
+
+
+def marks() -> list[tuple[str, float]]:
+    return list(_marks)
+
+
+def preload(modules=HEAVY_MODULES) -> threading.Thread:
+
+    # Importuje ciężkie moduły w wątku w tle (tylko raz na proces). Import tego samego
+    # modułu w głównym wątku w międzyczasie po prostu czeka na jego blokadę importu.
+
+    global _preload_thread
+    with _lock:
+        if _preload_thread is None:
+            _preload_thread = threading.Thread(target=_preload, args=(tuple(modules),),
+                                               name="preload", daemon=True)
+            _preload_thread.start()
+        return _preload_thread
+
+
+def _preload(modules: tuple[str, ...]) -> None:
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception:
+            log.exception("Nie udało się wczytać modułu %s", name)
+            continue
+        log.debug("Wczytano %s w %.2f s", name, time.perf_counter() - start)
+    mark("biblioteki wczytane")
+
+
+def import_report(module: str = "app.gui", top: int = 20) -> list[tuple[str, float, float]]:
+
+    # Rozkład czasu importu modułu w świeżym interpreterze (python -X importtime):
+    # (moduł, czas własny [s], czas łącznie z zależnościami [s]), od najwolniejszych.
+    # Narzędzie deweloperskie – w zbudowanym .exe nie ma osobnego interpretera.
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            rows.append((match.group(3), int(match.group(1)) / 1e6, int(match.group(2)) / 1e6))
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows[:top]
@@ -1,5 +1,5 @@
 import logging
-from app import api_GIOS
+from app import api_GIOS, metadata
 
 # Logger setup
 logger = logging.getLogger("StationSelection")
@@ -51,13 +51,10 @@ def select_station_from_city(city_name="Poznań"):
 
 def get_stations_in_city(city_name):
 
-    # Zwraca listę stacji w danym mieście (do GUI).
+    # Zwraca listę stacji w danym mieście (do GUI) – z lokalnego cache'u metadanych,
+    # który sam odświeża się z GIOŚ po upływie TTL.
 
     logger.info(f"Pobieranie listy stacji dla miasta: {city_name}")
-    stations = api_GIOS.get_all_stations()
-    city_stations = [
-        s for s in stations
-        if s["city"]["name"].lower() == city_name.lower()
-    ]
+    city_stations = metadata.get_stations_in_city(city_name)
     logger.info(f"Znaleziono {len(city_stations)} stacji w mieście: {city_name}")
     return city_stations
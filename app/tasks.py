@@ -0,0 +1,133 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+POLL_INTERVAL_MS = 50
+
+
+class TaskCancelled(Exception):
+    # Zgłaszany w wątku roboczym, gdy użytkownik anulował zadanie.
+    pass
+
+
+class Task:
+
+    # Uchwyt zadania uruchomionego w tle. Funkcja zadania dostaje go jako pierwszy argument
+    # i przekazuje task.progress jako progress_cb – każde wywołanie raportuje postęp do GUI,
+    # a po anulowaniu przerywa pracę wyjątkiem TaskCancelled.
+
+    def __init__(self, name: str, events: "queue.Queue"):
+        self.name = name
+        self._events = events
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        log.info("Anulowanie zadania: %s", self.name)
+        self._cancelled.set()
+
+    def check_cancelled(self) -> None:
+        if self.cancelled:
+            raise TaskCancelled(self.name)
+
+    def progress(self, done: int, total: int) -> None:
+        self.check_cancelled()
+        self._events.put((self, "progress", (done, total)))
+
+
+class TaskExecutor:
+
+    # Pula wątków dla operacji sieciowych/bazodanowych GUI. Wyniki, błędy i postęp trafiają
+    # do kolejki, którą wątek Tk opróżnia cyklicznie przez root.after – callbacki
+    # (on_done, on_error, on_progress, on_cancel) zawsze działają w wątku GUI.
+
+    def __init__(self, root, workers: int = DEFAULT_WORKERS, poll_ms: int = POLL_INTERVAL_MS):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gui-task")
+        self._events: queue.Queue = queue.Queue()
+        self._callbacks: dict[Task, dict[str, Callable]] = {}
+        self._closed = False
+        self.root.after(self.poll_ms, self._poll)
+
+    def submit(
+            self,
+            fn: Callable[..., Any],
+            *args,
+            name: str | None = None,
+            on_done: Callable[[Any], None] | None = None,
+            on_error: Callable[[Exception], None] | None = None,
+            on_progress: Callable[[int, int], None] | None = None,
+            on_cancel: Callable[[], None] | None = None,
+            **kwargs
+    ) -> Task:
+
+        # Uruchamia fn(task, *args, **kwargs) w tle i zwraca uchwyt zadania.
+
+        task = Task(name or getattr(fn, "__name__", "zadanie"), self._events)
+        self._callbacks[task] = {"done": on_done, "error": on_error,
+                                 "progress": on_progress, "cancelled": on_cancel}
+
+        def run():
+            try:
+                task.check_cancelled()
+                result = fn(task, *args, **kwargs)
+                task.check_cancelled()
+                self._events.put((task, "done", result))
+            except TaskCancelled:
+                self._events.put((task, "cancelled", None))
+            except Exception as e:
+                log.exception("Błąd zadania w tle: %s", task.name)
+                self._events.put((task, "error", e))
+
+        self._pool.submit(run)
+        return task
+
+    def drain(self) -> int:
+
+        # Wywołuje w bieżącym (GUI) wątku callbacki dla zdarzeń z kolejki. Zwraca ich liczbę.
+
+        handled = 0
+        while True:
+            try:
+                task, kind, payload = self._events.get_nowait()
+            except queue.Empty:
+                return handled
+            handled += 1
+            callbacks = self._callbacks.get(task)
+            if callbacks is None:
+                continue
+            if kind != "progress":
+                del self._callbacks[task]
+            callback = callbacks[kind]
+            if callback is None:
+                continue
+            if kind == "progress":
+                callback(*payload)
+            elif kind == "cancelled":
+                callback()
+            else:
+                callback(payload)
+
+    def _poll(self):
+        if self._closed:
+            return
+        try:
+            self.drain()
+        finally:
+            self.root.after(self.poll_ms, self._poll)
+
+    def shutdown(self) -> None:
+        # Anuluje niezakończone zadania i zatrzymuje pulę (bez czekania na wątki).
+        self._closed = True
+        for task in list(self._callbacks):
+            task.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
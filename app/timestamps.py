@@ -0,0 +1,120 @@
+import calendar
+import functools
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+# Czas pomiarów: w bazie sekundy od epoki UTC (measurements.ts), GIOŚ podaje czas lokalny
+# (Europe/Warsaw) jako tekst "YYYY-MM-DD HH:MM:SS". Tekst jest zamieniany na liczbę raz,
+# przy pobraniu z API (parser o stałym formacie, bez dateutil), a z powrotem na czas
+# lokalny – dopiero przy wyświetlaniu. Przesunięcia UTC są pamiętane per godzina, więc
+# strefa (zoneinfo) jest odpytywana raz na godzinę kalendarza, a nie raz na pomiar.
+#
+# Niejednoznaczna godzina przy zmianie czasu jesienią (02:00–02:59 występuje dwa razy)
+# oznacza pierwsze wystąpienie (czas letni), a nieistniejąca wiosną – czas zimowy,
+# jak fold=0 w zoneinfo.
+
+TIMEZONE = ZoneInfo("Europe/Warsaw")
+DATE_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Te same przeliczenia w SQL (widok measurements_local, agregaty, migracja tekstowych dat)
+# według reguły UE: czas letni od ostatniej niedzieli marca do ostatniej niedzieli
+# października, zmiana o 01:00 UTC. Zgodność z zoneinfo sprawdza tests/test_timestamps.py.
+_DST_START_SQL = "unixepoch(date({year} || '-04-01', 'weekday 0', '-7 days'), {hour})"
+_DST_END_SQL = "unixepoch(date({year} || '-11-01', 'weekday 0', '-7 days'), {hour})"
+
+
+def local_text_sql(ts: str) -> str:
+    # Wyrażenie SQL: ts (UTC) → tekst czasu lokalnego "YYYY-MM-DD HH:MM:SS".
+    year = f"strftime('%Y', {ts}, 'unixepoch')"
+    return (f"datetime({ts}, 'unixepoch', CASE WHEN {ts} >= {_DST_START_SQL.format(year=year, hour=repr('+1 hour'))} "
+            f"AND {ts} < {_DST_END_SQL.format(year=year, hour=repr('+1 hour'))} "
+            f"THEN '+2 hours' ELSE '+1 hour' END)")
+
+
+def epoch_sql(text: str) -> str:
+    # Wyrażenie SQL: tekst czasu lokalnego (także z "T") → ts (UTC).
+    naive, year = f"unixepoch({text})", f"substr({text}, 1, 4)"
+    return (f"{naive} - CASE WHEN {naive} >= {_DST_START_SQL.format(year=year, hour=repr('+3 hours'))} "
+            f"AND {naive} < {_DST_END_SQL.format(year=year, hour=repr('+3 hours'))} "
+            f"THEN 7200 ELSE 3600 END")
+
+
+@functools.lru_cache(maxsize=4096)
+def _day_epoch(day: str) -> int:
+    return calendar.timegm((int(day[0:4]), int(day[5:7]), int(day[8:10]), 0, 0, 0))
+
+
+@functools.lru_cache(maxsize=65536)
+def _offset_of_local_hour(naive_hour: int) -> int:
+    # Przesunięcie UTC (s) godziny lokalnej zapisanej jako sekundy "naiwne" (czas lokalny jak UTC).
+    local = datetime(*time.gmtime(naive_hour)[:4], tzinfo=TIMEZONE)
+    return int(local.utcoffset().total_seconds())
+
+
+@functools.lru_cache(maxsize=65536)
+def _offset_of_utc_hour(utc_hour: int) -> int:
+    return int(datetime.fromtimestamp(utc_hour, TIMEZONE).utcoffset().total_seconds())
+
+
+def parse_local(text: str) -> int:
+    # "YYYY-MM-DD HH:MM:SS" (albo z "T") w czasie lokalnym → sekundy UTC. Stałe pozycje pól.
+    naive = _day_epoch(text[:10]) + int(text[11:13]) * 3600 + int(text[14:16]) * 60 + int(text[17:19])
+    return naive - _offset_of_local_hour(naive - naive % 3600)
+
+
+def parse_local_many(texts):
+    # Wektorowo: tablica tekstów czasu lokalnego → int64 sekund UTC (NumPy).
+    import numpy as np
+    naive = np.asarray(texts, dtype="datetime64[s]").astype(np.int64)
+    return naive - _hour_offsets(naive, _offset_of_local_hour)
+
+
+def to_local_text(ts: int) -> str:
+    # Sekundy UTC → tekst czasu lokalnego (format GIOŚ).
+    ts = int(ts)
+    return time.strftime(DATE_TIME_FORMAT, time.gmtime(ts + _offset_of_utc_hour(ts - ts % 3600)))
+
+
+def to_local_many(ts):
+    # Wektorowo: sekundy UTC → datetime64[ns] czasu lokalnego (bez strefy, jak daty z GIOŚ).
+    import numpy as np
+    ts = np.asarray(ts, dtype=np.int64)
+    return (ts + _hour_offsets(ts, _offset_of_utc_hour)).astype("datetime64[s]").astype("datetime64[ns]")
+
+
+# Zmiany czasu są odległe o miesiące: w krótszym zakresie z tym samym przesunięciem
+# na obu końcach zmiany nie ma (typowa odpowiedź GIOŚ obejmuje ok. 3 doby).
+_SAME_OFFSET_SPAN = 7 * 86400
+
+
+def _hour_offsets(seconds, offset_of_hour):
+    # Przesunięcia dla każdego elementu – strefa odpytywana tylko dla różnych godzin.
+    import numpy as np
+    if len(seconds) == 0:
+        return np.zeros(0, dtype=np.int64)
+    lo, hi = int(seconds.min()), int(seconds.max())
+    if hi - lo < _SAME_OFFSET_SPAN:
+        offset = offset_of_hour(lo - lo % 3600)
+        if offset == offset_of_hour(hi - hi % 3600):
+            return np.full(len(seconds), offset, dtype=np.int64)
+    hours, inverse = np.unique(seconds - seconds % 3600, return_inverse=True)
+    return np.array([offset_of_hour(int(hour)) for hour in hours], dtype=np.int64)[inverse]
+
+
+def local_floor(ts: int, unit: str) -> int:
+    # Początek lokalnej godziny/doby/miesiąca ("hour"/"day"/"month") zawierającego ts.
+    if unit == "hour":
+        return ts - ts % 3600
+    local = datetime.fromtimestamp(ts, TIMEZONE).replace(hour=0, minute=0, second=0, microsecond=0)
+    if unit == "month":
+        local = local.replace(day=1)
+    return int(local.timestamp())
+
+
+def local_next(ts: int, unit: str) -> int:
+    # Początek następnej lokalnej godziny/doby/miesiąca po tej zawierającej ts
+    # (doba przy zmianie czasu ma 23 albo 25 godzin).
+    start = local_floor(ts, unit)
+    step = {"hour": 3600, "day": 26 * 3600, "month": 32 * 86400}[unit]
+    return start + step if unit == "hour" else local_floor(start + step, unit)
@@ -1,104 +1,333 @@
-from typing import Callable
+from typing import Callable, Iterable, NamedTuple
+import itertools
+import json
 import sqlite3
 import logging
-from datetime import datetime
-from dateutil.parser import isoparse
+import time
 
-from app import api_GIOS
-from app.database import insert_measurement, connect
+from app import api_GIOS, pipeline, rollups
+from app.database import (
+    get_connection, advance_sync_state, city_key, measurement_batch, measurement_ts, INSERT_MEASUREMENT_SQL,
+    RECORD_FETCH_SQL, STATIONS_WITH_CITY_SQL
+)
 
 log = logging.getLogger(__name__)
 
+# Stan synchronizacji sensora: nazwa parametru, znak wodny, ostatnie pobranie, walidatory.
+# Sensor bez wpisu (np. dane wstawione poza aplikacją) dostaje znak wodny z MAX(ts)
+# po indeksie (sensor_id, ts) – COALESCE wylicza podzapytanie tylko wtedy.
+_SYNC_STATE_COLUMNS = """
+    s.id, s.param_name,
+    COALESCE(st.last_ts, (
+        SELECT MAX(m.ts) FROM measurements m WHERE m.sensor_id = s.id
+    )),
+    st.last_fetch, st.etag, st.last_modified
+"""
+
+# Stan synchronizacji sensorów (sensor_sync_state, wyszukanie po kluczu głównym).
+# {placeholders} jest zastępowane listą "?" o długości listy sensorów
+SYNC_STATE_SQL = f"""
+    SELECT {_SYNC_STATE_COLUMNS}
+    FROM sensors s
+    LEFT JOIN sensor_sync_state st ON st.sensor_id = s.id
+    WHERE s.id IN ({{placeholders}})
+"""
+
+# Sensory wielu stacji razem ze stanem synchronizacji – jedno zapytanie dla całej listy.
+# Stacje jako tablica JSON (json_each); CROSS JOIN wymusza kolejność: lista stacji
+# na zewnątrz, sensory wyszukiwane po indeksie idx_sensors_station zamiast skanu tabeli.
+# Miasta są dopasowywane wcześniej, w Pythonie (database.city_key – LOWER() zmienia tylko ASCII).
+STATION_SYNC_STATES_SQL = f"""
+    SELECT j.value, {_SYNC_STATE_COLUMNS}
+    FROM json_each(?) j
+    CROSS JOIN sensors s ON s.station_id = j.value
+    LEFT JOIN sensor_sync_state st ON st.sensor_id = s.id
+"""
+
+# Wiersze pomiarów zapisywane w jednej krótkiej transakcji (partia z wielu sensorów) razem
+# z agregatami, znakami wodnymi i walidatorami tych sensorów
+WRITE_BATCH_SIZE = 5000
+
+# GIOŚ publikuje pomiary godzinowe – częstsze odpytywanie tego samego sensora nic nie da
+MIN_FETCH_INTERVAL = 10 * 60
+
+
+class SyncState(NamedTuple):
+    param_name: str | None
+    last_ts: int | None
+    last_fetch: float | None
+    etag: str | None
+    last_modified: str | None
+
+
+class CityUpdate(NamedTuple):
+    sensors: int
+    fetched: int
+    inserted: int
+    failed: int
+    seconds: float
+
 
 def update_city_measurements(
         city_name: str,
         *,
         conn: sqlite3.Connection | None = None,
-        progress_cb: Callable[[int, int], None] | None = None
+        progress_cb: Callable[[int, int], None] | None = None,
+        workers: int | None = None,
+        force: bool = False,
+        metrics: pipeline.PipelineMetrics | None = None
 ) -> int:
 
     # Aktualizuje dane pomiarowe z API GIOS dla wszystkich sensorów w danym mieście. Zwraca liczbę **nowych** rekordów.
+    # Sensory są pobierane równolegle (workers wątków), zapis do SQLite odbywa się sekwencyjnie.
+    # Pomijane są sensory, które nie mogą mieć jeszcze nowych danych (force=True pobiera wszystkie).
+
+    results = update_many([city_name], conn=conn, progress_cb=progress_cb, workers=workers, force=force,
+                          metrics=metrics)
+    return sum(result.inserted for result in results.values())
+
+
+def update_many(
+        cities: Iterable[str] | None = None,
+        *,
+        conn: sqlite3.Connection | None = None,
+        progress_cb: Callable[[int, int], None] | None = None,
+        workers: int | None = None,
+        force: bool = False,
+        metrics: pipeline.PipelineMetrics | None = None
+) -> dict[str, CityUpdate]:
+
+    # Aktualizuje pomiary wielu miast naraz; cities=None – wszystkich miast ze stacjami w bazie.
+    # Sensory wszystkich miast są wyznaczane razem (jedno zapytanie o stany), pobierane przez wspólny potok
+    # (app/pipeline.py) i zapisywane partiami, każda w osobnej krótkiej transakcji razem z agregatami.
+    # progress_cb(i, n) liczy sensory wszystkich miast. Zwraca miasto → CityUpdate (sensory,
+    # odpytane, nowe rekordy, błędy, sekundy od startu do zapisania ostatniego sensora miasta).
+    # metrics (pipeline.PipelineMetrics) – wypełniane metrykami etapów pobierania i zapisu.
+
+    start = time.perf_counter()
+    if conn is None:
+        conn = get_connection()
+    # Odczyty stanów poza transakcją – blokada zapisu jest brana dopiero na czas zapisu partii
+    cur = conn.cursor()
+    # Miasta dopasowywane po city_key: nazwy różniące się tylko wielkością liter
+    # ("Kraków"/"kraków") to jedno miasto, w wyniku pod pierwszą pisownią (podaną
+    # albo – dla cities=None – zapisaną w bazie)
+    cur.execute(STATIONS_WITH_CITY_SQL)
+    stations = [(row[0], row[2]) for row in cur.fetchall()]
+    names: dict[str, str] = {}
+    for name in ([city for _, city in stations] if cities is None else cities):
+        names.setdefault(city_key(name), name.strip())
+    station_cities = {station_id: names[city_key(city)] for station_id, city in stations
+                      if city_key(city) in names}
+
+    cur.execute(STATION_SYNC_STATES_SQL, (json.dumps(list(station_cities)),))
+    city_sensors: dict[str, list[int]] = {name: [] for name in names.values()}
+    states = {}
+    for station_id, sensor_id, *rest in cur.fetchall():
+        city_sensors[station_cities[station_id]].append(sensor_id)
+        states[sensor_id] = SyncState(*rest)
+    if cities is None:
+        city_sensors = {city: sensor_ids for city, sensor_ids in city_sensors.items() if sensor_ids}
+    missing = [name for name, sensor_ids in city_sensors.items() if not sensor_ids]
+    if missing:
+        log.warning("Brak stacji w mieście: %s", ", ".join(f"'{name}'" for name in missing))
+
+    now = time.time()
+    # Każdy sensor odpytywany raz, nawet jeśli trafił do listy kilkukrotnie
+    due = list(dict.fromkeys(sensor_id for sensor_ids in city_sensors.values() for sensor_id in sensor_ids
+                             if force or _may_have_new_data(states[sensor_id], now)))
+    if len(due) < len(states):
+        log.info("Pominięto %d sensorów bez możliwych nowych danych", len(states) - len(due))
+
+    resolved = time.perf_counter()
+    saved_at = {}
+    outcomes = _update_sensors(conn, due, states, now, progress_cb=progress_cb, workers=workers,
+                               on_saved=lambda sensor_id: saved_at.__setitem__(sensor_id, time.perf_counter()),
+                               metrics=metrics)
+
+    results = {}
+    for city, sensor_ids in city_sensors.items():
+        counts = [outcomes[sensor_id] for sensor_id in sensor_ids if sensor_id in outcomes]
+        results[city] = CityUpdate(
+            sensors=len(sensor_ids),
+            fetched=len(counts),
+            inserted=sum(count for count in counts if count),
+            failed=sum(count is None for count in counts),
+            seconds=max((saved_at[sensor_id] for sensor_id in sensor_ids if sensor_id in saved_at),
+                        default=resolved) - start,
+        )
+        log.info("Zakończono aktualizację miasta '%s' ➜ %d nowych rekordów", city, results[city].inserted)
+    if len(results) > 1:
+        log.info("Zaktualizowano %d miast w %.1f s ➜ %d nowych rekordów", len(results),
+                 time.perf_counter() - start, sum(result.inserted for result in results.values()))
+    return results
+
+
+def update_sensor_measurements(
+        sensor_ids: list[int],
+        *,
+        conn: sqlite3.Connection | None = None,
+        progress_cb: Callable[[int, int], None] | None = None,
+        workers: int | None = None,
+        now: float | None = None,
+        metrics: pipeline.PipelineMetrics | None = None
+) -> dict[int, int | None]:
+
+    # Pobiera i zapisuje pomiary podanych sensorów (bez pomijania sensorów – o tym,
+    # kiedy odpytywać, decyduje wywołujący, np. app/scheduler.py).
+    # now: czas pobrania zapisywany w sensor_sync_state (domyślnie time.time()).
+    # Zwraca sensor_id → liczba nowych pomiarów (0 także dla 304) lub None przy błędzie.
+
+    sensor_ids = list(sensor_ids)
+    if not sensor_ids:
+        return {}
+    if conn is None:
+        conn = get_connection()
+    states = _sync_states(conn.cursor(), sensor_ids)
+    return _update_sensors(conn, [sensor_id for sensor_id in sensor_ids if sensor_id in states], states,
+                           time.time() if now is None else now, progress_cb=progress_cb, workers=workers,
+                           metrics=metrics)
 
-    city_name = city_name.strip().lower()
-    own_conn = conn is None
-    if own_conn:
-        conn = connect()
 
-    try:
+def _update_sensors(
+        conn: sqlite3.Connection,
+        sensor_ids: list[int],
+        states: dict[int, SyncState],
+        now: float,
+        *,
+        progress_cb: Callable[[int, int], None] | None = None,
+        workers: int | None = None,
+        on_saved: Callable[[int], None] | None = None,
+        metrics: pipeline.PipelineMetrics | None = None
+) -> dict[int, int | None]:
+
+    # Wspólny rdzeń aktualizacji: odpytuje sensory warunkowo (ETag/Last-Modified), wybiera
+    # nowe pomiary porównaniem ts (liczby całkowite) ze znakiem wodnym i zapisuje je razem
+    # z agregatami i stanem synchronizacji. Pobieranie (workers wątków), wybór nowych pomiarów
+    # i zapis działają jednocześnie jako potok (app/pipeline.py). Zapis w tym wątku, partiami
+    # po WRITE_BATCH_SIZE wierszy – każda partia to osobna krótka transakcja, więc blokada
+    # zapisu SQLite nie jest trzymana w czasie zapytań sieciowych i inni piszący (GUI,
+    # harmonogram) nie czekają do końca aktualizacji. Przerwanie (np. anulowanie w progress_cb)
+    # zostawia zapisane partie; sensory z niezapisanej partii nie mają zapisanego pobrania
+    # i zostaną odpytane ponownie. on_saved(sensor_id) jest wywoływane po przetworzeniu
+    # każdego sensora.
+
+    outcomes: dict[int, int | None] = {}
+    touched = {}
+    fetched = []
+    pending = []
+    total_sensors = len(sensor_ids)
+
+    def fetch(sensor_id):
+        state = states[sensor_id]
+        return api_GIOS.get_measurements_for_sensor(
+            sensor_id, etag=state.etag, last_modified=state.last_modified, raise_errors=True)
+
+    def parse(sensor_id, data):
+        if getattr(data, "not_modified", False):
+            return data, []
+        return data, new_rows(sensor_id, data.get("values", []), states[sensor_id].last_ts)
+
+    def flush():
+        # Agregaty godzinowe/dzienne/miesięczne – tylko kubełki z nowymi pomiarami;
+        # znaki wodne i walidatory w tej samej transakcji co pomiary partii
+        if not (pending or fetched):
+            return
         with conn:
             cur = conn.cursor()
+            cur.executemany(INSERT_MEASUREMENT_SQL, pending)
+            rollups.refresh(cur, touched)
+            advance_sync_state(cur, touched)
+            cur.executemany(RECORD_FETCH_SQL, fetched)
+        pending.clear()
+        touched.clear()
+        fetched.clear()
+
+    flow = pipeline.Pipeline(fetch, parse, fetch_workers=workers, metrics=metrics)
+    for i, (sensor_id, parsed, error) in enumerate(flow.run(sensor_ids), 1):
+        log.info("(%d/%d) Sensor: %s (ID: %d)", i, total_sensors, states[sensor_id].param_name, sensor_id)
+        outcomes[sensor_id] = _save_response(sensor_id, parsed, error, now, touched, fetched, pending)
+        if len(pending) >= WRITE_BATCH_SIZE:
+            flush()
+        if on_saved:
+            on_saved(sensor_id)
+        if progress_cb:
+            progress_cb(i, total_sensors)
+    flush()
+    if total_sensors:
+        log.info("Potok aktualizacji: %s", flow.metrics.summary())
+
+    # Nieudane sensory nie mają zapisanego pobrania – następna aktualizacja odpyta
+    # tylko je (udane są pomijane przez MIN_FETCH_INTERVAL)
+    failed = [sensor_id for sensor_id, count in outcomes.items() if count is None]
+    if failed:
+        log.warning("Nie pobrano danych %d z %d sensorów: %s", len(failed), total_sensors, failed)
+    return outcomes
+
+
+def _save_response(sensor_id: int, parsed, error: Exception | None, now: float,
+                   touched: dict, fetched: list, pending: list) -> int | None:
+
+    # Przyjmuje wynik potoku dla jednego sensora: nowe pomiary do partii zapisu (pending),
+    # zakres do odświeżenia agregatów (touched) i walidatory pobrania (fetched).
+    # Zwraca liczbę nowych pomiarów lub None przy błędzie.
+
+    if error is not None:
+        log.error("Błąd pobierania danych z API dla sensora %d: %s", sensor_id, error)
+        return None
+
+    data, rows = parsed
+    fetched.append((sensor_id, now, getattr(data, "etag", None), getattr(data, "last_modified", None)))
+    if getattr(data, "not_modified", False):
+        log.debug("  ↪ bez zmian (304)")
+        return 0
+
+    pending.extend(rows)
+    rollups.track(touched, sensor_id, (row[2] for row in rows))
+    log.debug("  ↪ %d nowych pomiarów", len(rows))
+    return len(rows)
+
+
+def _may_have_new_data(state: SyncState, now: float) -> bool:
+
+    # False, gdy sensor był odpytany przed chwilą albo ma już pomiar z bieżącej godziny
+    # (przesunięcia strefy są pełnymi godzinami, więc godzina UTC = godzina lokalna).
+
+    if state.last_fetch is not None and now - state.last_fetch < MIN_FETCH_INTERVAL:
+        return False
+    current_hour = int(now) - int(now) % 3600
+    return state.last_ts is None or state.last_ts < current_hour
+
+
+def _sync_states(cur: sqlite3.Cursor, sensor_ids: list[int]) -> dict[int, SyncState]:
+
+    # Zwraca mapę sensor_id → stan synchronizacji (nazwa parametru, znak wodny,
+    # ostatnie pobranie, walidatory). Sensory spoza tabeli sensors są pomijane.
+
+    if not sensor_ids:
+        return {}
+    placeholders = ",".join("?" for _ in sensor_ids)
+    cur.execute(SYNC_STATE_SQL.format(placeholders=placeholders), tuple(sensor_ids))
+    return {sensor_id: SyncState(*rest) for sensor_id, *rest in cur.fetchall()}
+
+def new_rows(sensor_id: int, values: list[dict], newest: int | None) -> list[tuple[int, float, int]]:
+
+    # Nowe pomiary sensora jako wiersze INSERT_MEASUREMENT_SQL (sensor_id, value, ts).
+    # Odpowiedź API jest zamieniana na tablice NumPy raz, a wybór (wartość nie None,
+    # ts nowszy niż znak wodny) to jedno porównanie tablic zamiast warunku na każdym słowniku.
+
+    if not values:
+        return []
+    import numpy as np
+
+    ts, value = measurement_batch(values)
+    keep = ~np.isnan(value)
+    if newest is not None:
+        keep &= ts > newest
+    ts = ts[keep]
+    return list(zip(itertools.repeat(sensor_id, len(ts)), value[keep].tolist(), ts.tolist()))
 
-            cur.execute("SELECT id FROM stations WHERE LOWER(city)=?", (city_name,))
-            station_ids = [row[0] for row in cur.fetchall()]
-            if not station_ids:
-                log.warning("Brak stacji w mieście '%s'", city_name)
-                return 0
-
-            placeholders = ",".join("?" for _ in station_ids)
-            cur.execute(f"""
-                SELECT id, param_name
-                FROM sensors
-                WHERE station_id IN ({placeholders})
-            """, tuple(station_ids))
-            sensors = cur.fetchall()
-
-            latest_map = _latest_times(cur, station_ids)
-            total_inserted = 0
-            total_sensors = len(sensors)
-
-            for i, (sensor_id, param_name) in enumerate(sensors, 1):
-                log.info("(%d/%d) Sensor: %s (ID: %d)", i, total_sensors, param_name, sensor_id)
-                newest = latest_map.get(sensor_id)
-
-                try:
-                    values = api_GIOS.get_measurements_for_sensor(sensor_id).get("values", [])
-                except Exception as e:
-                    log.error("Błąd pobierania danych z API dla sensora %d: %s", sensor_id, e)
-                    continue
-
-                new_values = [
-                    v for v in values
-                    if v["value"] is not None and (
-                        newest is None or isoparse(v["date"]).replace(tzinfo=None) > newest
-                    )
-                ]
-
-                for v in new_values:
-                    insert_measurement(cur, sensor_id, v)
-
-                log.debug("  ↪ zapisano %d nowych pomiarów", len(new_values))
-                total_inserted += len(new_values)
-
-                if progress_cb:
-                    progress_cb(i, total_sensors)
-
-            log.info("Zakończono aktualizację miasta '%s' ➜ %d nowych rekordów", city_name, total_inserted)
-            return total_inserted
-    finally:
-        if own_conn:
-            conn.close()
-
-
-def _latest_times(cur: sqlite3.Cursor, station_ids: list[int]) -> dict[int, datetime | None]:
-
-    # Zwraca mapę sensor_id → ostatnia data pomiaru (lub None).
-
-    placeholders = ",".join("?" for _ in station_ids)
-    cur.execute(f"""
-        SELECT s.id, MAX(m.date_time)
-        FROM sensors s
-        LEFT JOIN measurements m ON m.sensor_id = s.id
-        WHERE s.station_id IN ({placeholders})
-        GROUP BY s.id
-    """, tuple(station_ids))
-    return {
-        sensor_id: (datetime.fromisoformat(ts) if ts else None)
-        for sensor_id, ts in cur.fetchall()
-    }
 
 def insert_measurement(cur, sensor_id: int, v: dict):
-    cur.execute(
-        "INSERT INTO measurements (sensor_id, date_time, value) VALUES (?, ?, ?)",
-        (sensor_id, v["date"], v["value"])
-    )
+    cur.execute(INSERT_MEASUREMENT_SQL, (sensor_id, v["value"], measurement_ts(v)))
 
@@ -0,0 +1,116 @@
+import logging
+
+import numpy as np
+from matplotlib import dates as mdates
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from app.visualizations import downsampling
+
+log = logging.getLogger(__name__)
+
+BACKGROUND = "#f9f9f9"
+
+
+class SeriesChart:
+
+    # Wykres szeregu czasowego z jedną, trwałą figurą: kolejne serie podmieniają dane linii
+    # (set_data) zamiast tworzyć nową figurę i płótno. Figure nie jest rejestrowana w pyplot,
+    # więc nic się nie kumuluje między wykresami. master=None – płótno Agg bez okna (testy).
+    # blit=True: gdy zakres osi i tytuł się nie zmieniają, na zapamiętane tło nanoszone są
+    # tylko linia i pasmo. Długie serie są decymowane (downsampling) do liczby punktów
+    # wynikającej z szerokości osi w pikselach, chyba że podano max_points.
+
+    def __init__(self, master=None, *, figsize=(7, 4), max_points: int | None = None,
+                 method: str = "minmax", blit: bool = False):
+        self.max_points = max_points
+        self.method = method
+        self.blit = blit
+        self.figure = Figure(figsize=figsize)
+        self.figure.patch.set_facecolor(BACKGROUND)
+        self.axes = self.figure.add_subplot()
+        self.axes.set_xlabel("Data")
+        self.axes.set_ylabel("Wartość [µg/m³]")
+        self.axes.grid(True, linestyle="--", alpha=0.6)
+        self.axes.set_facecolor(BACKGROUND)
+        self.axes.xaxis_date()
+        self.figure.autofmt_xdate()
+        (self.line,) = self.axes.plot([], [], marker="o", linestyle="-", animated=blit)
+        self.band = None
+        self._background = None
+        self._state = None
+
+        if master is None:
+            self.canvas = FigureCanvasAgg(self.figure)
+            self.widget = None
+        else:
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            self.canvas = FigureCanvasTkAgg(self.figure, master=master)
+            self.widget = self.canvas.get_tk_widget()
+        if blit:
+            self.canvas.mpl_connect("draw_event", self._on_draw)
+
+    def update(self, x, y, *, lo=None, hi=None, title: str = "") -> None:
+
+        # Podmienia dane wykresu. x – daty (datetime64/datetime), y – wartości; lo/hi –
+        # opcjonalne pasmo min–max kubełków agregatów.
+
+        x = mdates.date2num(np.asarray(x))
+        y = np.asarray(y, dtype=float)
+        max_points = self.point_budget()
+        if len(x) > max_points:
+            log.debug("Decymacja (%s) %d → najwyżej %d punktów", self.method, len(x), max_points)
+            x_line, y_line = downsampling.downsample(x, y, max_points, self.method)
+        else:
+            x_line, y_line = x, y
+        self.line.set_marker("o" if len(x_line) <= downsampling.MARKER_MAX_POINTS else "")
+        self.line.set_data(x_line, y_line)
+
+        show_band = lo is not None and hi is not None and len(x) > 0
+        if show_band:
+            # Agregaty: linia to średnia kubełka, pasmo min–max zachowuje szczyty
+            x_band, lo, hi = downsampling.envelope(x, lo, hi, max_points)
+            if self.band is None:
+                self.band = self.axes.fill_between(x_band, lo, hi, alpha=0.2, color=self.line.get_color(),
+                                                   animated=self.blit)
+            else:
+                self.band.set_data(x_band, lo, hi)
+        if self.band is not None:
+            self.band.set_visible(show_band)
+        self.axes.set_title(title)
+
+        self.axes.relim()
+        if show_band:
+            # relim() pomija kolekcje – zakres pasma dokładany ręcznie
+            self.axes.update_datalim([(x[0], np.nanmin(lo)), (x[-1], np.nanmax(hi))])
+        self.axes.autoscale_view()
+        state = (self.axes.get_xlim(), self.axes.get_ylim(), title)
+        if self.blit and self._background is not None and state == self._state:
+            self.canvas.restore_region(self._background)
+            self._draw_animated()
+            self.canvas.blit(self.figure.bbox)
+        elif self.widget is not None:
+            self.canvas.draw_idle()
+        else:
+            self.canvas.draw()
+        self._state = state
+
+    def point_budget(self) -> int:
+        # Najwięcej punktów, jakie warto narysować: z max_points albo z szerokości osi w pikselach.
+        if self.max_points is not None:
+            return self.max_points
+        return downsampling.max_points_for_width(self.axes.bbox.width, self.method)
+
+    def clear(self) -> None:
+        self.update([], [], title="")
+
+    def _draw_animated(self) -> None:
+        if self.band is not None and self.band.get_visible():
+            self.axes.draw_artist(self.band)
+        self.axes.draw_artist(self.line)
+
+    def _on_draw(self, event) -> None:
+        # Pełne przerysowanie (także zmiana rozmiaru okna): zapamiętanie tła bez linii
+        # i pasma do blittingu, potem naniesienie ich na wierzch
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_animated()
@@ -1,13 +1,11 @@
-import sqlite3
-import os
-import pandas as pd
 import matplotlib.pyplot as plt
 
-DB_PATH = os.path.join("data", "air_quality.db")
+from app.database import get_connection, get_series
+from app.visualizations import downsampling
 
 def plot_measurements(sensor_id, date_from=None, date_to=None, save_path=None):
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
 
     # Pobierz nazwę parametru
     cur = conn.cursor()
@@ -18,33 +16,23 @@ def plot_measurements(sensor_id, date_from=None, date_to=None, save_path=None):
         param_name = result[0]
     else:
         print("Nie znaleziono parametru dla podanego sensor_id.")
-        conn.close()
         return
 
     # Pobierz dane
-    query = """
-        SELECT date_time, value
-        FROM measurements
-        WHERE sensor_id = ?
-        ORDER BY date_time
-    """
-    df = pd.read_sql_query(query, conn, params=(sensor_id,))
-    conn.close()
-
-    df["date_time"] = pd.to_datetime(df["date_time"])
-
-    if date_from:
-        df = df[df["date_time"] >= pd.to_datetime(date_from)]
-    if date_to:
-        df = df[df["date_time"] <= pd.to_datetime(date_to)]
+    df, level = get_series(sensor_id, date_from, date_to, conn=conn)
 
     if df.empty:
         print(" Brak danych w podanym zakresie.")
         return
 
-    # Rysuj wykres
-    plt.figure(figsize=(10, 5))
-    plt.plot(df["date_time"], df["value"], marker='o', linestyle='-', color='blue')
+    # Rysuj wykres – długie serie zredukowane do szerokości rysunku w pikselach (szczyty zostają)
+    fig = plt.figure(figsize=(10, 5))
+    max_points = downsampling.max_points_for_width(fig.get_figwidth() * fig.dpi)
+    x, y = downsampling.downsample(df["date_time"].to_numpy(), df["value"].to_numpy(), max_points)
+    plt.plot(x, y, marker='o' if len(x) <= downsampling.MARKER_MAX_POINTS else None, linestyle='-', color='blue')
+    if level:
+        plt.fill_between(*downsampling.envelope(df["date_time"].to_numpy(), df["min"], df["max"], max_points),
+                         color='blue', alpha=0.2)
     plt.title(f"Stężenie {param_name}", fontsize=14)
     plt.xlabel("Data pomiaru", fontsize=12)
     plt.ylabel("Wartość [µg/m³]", fontsize=12)
@@ -0,0 +1,92 @@
+import numpy as np
+
+# Redukcja długich szeregów czasowych przed rysowaniem: liczba punktów zależy od szerokości
+# wykresu w pikselach, a nie od długości historii, więc czas renderowania jest stały.
+#
+# - minmax: w każdym kubełku minimum i maksimum – szczyty stężeń zawsze zostają (domyślna),
+# - lttb: Largest-Triangle-Three-Buckets – jeden punkt na kubełek, najlepiej oddaje kształt.
+
+METHODS = ("minmax", "lttb")
+
+# Markery punktów tylko dla krótkich serii – przy gęstszych zlewają się w linię
+# i są najdroższą częścią renderowania w Agg
+MARKER_MAX_POINTS = 200
+
+
+def max_points_for_width(pixels: float, method: str = "minmax") -> int:
+    # minmax: dwa punkty (min i max) na kolumnę pikseli; lttb: jeden.
+    pixels = max(int(pixels), 2)
+    return 2 * pixels if method == "minmax" else pixels
+
+
+def _bucket_ids(n: int, buckets: int) -> np.ndarray:
+    return (np.arange(n) * buckets) // n
+
+
+def minmax_indices(y: np.ndarray, max_points: int) -> np.ndarray:
+
+    # Indeksy punktów do narysowania (rosnąco): minimum i maksimum każdego
+    # z max_points // 2 kubełków. Wartości NaN są pomijane.
+
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    buckets = max(max_points // 2, 1)
+    ids = _bucket_ids(n, buckets)
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+    # Sortowanie po (kubełek, wartość): pierwszy element kubełka to minimum, ostatni – maksimum
+    by_min = np.lexsort((np.where(np.isnan(y), np.inf, y), ids))
+    by_max = np.lexsort((np.where(np.isnan(y), -np.inf, y), ids))
+    return np.unique(np.r_[by_min[starts], by_max[ends]])
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+
+    # Largest-Triangle-Three-Buckets (Steinarsson, 2013): pierwszy i ostatni punkt zostają,
+    # a z każdego kubełka pomiędzy wybierany jest punkt tworzący największy trójkąt
+    # z punktem wybranym z poprzedniego kubełka i średnią następnego.
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    keep = np.empty(max_points, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    prev = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        nxt_start, nxt_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_start:nxt_end].mean() if nxt_end > nxt_start else x[-1]
+        avg_y = np.nanmean(y[nxt_start:nxt_end]) if nxt_end > nxt_start else y[-1]
+        xs, ys = x[start:end], y[start:end]
+        area = np.abs((x[prev] - avg_x) * (ys - y[prev]) - (x[prev] - xs) * (avg_y - y[prev]))
+        prev = start + int(np.nanargmax(area)) if not np.all(np.isnan(area)) else start
+        keep[i + 1] = prev
+    return keep
+
+
+def downsample(x, y, max_points: int, method: str = "minmax") -> tuple[np.ndarray, np.ndarray]:
+    # Zwraca (x, y) o najwyżej max_points punktach (krótsze serie bez zmian).
+    x, y = np.asarray(x), np.asarray(y, dtype=float)
+    if method not in METHODS:
+        raise ValueError(f"Nieznana metoda decymacji: {method}")
+    idx = minmax_indices(y, max_points) if method == "minmax" else lttb_indices(x, y, max_points)
+    return x[idx], y[idx]
+
+
+def envelope(x, lo, hi, max_points: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+
+    # Pasmo min–max zredukowane do max_points // 2 kubełków: początek kubełka, najmniejsze
+    # lo i największe hi w kubełku – pasmo nadal obejmuje wszystkie skrajne wartości.
+
+    x, lo, hi = np.asarray(x), np.asarray(lo, dtype=float), np.asarray(hi, dtype=float)
+    n = len(x)
+    if n <= max_points:
+        return x, lo, hi
+    ids = _bucket_ids(n, max(max_points // 2, 1))
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    return x[starts], np.fmin.reduceat(lo, starts), np.fmax.reduceat(hi, starts)
@@ -0,0 +1,93 @@
+# Archiwum Parquet (app/archive.py): rozmiar starych pomiarów w SQLite vs w plikach Parquet
+# oraz czas odczytu zakresu z zimnej historii (get_measurements_range) przed i po archiwizacji.
+#
+#   python -m benchmarks.bench_archive --sensors 20 --years 5
+
+import argparse
+import logging
+import random
+import statistics
+from datetime import datetime
+
+from app import archive
+from app.database import get_connection, get_measurements_range, INSERT_MEASUREMENT_SQL, DATE_TIME_FORMAT
+from app.timestamps import local_floor, parse_local, to_local_text
+from benchmarks.common import temp_database, timed
+
+END = datetime(2024, 6, 30)
+
+
+def data_start(years: int) -> int:
+    # Pierwszy generowany pomiar (ts): pomiary godzinowe kończą się na END
+    return parse_local(END.strftime(DATE_TIME_FORMAT)) - (years * 365 * 24 - 1) * 3600
+
+
+def query_windows(years: int, max_age_days: int) -> list[tuple[str, str, str]]:
+
+    # Zakresy odczytu sensora (etykieta, od, do) wyliczane z generowanych danych: ostatni
+    # miesiąc i rok przed granicą archiwum (archive.cutoff_for), przycięte do początku danych –
+    # cały zakres leży w zarchiwizowanej części. Pusta lista, gdy nic nie zostanie przeniesione.
+
+    start = data_start(years)
+    last = archive.cutoff_for(max_age_days, END) - 1
+    if last < start:
+        return []
+    return [(label, to_local_text(max(start, first)), to_local_text(last))
+            for label, first in (("miesiąc", local_floor(last, "month")), ("rok", last + 1 - 365 * 24 * 3600))]
+
+
+def populate(conn, sensors: int, years: int) -> None:
+    hours = years * 365 * 24
+    start = data_start(years)
+    for sensor_id in range(1, sensors + 1):
+        rng = random.Random(sensor_id)
+        conn.executemany(INSERT_MEASUREMENT_SQL, (
+            (sensor_id, round(rng.uniform(1, 120), 2), start + h * 3600)
+            for h in range(hours)
+        ))
+    conn.commit()
+
+
+def median_time(fn, repeat: int) -> float:
+    return statistics.median(timed(fn)[0] for _ in range(repeat))
+
+
+def scan_times(sensor_id: int, queries, repeat: int, conn) -> dict:
+    return {label: median_time(lambda: get_measurements_range(sensor_id, date_from, date_to, conn=conn), repeat)
+            for label, date_from, date_to in queries}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark archiwum Parquet")
+    parser.add_argument("--sensors", type=int, default=20)
+    parser.add_argument("--years", type=int, default=5, help="lata pomiarów godzinowych na sensor")
+    parser.add_argument("--max-age-days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    queries = query_windows(args.years, args.max_age_days)
+    if not queries:
+        parser.error(f"--years {args.years} nie sięga sprzed --max-age-days {args.max_age_days} – nic do archiwizacji")
+
+    logging.disable(logging.WARNING)
+    with temp_database():
+        conn = get_connection()
+        populate(conn, args.sensors, args.years)
+        sensor_id = args.sensors // 2 or 1
+        before = scan_times(sensor_id, queries, args.repeat, conn)
+
+        summary = archive.archive_measurements(conn, max_age_days=args.max_age_days, now=END, vacuum=True)
+        after = scan_times(sensor_id, queries, args.repeat, conn)
+        freed = summary["sqlite_bytes_before"] - summary["sqlite_bytes_after"]
+
+        print(f"Przeniesiono {summary['rows']} pomiarów {summary['sensors']} sensorów sprzed {summary['cutoff']}")
+        print(f"SQLite (dane + indeksy): {freed / 1e6:8.1f} MB | Parquet: {summary['archive_bytes_added'] / 1e6:6.1f} MB "
+              f"| {freed / max(summary['archive_bytes_added'], 1):5.1f}x mniej")
+        print(f"Plik bazy po VACUUM: {summary['sqlite_bytes_after'] / 1e6:.1f} MB")
+        for label, date_from, date_to in queries:
+            rows = len(get_measurements_range(sensor_id, date_from, date_to, conn=conn))
+            print(f"Odczyt: {label:8s} ({rows:5d} wierszy): SQLite {before[label] * 1000:7.1f} ms | "
+                  f"Parquet {after[label] * 1000:7.1f} ms | {before[label] / after[label]:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
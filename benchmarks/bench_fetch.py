@@ -0,0 +1,59 @@
+# Czas odświeżenia miasta (update_city_measurements) przy pobieraniu sekwencyjnym
+# i równoległym, na lokalnym serwerze-atrapie GIOŚ z opóźnieniem odpowiedzi.
+#
+#   python -m benchmarks.bench_fetch --sensors 24 --latency 0.05 --workers 8
+
+import argparse
+import logging
+import sqlite3
+from unittest.mock import patch
+
+from app import api_GIOS, http_client, pipeline
+from app.database import create_tables, station_row, sensor_row, INSERT_STATION_SQL, INSERT_SENSOR_SQL
+from app.update_db import update_city_measurements
+from benchmarks.common import synthetic_payload, timed
+from benchmarks.stub_server import GiosStubServer
+
+
+def _city_db(payload, city):
+    stations, sensors, _ = payload
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+    for station in stations:
+        station["city"]["name"] = city
+        conn.execute(INSERT_STATION_SQL, station_row(station))
+        conn.executemany(INSERT_SENSOR_SQL, [sensor_row(s, station["id"]) for s in sensors[station["id"]]])
+    conn.commit()
+    return conn
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark równoległego pobierania z GIOŚ")
+    parser.add_argument("--stations", type=int, default=6)
+    parser.add_argument("--sensors", type=int, default=4, help="sensorów na stację")
+    parser.add_argument("--hours", type=int, default=72)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=http_client.DEFAULT_WORKERS)
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    payload = synthetic_payload(args.stations, args.sensors, args.hours)
+    http_client.configure(args.workers)
+
+    with GiosStubServer(payload, latency=args.latency) as stub, \
+            patch.object(api_GIOS, "BASE_URL", stub.base_url):
+        serial_s, n1 = timed(update_city_measurements, "Bench", conn=_city_db(payload, "Bench"), workers=1)
+        metrics = pipeline.PipelineMetrics()
+        parallel_s, n2 = timed(update_city_measurements, "Bench", conn=_city_db(payload, "Bench"),
+                               workers=args.workers, metrics=metrics)
+
+    n_sensors = args.stations * args.sensors
+    print(f"Sensory: {n_sensors}, opóźnienie: {args.latency * 1000:.0f} ms, wątki: {args.workers}")
+    print(f"Sekwencyjnie: {serial_s:7.3f} s ({n1} rekordów)")
+    print(f"Równolegle:   {parallel_s:7.3f} s ({n2} rekordów, max {stub.max_in_flight} naraz)")
+    print(f"Przyspieszenie: {serial_s / parallel_s:5.1f}x")
+    print(f"Potok (równolegle): {metrics.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Porównanie zapisu wiersz po wierszu (nowe połączenie i commit na każdy wiersz)
+# z wsadowym ingest.fetch_and_save_all_data na syntetycznych danych GIOŚ.
+#
+#   python -m benchmarks.bench_ingest --stations 20 --sensors 4 --hours 72
+#
+# Z --cassette obie ścieżki pobierają dane przez HTTP z nagrania (benchmarks/replay.py)
+# z opóźnieniem --latency na odpowiedź, zamiast z podmienionych funkcji api_GIOS.
+#
+#   python -m benchmarks.bench_ingest --cassette gios.json.gz --latency 0.02
+
+import argparse
+import contextlib
+import logging
+import sqlite3
+
+from app import api_GIOS, database, ingest
+from app.database import (
+    station_row, sensor_row, measurement_ts, INSERT_STATION_SQL, INSERT_SENSOR_SQL, INSERT_MEASUREMENT_SQL
+)
+from benchmarks.common import synthetic_payload, patched_api, temp_database, timed
+from benchmarks.replay import Cassette, replaying
+
+
+def per_row_ingest():
+    # Dawna ścieżka: osobne połączenie i commit dla każdego wiersza.
+    def execute(sql, params):
+        conn = sqlite3.connect(database.DB_PATH)
+        try:
+            conn.execute(sql, params)
+            conn.commit()
+        finally:
+            conn.close()
+
+    for station in api_GIOS.get_all_stations():
+        execute(INSERT_STATION_SQL, station_row(station))
+        for sensor in api_GIOS.get_sensors_for_station(station["id"]):
+            execute(INSERT_SENSOR_SQL, sensor_row(sensor, station["id"]))
+            for m in api_GIOS.get_measurements_for_sensor(sensor["id"]).get("values", []):
+                if m["value"] is not None:
+                    execute(INSERT_MEASUREMENT_SQL, (sensor["id"], m["value"], measurement_ts(m)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark zapisu wsadowego GIOŚ")
+    parser.add_argument("--stations", type=int, default=20)
+    parser.add_argument("--sensors", type=int, default=4)
+    parser.add_argument("--hours", type=int, default=72)
+    parser.add_argument("--batch-size", type=int, default=ingest.DEFAULT_BATCH_SIZE)
+    parser.add_argument("--cassette", help="nagranie odpowiedzi GIOŚ (.json.gz) zamiast danych syntetycznych")
+    parser.add_argument("--latency", type=float, default=0.0, help="opóźnienie odpowiedzi z nagrania [s]")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+
+    @contextlib.contextmanager
+    def source():
+        if args.cassette:
+            with replaying(Cassette.load(args.cassette), latency=args.latency):
+                yield
+        else:
+            with patched_api(synthetic_payload(args.stations, args.sensors, args.hours)):
+                yield
+
+    with source():
+        with temp_database():
+            per_row_s, _ = timed(per_row_ingest)
+        with temp_database():
+            bulk_s, stats = timed(ingest.fetch_and_save_all_data, batch_size=args.batch_size)
+
+    rows = stats["rows"]
+    print(f"Wiersze (ok.):   {rows}")
+    print(f"Wiersz po wierszu: {per_row_s:8.3f} s  ({rows / per_row_s:10.0f} wierszy/s)")
+    print(f"Wsadowo:           {bulk_s:8.3f} s  ({stats['rows_per_sec']:10.0f} wierszy/s, "
+          f"{stats['commits']} commitów)")
+    print(f"Przyspieszenie:    {per_row_s / bulk_s:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# Czas renderowania wykresu (Agg) dla rosnącej długości historii: wszystkie surowe punkty
+# z markerami (dawna ścieżka) vs SeriesChart z decymacją do szerokości osi.
+#
+#   python -m benchmarks.bench_plot --days 30,365,1095
+
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from app.visualizations.chart import SeriesChart
+from benchmarks.common import timed
+
+
+def render_raw(x, y):
+    # Dawna ścieżka: nowa figura i każdy punkt z markerem.
+    fig = Figure(figsize=(7, 4))
+    fig.add_subplot().plot(x, y, marker="o", linestyle="-")
+    FigureCanvasAgg(fig).draw()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark renderowania długich serii")
+    parser.add_argument("--days", default="30,365,1095", help="długości historii w dniach (pomiary godzinowe)")
+    parser.add_argument("--method", default="minmax", choices=("minmax", "lttb"))
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    rng = np.random.default_rng(0)
+    chart = SeriesChart(method=args.method)
+    for days in (int(d) for d in args.days.split(",")):
+        n = days * 24
+        x = pd.date_range("2022-01-01", periods=n, freq="h").to_numpy()
+        y = rng.uniform(1, 120, n)
+        raw_s, _ = timed(render_raw, x, y)
+        chart_s, _ = timed(chart.update, x, y)
+        print(f"{days:5d} dni ({n:6d} pkt): wszystkie punkty {raw_s * 1000:8.1f} ms | "
+              f"decymacja ({len(chart.line.get_xdata())} pkt) {chart_s * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
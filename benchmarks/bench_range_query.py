@@ -0,0 +1,67 @@
+# Porównanie odczytu okna 3/10/30 dni: cała historia sensora + filtr w pandas
+# (dawna ścieżka) vs database.get_measurements_range (filtr w SQL).
+#
+#   python -m benchmarks.bench_range_query --rows 1000000
+
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from app.database import connect, create_tables, get_measurements_range, INSERT_MEASUREMENT_SQL, DATE_TIME_FORMAT
+from app.timestamps import parse_local, to_local_many
+from benchmarks.common import temp_database, timed
+
+SENSOR_ID = 1
+
+
+def full_history_filter(conn, date_from, date_to):
+    # Dawna ścieżka: pełna historia sensora, konwersja wszystkich dat, filtr w pamięci.
+    df = pd.read_sql_query(
+        "SELECT ts, value FROM measurements WHERE sensor_id = ? ORDER BY ts",
+        conn, params=(SENSOR_ID,)
+    )
+    df = pd.DataFrame({"date_time": to_local_many(df["ts"].to_numpy()), "value": df["value"]})
+    return df[(df["date_time"] >= pd.to_datetime(date_from)) & (df["date_time"] <= pd.to_datetime(date_to))]
+
+
+def populate(conn, rows, step_minutes):
+    end = datetime(2024, 6, 30)
+    start = parse_local(end.strftime(DATE_TIME_FORMAT)) - step_minutes * 60 * rows
+    batch = []
+    for i in range(rows):
+        batch.append((SENSOR_ID, (i % 200) / 2, start + step_minutes * 60 * i))
+        if len(batch) == 100_000:
+            conn.executemany(INSERT_MEASUREMENT_SQL, batch)
+            batch.clear()
+    conn.executemany(INSERT_MEASUREMENT_SQL, batch)
+    conn.commit()
+    return end
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark zapytań zakresowych")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="pomiarów jednego sensora")
+    parser.add_argument("--step-minutes", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    with temp_database() as path:
+        conn = connect(path)
+        create_tables(conn)
+        end = populate(conn, args.rows, args.step_minutes)
+
+        print(f"Pomiarów sensora: {args.rows}")
+        for days in (3, 10, 30):
+            date_from, date_to = (end - timedelta(days=days)).strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+            old_s, old_df = timed(full_history_filter, conn, date_from, date_to)
+            new_s, new_df = timed(get_measurements_range, SENSOR_ID, date_from, date_to, conn=conn)
+            assert len(old_df) == len(new_df)
+            print(f"{days:2d} dni ({len(new_df):6d} wierszy): pandas {old_s * 1000:9.1f} ms | "
+                  f"SQL {new_s * 1000:7.1f} ms | {old_s / new_s:6.1f}x")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
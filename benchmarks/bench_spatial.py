@@ -0,0 +1,63 @@
+# Wyszukiwanie stacji w promieniu: pętla geopy.geodesic po wszystkich wierszach
+# (dawna ścieżka w GUI) vs haversine na tablicach NumPy vs indeks siatkowy app.spatial.
+#
+#   python -m benchmarks.bench_spatial --stations 100000
+
+import argparse
+import logging
+import random
+
+import numpy as np
+from geopy.distance import geodesic
+
+from app.spatial import StationIndex, haversine_km
+from benchmarks.common import timed
+
+# Warszawa, Kraków, Gdańsk
+CENTERS = [(52.23, 21.01), (50.06, 19.94), (54.35, 18.65)]
+
+
+def synthetic_stations(n, seed=0):
+    rng = random.Random(seed)
+    return [(i, f"Stacja {i}", f"Miasto {i % 500}", 49 + rng.random() * 5.8, 14.1 + rng.random() * 10)
+            for i in range(1, n + 1)]
+
+
+def geodesic_loop(rows, center, radius):
+    # Dawna ścieżka: geodesic dla każdego wiersza w Pythonie.
+    return [r for r in rows if geodesic(center, (r[3], r[4])).km <= radius]
+
+
+def vectorized_scan(lats, lons, center, radius):
+    return np.flatnonzero(haversine_km(*center, lats, lons) <= radius)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark wyszukiwania stacji w promieniu")
+    parser.add_argument("--stations", type=int, default=100_000)
+    parser.add_argument("--radius", type=float, default=25.0, help="promień w km")
+    parser.add_argument("--repeat", type=int, default=20, help="powtórzeń zapytań indeksu")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    rows = synthetic_stations(args.stations)
+    lats = np.array([r[3] for r in rows])
+    lons = np.array([r[4] for r in rows])
+
+    build_s, index = timed(StationIndex.from_rows, rows)
+    print(f"Stacji: {args.stations}, promień {args.radius} km, budowa indeksu {build_s * 1000:.1f} ms")
+
+    for center in CENTERS:
+        loop_s, loop_hits = timed(geodesic_loop, rows, center, args.radius)
+        scan_s, scan_hits = timed(vectorized_scan, lats, lons, center, args.radius)
+        index_s, _ = timed(lambda: [index.within(*center, args.radius) for _ in range(args.repeat)])
+        index_s /= args.repeat
+        hits = index.within(*center, args.radius)
+        knn_s, _ = timed(index.nearest, *center, 10)
+        print(f"{center}: {len(hits):4d} stacji (geodesic {len(loop_hits)}, NumPy {len(scan_hits)}) | "
+              f"geodesic {loop_s * 1000:8.1f} ms | NumPy {scan_s * 1000:6.2f} ms | "
+              f"indeks {index_s * 1000:6.3f} ms ({loop_s / index_s:,.0f}x) | 10-NN {knn_s * 1000:6.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Przetwarzanie odpowiedzi jednego sensora przy aktualizacji (update_db): przeliczenie dat,
+# wybór pomiarów nowszych niż znak wodny i zapis. Porównanie ścieżek wartość po wartości
+# (isoparse z dateutil – dawna, parse_local na każdej dacie) z partią NumPy (update_db.new_rows).
+#
+#   python -m benchmarks.bench_update_filter --sensors 200 --hours 72 --new 24
+
+import argparse
+import copy
+import logging
+import sqlite3
+import statistics
+
+from dateutil.parser import isoparse
+
+from app import timestamps
+from app.database import create_tables, measurement_ts, DATE_TIME_FORMAT, INSERT_MEASUREMENT_SQL
+from app.update_db import insert_measurement, new_rows
+from benchmarks.common import synthetic_payload, timed
+
+
+def isoparse_per_value(cur, sensor_id, values, newest):
+    # Dawna ścieżka: isoparse dla każdej wartości, porównanie dat, INSERT wiersz po wierszu.
+    newest = timestamps.to_local_text(newest)
+    new_values = [v for v in values if v["value"] is not None
+                  and isoparse(v["date"]).replace(tzinfo=None).strftime(DATE_TIME_FORMAT) > newest]
+    for v in new_values:
+        cur.execute(INSERT_MEASUREMENT_SQL, (sensor_id, v["value"], timestamps.parse_local(v["date"])))
+    return len(new_values)
+
+
+def parse_per_value(cur, sensor_id, values, newest):
+    # Ścieżka sprzed partii: parser o stałym formacie na każdej dacie, warunek na każdym słowniku.
+    for v in values:
+        v["ts"] = timestamps.parse_local(v["date"])
+    new_values = [v for v in values if v["value"] is not None and measurement_ts(v) > newest]
+    for v in new_values:
+        insert_measurement(cur, sensor_id, v)
+    return len(new_values)
+
+
+def batched(cur, sensor_id, values, newest):
+    # Partia NumPy: daty całej odpowiedzi naraz (jak api_GIOS), jedno porównanie, executemany.
+    for v, ts in zip(values, timestamps.parse_local_many([v["date"] for v in values]).tolist()):
+        v["ts"] = ts
+    rows = new_rows(sensor_id, values, newest)
+    cur.executemany(INSERT_MEASUREMENT_SQL, rows)
+    return len(rows)
+
+
+PATHS = (("isoparse, wartość po wartości", isoparse_per_value),
+         ("parse_local, wartość po wartości", parse_per_value),
+         ("partia NumPy", batched))
+
+
+def run(conn, path, responses, newest, repeat):
+    times = []
+    for _ in range(repeat):
+        batch = copy.deepcopy(responses)
+        cur = conn.cursor()
+        elapsed, inserted = timed(lambda: sum(path(cur, sensor_id, values, newest) for sensor_id, values in batch))
+        conn.rollback()
+        times.append(elapsed / len(batch))
+    return statistics.median(times), inserted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark wyboru nowych pomiarów przy aktualizacji")
+    parser.add_argument("--sensors", type=int, default=200)
+    parser.add_argument("--hours", type=int, default=72, help="pomiarów w odpowiedzi API")
+    parser.add_argument("--new", type=int, default=24, help="z tego nowszych niż znak wodny")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    _, _, measurements = synthetic_payload(n_stations=args.sensors, n_sensors=1, n_hours=args.hours)
+    responses = [(sensor_id, data["values"]) for sensor_id, data in measurements.items()]
+    # Wartości od najnowszej (jak w GIOŚ) – znak wodny przed ostatnimi --new godzinami
+    newest = timestamps.parse_local(responses[0][1][min(args.new, args.hours - 1)]["date"])
+
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+    conn.commit()
+    results = [(label, *run(conn, path, responses, newest, args.repeat)) for label, path in PATHS]
+    base = results[0][1]
+    print(f"Sensorów: {len(responses)}, pomiarów w odpowiedzi: {args.hours}, nowych: {results[0][2] // len(responses)}")
+    for label, seconds, inserted in results:
+        print(f"{label:34s}: {seconds * 1e6:8.1f} µs/sensor | {base / seconds:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import contextlib
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from app import api_GIOS, database
+
+
+def synthetic_payload(n_stations=20, n_sensors=4, n_hours=72, seed=0):
+
+    # Buduje syntetyczną odpowiedź GIOŚ: stacje, sensory na stację i godzinowe pomiary.
+
+    rng = random.Random(seed)
+    params = [("PM10", "pył zawieszony PM10"), ("PM2.5", "pył zawieszony PM2.5"),
+              ("NO2", "dwutlenek azotu"), ("O3", "ozon"), ("SO2", "dwutlenek siarki"),
+              ("CO", "tlenek węgla")]
+    start = datetime(2024, 6, 1)
+    stations, sensors, measurements = [], {}, {}
+    for st in range(1, n_stations + 1):
+        stations.append({
+            "id": st,
+            "stationName": f"Stacja {st}",
+            "gegrLat": f"{49 + rng.random() * 5:.6f}",
+            "gegrLon": f"{14 + rng.random() * 10:.6f}",
+            "addressStreet": f"ul. Testowa {st}",
+            "city": {"name": f"Miasto {st % 50}",
+                     "commune": {"communeName": "Gmina", "provinceName": "WOJEWÓDZTWO"}},
+        })
+        sensors[st] = []
+        for k in range(n_sensors):
+            sensor_id = st * 100 + k
+            code, name = params[k % len(params)]
+            sensors[st].append({"id": sensor_id, "stationId": st,
+                                "param": {"paramCode": code, "paramName": name, "paramFormula": code}})
+            measurements[sensor_id] = {
+                "key": code,
+                "values": [
+                    {"date": (start + timedelta(hours=h)).strftime("%Y-%m-%d %H:%M:%S"),
+                     "value": None if rng.random() < 0.02 else round(rng.uniform(1, 120), 2)}
+                    for h in range(n_hours, 0, -1)
+                ],
+            }
+    return stations, sensors, measurements
+
+
+@contextlib.contextmanager
+def patched_api(payload):
+
+    # Podmienia funkcje api_GIOS tak, by zwracały dane z payloadu zamiast odpytywać GIOŚ.
+
+    stations, sensors, measurements = payload
+    with patch.object(api_GIOS, "get_all_stations", lambda *a, **kw: stations), \
+            patch.object(api_GIOS, "get_sensors_for_station", lambda sid, *a, **kw: sensors.get(sid, [])), \
+            patch.object(api_GIOS, "get_measurements_for_sensor", lambda sid, *a, **kw: measurements.get(sid, {})):
+        yield
+
+
+@contextlib.contextmanager
+def temp_database():
+
+    # Tymczasowa baza na dysku – podmienia database.DB_PATH na czas benchmarku.
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        with patch.object(database, "DB_PATH", path):
+            database.create_tables()
+            try:
+                yield path
+            finally:
+                database.close_connections()
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
@@ -0,0 +1,214 @@
+# Nagrywanie i odtwarzanie odpowiedzi GIOŚ na poziomie transportu HTTP (adapter requests),
+# dzięki czemu api_GIOS, update_db i ingest działają bez zmian, ale bez dostępu do sieci.
+# Nagranie to skompresowany plik JSON (.json.gz): ścieżka zapytania → status, nagłówki, treść.
+#
+#   python -m benchmarks.replay record gios.json.gz --stations 10
+#   python -m benchmarks.replay synthetic synthetic.json.gz --stations 200 --sensors 4 --hours 72
+#   python -m benchmarks.bench_ingest --cassette gios.json.gz --latency 0.05
+
+import argparse
+import contextlib
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from app import api_GIOS, http_client
+from benchmarks.common import synthetic_payload
+
+log = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+# Nagłówki zapisywane w nagraniu (walidatory potrzebne do zapytań warunkowych)
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+def request_key(method: str, url: str) -> str:
+    # Klucz nagrania niezależny od hosta i prefiksu API, np. "GET /data/getData/92".
+    parts = urlsplit(url)
+    path = parts.path.replace(urlsplit(api_GIOS.BASE_URL).path, "", 1)
+    return f"{method} {path}" + (f"?{parts.query}" if parts.query else "")
+
+
+class Cassette:
+
+    # Zbiór nagranych odpowiedzi. Bezpieczny dla wielu wątków (pobieranie równoległe).
+
+    def __init__(self, entries: dict | None = None):
+        self.entries = entries or {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, method: str, url: str, status: int, headers, body: bytes) -> None:
+        entry = {
+            "status": status,
+            "headers": {name: headers[name] for name in KEPT_HEADERS if name in headers},
+            "body": body.decode("utf-8"),
+        }
+        with self._lock:
+            self.entries[request_key(method, url)] = entry
+
+    def get(self, method: str, url: str) -> dict | None:
+        return self.entries.get(request_key(method, url))
+
+    def save(self, path: str) -> None:
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump({"version": FORMAT_VERSION, "entries": self.entries}, f, ensure_ascii=False)
+        log.info("Zapisano %d odpowiedzi do %s", len(self.entries), path)
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Nieobsługiwana wersja nagrania: {data.get('version')}")
+        return cls(data["entries"])
+
+    @classmethod
+    def from_payload(cls, payload) -> "Cassette":
+
+        # Nagranie z danych syntetycznych (benchmarks.common.synthetic_payload) –
+        # te same endpointy i format co prawdziwe API, z ETagiem liczonym z treści.
+
+        stations, sensors, measurements = payload
+        cassette = cls()
+        bodies = {"/station/findAll": stations}
+        bodies.update({f"/station/sensors/{sid}": value for sid, value in sensors.items()})
+        bodies.update({f"/data/getData/{sid}": value for sid, value in measurements.items()})
+        for path, body in bodies.items():
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            headers = {"Content-Type": "application/json", "ETag": '"%s"' % hashlib.md5(data).hexdigest()}
+            cassette.add("GET", api_GIOS.BASE_URL + path, 200, headers, data)
+        return cassette
+
+
+class RecordingAdapter(HTTPAdapter):
+
+    # Zwykły transport HTTP, który zapisuje udane odpowiedzi (200) do nagrania.
+
+    def __init__(self, cassette: Cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        if response.status_code == 200:
+            self.cassette.add(request.method, request.url, response.status_code, response.headers,
+                              response.content)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+
+    # Transport odtwarzający nagranie z zadanym opóźnieniem każdej odpowiedzi. Zapytanie
+    # spoza nagrania kończy się ConnectionError (jak brak sieci), a zgodny If-None-Match – 304.
+
+    def __init__(self, cassette: Cassette, latency: float = 0.0):
+        super().__init__()
+        self.cassette = cassette
+        self.latency = latency
+        self.requests = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        entry = self.cassette.get(request.method, request.url)
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            raise requests.ConnectionError(f"Brak w nagraniu: {request_key(request.method, request.url)}",
+                                           request=request)
+
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        etag = entry["headers"].get("ETag")
+        if etag and request.headers.get("If-None-Match") == etag:
+            response.status_code, response.reason, response._content = 304, "Not Modified", b""
+        else:
+            response.status_code, response.reason = entry["status"], "OK"
+            response._content = entry["body"].encode("utf-8")
+        response.encoding = "utf-8"
+        return response
+
+    def close(self):
+        pass
+
+
+@contextlib.contextmanager
+def recording(path: str):
+
+    # Nagrywa wszystkie zapytania wspólnej sesji HTTP; na koniec dopisuje je do pliku path.
+
+    cassette = Cassette.load(path) if os.path.exists(path) else Cassette()
+    http_client.set_transport(RecordingAdapter(cassette, pool_maxsize=http_client.DEFAULT_WORKERS))
+    try:
+        yield cassette
+    finally:
+        http_client.set_transport(None)
+        cassette.save(path)
+
+
+@contextlib.contextmanager
+def replaying(source, latency: float = 0.0):
+
+    # Odtwarza nagranie (ścieżka pliku albo Cassette) zamiast łączyć się z GIOŚ.
+
+    cassette = source if isinstance(source, Cassette) else Cassette.load(source)
+    adapter = ReplayAdapter(cassette, latency=latency)
+    http_client.set_transport(adapter)
+    try:
+        yield adapter
+    finally:
+        http_client.set_transport(None)
+
+
+def record_api(limit: int | None = None) -> None:
+    # Odpytuje GIOŚ tak jak pełne pobieranie: stacje, sensory i pomiary (limit – liczba stacji).
+    stations = api_GIOS.get_all_stations(raise_errors=True)
+    for station in stations[:limit]:
+        for sensor in api_GIOS.get_sensors_for_station(station["id"]):
+            api_GIOS.get_measurements_for_sensor(sensor["id"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nagrania odpowiedzi API GIOŚ")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="nagraj odpowiedzi prawdziwego API")
+    record.add_argument("path")
+    record.add_argument("--stations", type=int, default=None, help="ile stacji nagrać (domyślnie wszystkie)")
+    synthetic = commands.add_parser("synthetic", help="zapisz syntetyczne dane jako nagranie")
+    synthetic.add_argument("path")
+    synthetic.add_argument("--stations", type=int, default=20)
+    synthetic.add_argument("--sensors", type=int, default=4, help="sensorów na stację")
+    synthetic.add_argument("--hours", type=int, default=72)
+    synthetic.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "record":
+        with recording(args.path) as cassette:
+            record_api(args.stations)
+        print(f"Nagrano {len(cassette)} odpowiedzi do {args.path}")
+    else:
+        cassette = Cassette.from_payload(synthetic_payload(args.stations, args.sensors, args.hours, args.seed))
+        cassette.save(args.path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import collections
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class GiosStubServer:
+
+    # Lokalny serwer HTTP udający REST API GIOŚ (findAll, sensors, getData) ze sztucznym
+    # opóźnieniem każdej odpowiedzi. Dane pochodzą z payloadu (stations, sensors, measurements),
+    # np. z benchmarks.common.synthetic_payload. inject() pozwala zasymulować awarie
+    # pojedynczych zapytań (kod błędu HTTP albo zawieszenie odpowiedzi).
+
+    ROUTES = [
+        (re.compile(r"^/station/findAll$"), "stations"),
+        (re.compile(r"^/station/sensors/(\d+)$"), "sensors"),
+        (re.compile(r"^/data/getData/(\d+)$"), "measurements"),
+    ]
+
+    def __init__(self, payload, latency: float = 0.0):
+        self.stations, self.sensors, self.measurements = payload
+        self.latency = latency
+        self.requests = 0
+        self.not_modified = 0
+        self.hits = collections.Counter()
+        self.faults = collections.defaultdict(collections.deque)
+        self.max_in_flight = 0
+        self.connections = set()
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def inject(self, path, *faults):
+        # Kolejne zapytania o path: int – odpowiedź z tym kodem błędu,
+        # float – opóźnienie o tyle sekund przed normalną odpowiedzią.
+        with self._lock:
+            self.faults[path].extend(faults)
+
+    def resolve(self, path):
+        for pattern, kind in self.ROUTES:
+            match = pattern.match(path)
+            if not match:
+                continue
+            if kind == "stations":
+                return self.stations
+            key = int(match.group(1))
+            source = self.sensors if kind == "sensors" else self.measurements
+            return source.get(key)
+        return None
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, żeby dało się sprawdzić ponowne użycie połączeń po stronie klienta
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                path = self.path.split("?")[0].replace("/pjp-api/rest", "")
+                with stub._lock:
+                    stub.requests += 1
+                    stub.hits[path] += 1
+                    fault = stub.faults[path].popleft() if stub.faults[path] else None
+                    stub.connections.add(self.client_address)
+                    stub._in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub._in_flight)
+                try:
+                    if stub.latency:
+                        time.sleep(stub.latency)
+                    if isinstance(fault, int):
+                        self.send_error(fault)
+                        return
+                    if fault:
+                        time.sleep(fault)
+                    body = stub.resolve(path)
+                    if body is None:
+                        self.send_error(404)
+                        return
+                    data = json.dumps(body).encode("utf-8")
+                    # Walidator jak w prawdziwym API: ETag z treści, 304 przy zgodnym If-None-Match
+                    etag = '"%s"' % hashlib.md5(data).hexdigest()
+                    if self.headers.get("If-None-Match") == etag:
+                        with stub._lock:
+                            stub.not_modified += 1
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(200)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                finally:
+                    with stub._lock:
+                        stub._in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
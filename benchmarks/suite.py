@@ -0,0 +1,284 @@
+# Zestaw benchmarków całej ścieżki danych: pobieranie pełne (ingest), aktualizacja miasta,
+# analiza, dane wykresu, wyszukiwanie w promieniu i wybór stacji miasta – na syntetycznych
+# bazach o zadanej liczbie pomiarów. Zapytania HTTP idą do nagrania (benchmarks/replay.py).
+# Wyniki zapisywane są jako JSON; z --baseline porównywane z zapisanym wcześniej plikiem,
+# a regresja powyżej tolerancji kończy program kodem 1.
+#
+#   python -m benchmarks.suite --sizes 10k,1m --output wyniki.json
+#   python -m benchmarks.suite --sizes 10k --baseline wyniki.json --tolerance 0.25
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from app import database, ingest, metadata, rollups, spatial
+from app.analysis import analyze_measurements_to_text
+from app.database import (
+    connect, create_tables, station_row, sensor_row, get_series, get_city_names,
+    INSERT_STATION_SQL, INSERT_SENSOR_SQL, INSERT_MEASUREMENT_SQL, DATE_TIME_FORMAT
+)
+from app.timestamps import parse_local, to_local_text
+from app.update_db import update_city_measurements
+from benchmarks.common import synthetic_payload, timed
+from benchmarks.replay import Cassette, replaying
+
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+STATIONS = 100
+SENSORS_PER_STATION = 4
+# Stacje "Miasto {i % 50}" – po dwie na miasto
+CITY = "Miasto 7"
+# Pełne pobieranie przechodzi przez JSON i HTTP – jego wielkość jest ograniczona
+INGEST_MAX_ROWS = 200_000
+# GIOŚ zwraca ok. 3 doby pomiarów; przy aktualizacji nowa jest ostatnia doba
+API_WINDOW_HOURS = 72
+NEW_HOURS = 24
+END = datetime(2024, 6, 30)
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.25
+# Różnice poniżej progu (s) to szum pomiaru, nie regresja
+MIN_DELTA = 0.002
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    return SIZES[text] if text in SIZES else int(text)
+
+
+def size_label(rows: int) -> str:
+    for label, value in SIZES.items():
+        if value == rows:
+            return label
+    return str(rows)
+
+
+def _hourly_values(sensor_id: int, hours: int, end: datetime):
+    # Deterministyczny szereg godzinowy kończący się w end (od najnowszego, jak w GIOŚ).
+    rng = random.Random(sensor_id)
+    last = parse_local(end.strftime(DATE_TIME_FORMAT))
+    return [
+        {"date": to_local_text(last - h * 3600), "value": round(rng.uniform(1, 120), 2)}
+        for h in range(hours)
+    ]
+
+
+def build_database(path: str, rows: int) -> dict:
+
+    # Syntetyczna baza: STATIONS stacji × SENSORS_PER_STATION sensorów, pomiary godzinowe
+    # kończące się w END (rows pomiarów łącznie), agregaty, znaki wodne i świeży cache metadanych.
+
+    stations, sensors, _ = synthetic_payload(STATIONS, SENSORS_PER_STATION, n_hours=0)
+    sensor_ids = [s["id"] for st in stations for s in sensors[st["id"]]]
+    hours = max(1, rows // len(sensor_ids))
+
+    conn = connect(path)
+    create_tables(conn)
+    with conn:
+        conn.executemany(INSERT_STATION_SQL, [station_row(s) for s in stations])
+        conn.executemany(INSERT_SENSOR_SQL, [sensor_row(s, st["id"]) for st in stations for s in sensors[st["id"]]])
+        metadata.mark_synced(conn, metadata.STATIONS_RESOURCE,
+                             *(metadata.sensors_resource(st["id"]) for st in stations))
+    start = parse_local(END.strftime(DATE_TIME_FORMAT)) - (hours - 1) * 3600
+    for sensor_id in sensor_ids:
+        rng = random.Random(sensor_id)
+        conn.executemany(INSERT_MEASUREMENT_SQL, (
+            (sensor_id, round(rng.uniform(1, 120), 2), start + h * 3600)
+            for h in range(hours)
+        ))
+    conn.execute(
+        "INSERT OR REPLACE INTO sensor_sync_state (sensor_id, last_ts) "
+        "SELECT sensor_id, MAX(ts) FROM measurements GROUP BY sensor_id"
+    )
+    conn.commit()
+    rollups.rebuild(conn)
+    conn.close()
+
+    city_stations = [st for st in stations if st["city"]["name"] == CITY]
+    return {
+        "rows": hours * len(sensor_ids),
+        "hours": hours,
+        "sensor_id": sensor_ids[0],
+        "city_sensors": [s["id"] for st in city_stations for s in sensors[st["id"]]],
+        "center": (float(city_stations[0]["gegrLat"]), float(city_stations[0]["gegrLon"])),
+    }
+
+
+def measure(fn, *, repeat: int, setup=None) -> dict:
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        elapsed, _ = timed(fn)
+        times.append(elapsed)
+    return {"min_s": min(times), "median_s": statistics.median(times), "repeat": repeat}
+
+
+def bench_ingest(rows: int, repeat: int) -> dict:
+
+    # Pełne pobieranie (fetch_and_save_all_data) z nagrania do pustej bazy.
+
+    rows = min(rows, INGEST_MAX_ROWS)
+    hours = max(1, rows // (STATIONS * SENSORS_PER_STATION))
+    cassette = Cassette.from_payload(synthetic_payload(STATIONS, SENSORS_PER_STATION, hours))
+    with tempfile.TemporaryDirectory() as tmp, replaying(cassette):
+        paths = iter(os.path.join(tmp, f"ingest{i}.db") for i in range(repeat))
+        target = {}
+
+        def setup():
+            target["conn"] = connect(next(paths))
+
+        def run():
+            try:
+                ingest.fetch_and_save_all_data(conn=target["conn"])
+            finally:
+                target["conn"].close()
+
+        result = measure(run, repeat=repeat, setup=setup)
+    result["rows"] = hours * STATIONS * SENSORS_PER_STATION
+    return result
+
+
+def bench_update_city(conn: sqlite3.Connection, info: dict, repeat: int) -> dict:
+
+    # Aktualizacja miasta (update_city_measurements): API zwraca ostatnie API_WINDOW_HOURS
+    # godzin, z czego NEW_HOURS nowych. Przed każdym powtórzeniem baza wraca do stanu sprzed.
+
+    sensors = info["city_sensors"]
+    new_end = END + timedelta(hours=NEW_HOURS)
+    payload = ([], {}, {sid: {"key": "X", "values": _hourly_values(sid, API_WINDOW_HOURS, new_end)}
+                        for sid in sensors})
+    marks = ",".join("?" for _ in sensors)
+    watermark = parse_local(END.strftime(DATE_TIME_FORMAT))
+
+    def setup():
+        with conn:
+            conn.execute(f"DELETE FROM measurements WHERE sensor_id IN ({marks}) AND ts > ?",
+                         (*sensors, watermark))
+            conn.execute(f"UPDATE sensor_sync_state SET last_ts = ?, last_fetch = NULL, etag = NULL, "
+                         f"last_modified = NULL WHERE sensor_id IN ({marks})", (watermark, *sensors))
+
+    with replaying(Cassette.from_payload(payload)):
+        result = measure(lambda: update_city_measurements(CITY, conn=conn), repeat=repeat, setup=setup)
+    result["rows"] = NEW_HOURS * len(sensors)
+    return result
+
+
+def run_size(rows: int, repeat: int) -> dict:
+    results = {"ingest": bench_ingest(rows, repeat)}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        info = build_database(path, rows)
+        with patch.object(database, "DB_PATH", path):
+            try:
+                conn = database.get_connection()
+                sensor_id = info["sensor_id"]
+                month_from = (END - timedelta(days=30)).strftime("%Y-%m-%d")
+                lat, lon = info["center"]
+
+                results["update_city"] = bench_update_city(conn, info, repeat)
+                results["analysis_30d"] = measure(
+                    lambda: analyze_measurements_to_text(sensor_id, month_from, END), repeat=repeat)
+                results["analysis_full"] = measure(
+                    lambda: analyze_measurements_to_text(sensor_id), repeat=repeat)
+                results["plot_data_30d"] = measure(
+                    lambda: get_series(sensor_id, month_from, END, conn=conn), repeat=repeat)
+                results["plot_data_full"] = measure(lambda: get_series(sensor_id, conn=conn), repeat=repeat)
+                results["radius_search"] = measure(
+                    lambda: spatial.stations_within(lat, lon, 50, conn=conn), repeat=repeat)
+                results["nearest_stations"] = measure(
+                    lambda: spatial.nearest_stations(lat, lon, 5, conn=conn), repeat=repeat)
+                results["city_names"] = measure(get_city_names, repeat=repeat)
+                results["city_stations"] = measure(
+                    lambda: metadata.get_stations_in_city(CITY, conn=conn), repeat=repeat)
+            finally:
+                database.close_connections()
+    for result in results.values():
+        result.setdefault("rows", info["rows"])
+    return results
+
+
+def run_suite(sizes: list[int], repeat: int = DEFAULT_REPEAT) -> dict:
+    results = {}
+    for rows in sizes:
+        for name, result in run_size(rows, repeat).items():
+            results[f"{size_label(rows)}/{name}"] = result
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE,
+            min_delta: float = MIN_DELTA) -> list[dict]:
+
+    # Porównanie median z wynikami bazowymi (wspólne przypadki). Regresja: wolniej
+    # o więcej niż tolerance (względnie) i więcej niż min_delta sekund (bezwzględnie).
+
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        now_s, base_s = result["median_s"], base["median_s"]
+        ratio = now_s / base_s if base_s > 0 else float("inf")
+        rows.append({
+            "name": name,
+            "baseline_s": base_s,
+            "current_s": now_s,
+            "ratio": ratio,
+            "regression": ratio > 1 + tolerance and now_s - base_s > min_delta,
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarki całej ścieżki danych GIOŚ")
+    parser.add_argument("--sizes", default="10k", help="liczby pomiarów w bazie, np. 10k,1m,10m")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--output", help="plik JSON z wynikami")
+    parser.add_argument("--baseline", help="plik JSON z wynikami bazowymi do porównania")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="dopuszczalne względne spowolnienie (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    start = time.perf_counter()
+    report = run_suite([parse_size(s) for s in args.sizes.split(",")], repeat=args.repeat)
+    for name, result in report["results"].items():
+        print(f"{name:28s} {result['median_s'] * 1000:10.2f} ms (min {result['min_s'] * 1000:.2f}, "
+              f"{result['rows']} wierszy)")
+    print(f"Czas całkowity: {time.perf_counter() - start:.1f} s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.tolerance)
+        for row in rows:
+            flag = "REGRESJA" if row["regression"] else ""
+            print(f"{row['name']:28s} {row['baseline_s'] * 1000:10.2f} → {row['current_s'] * 1000:10.2f} ms "
+                  f"({row['ratio']:5.2f}x) {flag}")
+        if any(row["regression"] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
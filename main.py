@@ -1,5 +1,6 @@
 # main.py – uruchamia aplikację GUI
 
+from app import startup  # noqa: F401 – początek pomiaru czasu startu
 from app.gui import run_gui_with_tabs
 
 if __name__ == "__main__":
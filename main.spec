@@ -6,11 +6,14 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('data/air_quality.db', 'data')],
-    hiddenimports=[],
+    # Moduły importowane leniwie (w funkcjach) są wykrywane przez analizę importów,
+    # ale preload w tle ładuje je po nazwie – wymieniamy je jawnie
+    hiddenimports=['pandas', 'matplotlib.backends.backend_tkagg', 'folium', 'app.archive', 'pyarrow.dataset'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Nieużywane zestawy GUI/narzędzia – mniej do rozpakowania przy każdym starcie .exe
+    excludes=['PyQt5', 'PyQt6', 'PySide2', 'PySide6', 'IPython', 'pytest'],
     noarchive=False,
     optimize=0,
 )
@@ -26,7 +29,8 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    # Bez UPX: biblioteki nie są dekompresowane przy każdym uruchomieniu
+    upx=False,
     upx_exclude=[],
     runtime_tmpdir=None,
     console=False,
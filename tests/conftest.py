@@ -0,0 +1,12 @@
+import pytest
+
+from app.database import connect, create_tables
+
+
+@pytest.fixture
+def db(tmp_path):
+    # Świeża baza w pliku (archiwum Parquet powstaje obok niej) z pełnym schematem aplikacji
+    conn = connect(str(tmp_path / "air.db"))
+    create_tables(conn)
+    yield conn
+    conn.close()
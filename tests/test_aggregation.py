@@ -0,0 +1,64 @@
+import random
+
+import numpy as np
+import pytest
+
+from app import analysis
+from app.aggregation import summarize_sensors, summarize_sensor
+from app.database import INSERT_MEASUREMENT_SQL
+from app.timestamps import parse_local
+
+
+@pytest.fixture
+def db(db):
+    conn = db
+    rng = random.Random(1)
+    rows = [(sensor_id, round(rng.uniform(0, 100) + 0.5 * h, 2), f"2024-06-{1 + h // 24:02d} {h % 24:02d}:00:00")
+            for sensor_id in (10, 11) for h in range(240)]
+    conn.executemany(INSERT_MEASUREMENT_SQL, [(s, v, parse_local(d)) for s, v, d in rows])
+    return conn, rows
+
+# --- Statystyki z SQL zgadzają się z obliczeniami w NumPy ---
+def test_summary_matches_numpy(db):
+    conn, rows = db
+    values = np.array([v for s, v, _ in rows if s == 10 and "2024-06-03" <= _ <= "2024-06-08 00:00:00"])
+
+    summary = summarize_sensor(10, "2024-06-03", "2024-06-08", conn=conn)
+
+    assert summary["count"] == len(values)
+    assert summary["min"] == values.min()
+    assert summary["max"] == values.max()
+    assert summary["mean"] == pytest.approx(values.mean())
+    assert summary["std"] == pytest.approx(values.std(ddof=1))
+    for p, v in summary["percentiles"].items():
+        assert v == pytest.approx(np.percentile(values, p * 100))
+    hours = np.arange(len(values)) / 24
+    assert summary["slope_per_day"] == pytest.approx(np.polyfit(hours, values, 1)[0], rel=1e-6)
+    assert summary["first_time"] == "2024-06-03 00:00:00"
+    assert summary["last_time"] == "2024-06-08 00:00:00"
+    assert summary["first"] == values[0] and summary["last"] == values[-1]
+
+# --- Jedno wywołanie obsługuje wiele sensorów, sensory bez danych są pomijane ---
+def test_summarize_many_sensors(db):
+    conn, _ = db
+
+    summaries = summarize_sensors([10, 11, 99], conn=conn)
+
+    assert set(summaries) == {10, 11}
+    assert all(s["count"] == 240 for s in summaries.values())
+
+# --- Kierunek trendu w analizie wynika z nachylenia regresji, nie z pierwszego/ostatniego pomiaru ---
+def test_analysis_trend_follows_slope(db, monkeypatch):
+    conn, _ = db
+    # Rosnący szereg z ostatnim pomiarem niższym niż pierwszy
+    values = [10.0 + h for h in range(48)] + [5.0]
+    conn.executemany(INSERT_MEASUREMENT_SQL, [(12, v, parse_local("2024-06-01 00:00:00") + h * 3600)
+                                              for h, v in enumerate(values)])
+    monkeypatch.setattr(analysis, "summarize_sensor", lambda *a, **kw: summarize_sensor(*a, conn=conn, **kw))
+    monkeypatch.setattr(analysis, "series_level", lambda *a: None)
+
+    summary = summarize_sensor(12, conn=conn)
+    assert summary["last"] < summary["first"] and summary["slope_per_day"] > 0
+    text = analysis.analyze_measurements_to_text(12)
+    assert f"Trend: wzrastający ({summary['slope_per_day']:+.2f}" in text
+    assert analysis.trend_name(-0.004) == "stabilny" and analysis.trend_name(-0.5) == "malejący"
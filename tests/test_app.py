@@ -1,37 +1,23 @@
 import os
 import sqlite3
 import sys
+import time
 from unittest.mock import patch
 
 import pytest
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
-from app.update_db import update_city_measurements
+from app import http_client, update_db
+from app.update_db import new_rows, update_city_measurements, update_many
+from app.database import create_tables
+from app.timestamps import parse_local, to_local_text
 
 
 @pytest.fixture
 def create_test_db():
+    # Baza w pamięci z pełnym schematem aplikacji (łącznie z kluczem unikalnym pomiarów)
     conn = sqlite3.connect(":memory:")
-    cur = conn.cursor()
-    cur.executescript("""
-        CREATE TABLE stations (
-            id INTEGER PRIMARY KEY,
-            city TEXT NOT NULL
-        );
-        CREATE TABLE sensors (
-            id INTEGER PRIMARY KEY,
-            param_name TEXT,
-            station_id INTEGER,
-            FOREIGN KEY (station_id) REFERENCES stations(id)
-        );
-        CREATE TABLE measurements (
-            id INTEGER PRIMARY KEY,
-            sensor_id INTEGER,
-            date_time TEXT,
-            value REAL,
-            FOREIGN KEY (sensor_id) REFERENCES sensors(id)
-        );
-    """)
+    create_tables(conn)
     return conn
 
 # --- Test gdy brak stacji ---
@@ -50,8 +36,8 @@ def test_update_city_no_new_data(mock_get, create_test_db):
     # Wstawiamy dane testowe
     cur.execute("INSERT INTO stations (id, city) VALUES (1, 'Testowo')")
     cur.execute("INSERT INTO sensors (id, param_name, station_id) VALUES (10, 'PM10', 1)")
-    cur.execute("INSERT INTO measurements (sensor_id, date_time, value) VALUES (?, ?, ?)", (
-        10, "2024-06-01T10:00:00", 42.0
+    cur.execute("INSERT INTO measurements (sensor_id, ts, value) VALUES (?, ?, ?)", (
+        10, parse_local("2024-06-01T10:00:00"), 42.0
     ))
     conn.commit()
 
@@ -124,3 +110,129 @@ def test_update_city_calls_progress_cb(mock_get, create_test_db):
     assert result == 1
     assert called == [(1, 1)]
 
+
+# --- Wiele miast naraz: wspólne pobieranie, wyniki per miasto ---
+@patch("app.update_db.api_GIOS.get_measurements_for_sensor")
+def test_update_many_reports_per_city(mock_get, create_test_db):
+    conn = create_test_db
+    cur = conn.cursor()
+    cur.executemany("INSERT INTO stations (id, city) VALUES (?, ?)", [(1, "Łódź"), (2, "Kraków"), (3, "Kraków")])
+    cur.executemany("INSERT INTO sensors (id, param_name, station_id) VALUES (?, 'PM10', ?)",
+                    [(10, 1), (20, 2), (30, 3), (31, 3)])
+    conn.commit()
+
+    def fake_get(sensor_id, **kwargs):
+        if sensor_id == 31:
+            raise Exception("Błąd API")
+        return {"values": [{"date": "2024-06-12 08:00:00", "value": 1.0},
+                           {"date": "2024-06-12 09:00:00", "value": 2.0}]}
+    mock_get.side_effect = fake_get
+
+    called = []
+    results = update_many(["Łódź", " kraków ", "Nigdzie"], conn=conn, progress_cb=lambda *a: called.append(a))
+    assert list(results) == ["Łódź", "kraków", "Nigdzie"]
+    assert results["Łódź"][:4] == (1, 1, 2, 0)
+    assert results["kraków"][:4] == (3, 3, 4, 1)
+    assert results["Nigdzie"][:4] == (0, 0, 0, 0)
+    assert all(result.seconds >= 0 for result in results.values())
+    assert [done for done, _ in called] == [1, 2, 3, 4] and {total for _, total in called} == {4}
+
+    # cities=None: wszystkie miasta ze stacjami w bazie; świeżo odpytane sensory są pomijane
+    results = update_many(conn=conn)
+    assert sorted(results) == ["Kraków", "Łódź"]
+    assert results["Kraków"].fetched == 1 and results["Łódź"].fetched == 0
+
+
+# --- Nazwy różniące się wielkością liter to jedno miasto; pula HTTP rośnie do liczby wątków ---
+@patch("app.update_db.api_GIOS.get_measurements_for_sensor")
+def test_update_many_dedupes_city_case_and_sizes_pool(mock_get, create_test_db, monkeypatch):
+    conn = create_test_db
+    cur = conn.cursor()
+    cur.executemany("INSERT INTO stations (id, city) VALUES (?, ?)", [(1, "Kraków"), (2, "Łódź")])
+    cur.executemany("INSERT INTO sensors (id, param_name, station_id) VALUES (?, 'PM10', ?)",
+                    [(sensor_id, 1) for sensor_id in range(100, 120)] + [(200, 2)])
+    conn.commit()
+    mock_get.return_value = {"values": [{"date": "2024-06-12 08:00:00", "value": 1.0}]}
+    monkeypatch.setattr(http_client, "_pool_size", http_client.DEFAULT_WORKERS)
+
+    results = update_many(["Kraków", "kraków", "ŁÓDŹ", "łódź"], conn=conn, workers=16)
+
+    assert list(results) == ["Kraków", "ŁÓDŹ"]
+    assert results["Kraków"][:3] == (20, 20, 20) and results["ŁÓDŹ"][:3] == (1, 1, 1)
+    assert sorted(call.args[0] for call in mock_get.call_args_list) == [*range(100, 120), 200]
+    assert http_client._pool_size == 16
+
+
+# --- Zapis partiami w krótkich transakcjach: w czasie pobierania inni mogą pisać do bazy ---
+@patch("app.update_db.api_GIOS.get_measurements_for_sensor")
+def test_update_commits_each_batch_before_next_fetch(mock_get, tmp_path, monkeypatch):
+    path = str(tmp_path / "db.sqlite")
+    conn = sqlite3.connect(path)
+    create_tables(conn)
+    conn.execute("INSERT INTO stations (id, city) VALUES (1, 'Partiowo')")
+    conn.executemany("INSERT INTO sensors (id, param_name, station_id) VALUES (?, 'PM10', 1)", [(10,), (20,)])
+    conn.commit()
+    monkeypatch.setattr(update_db, "WRITE_BATCH_SIZE", 1)
+    writes = []
+
+    def fake_get(sensor_id, **kwargs):
+        if sensor_id == 20:
+            # Partia sensora 10 jest już zatwierdzona, a blokada zapisu zwolniona
+            other = sqlite3.connect(path, timeout=0)
+            deadline = time.monotonic() + 5
+            while not other.execute("SELECT COUNT(*) FROM measurements").fetchone()[0]:
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+            with other:
+                other.execute("INSERT INTO sensor_sync_state (sensor_id, views) VALUES (99, 1)")
+            other.close()
+            writes.append(sensor_id)
+        return {"values": [{"date": "2024-06-12 08:00:00", "value": float(sensor_id)}]}
+    mock_get.side_effect = fake_get
+
+    assert update_city_measurements("Partiowo", conn=conn, workers=1) == 2
+    assert writes == [20]
+    assert conn.execute("SELECT COUNT(*) FROM sensor_sync_state WHERE last_fetch IS NOT NULL").fetchone()[0] == 2
+
+
+# --- Znak wodny sensora zapisywany razem z pomiarami, porównanie niezależne od separatora "T" ---
+@patch("app.update_db.api_GIOS.get_measurements_for_sensor")
+def test_update_city_advances_sync_state(mock_get, create_test_db):
+    conn = create_test_db
+    cur = conn.cursor()
+    cur.execute("INSERT INTO stations (id, city) VALUES (1, 'Znakowo')")
+    cur.execute("INSERT INTO sensors (id, param_name, station_id) VALUES (10, 'NO2', 1)")
+    conn.commit()
+
+    mock_get.return_value = {"values": [
+        {"date": "2024-06-12 09:00:00", "value": 20.0},
+        {"date": "2024-06-12 08:00:00", "value": 18.0},
+    ]}
+    assert update_city_measurements("Znakowo", conn=conn) == 2
+    last_ts, last_fetch = cur.execute(
+        "SELECT last_ts, last_fetch FROM sensor_sync_state WHERE sensor_id = 10").fetchone()
+    assert to_local_text(last_ts) == "2024-06-12 09:00:00"
+    assert last_fetch is not None
+
+    # Ten sam pomiar w formacie z "T" nie jest traktowany jako nowy
+    mock_get.return_value = {"values": [
+        {"date": "2024-06-12T09:00:00", "value": 20.0},
+        {"date": "2024-06-12T10:00:00", "value": 21.0},
+    ]}
+    assert update_city_measurements("Znakowo", conn=conn, force=True) == 1
+
+# --- Wybór nowych pomiarów jedną operacją na tablicach ---
+def test_new_rows_filters_batch_against_watermark():
+    values = [
+        {"date": "2024-06-12 10:00:00", "value": 21.5},
+        {"date": "2024-06-12 09:00:00", "value": None},
+        {"date": "2024-06-12 08:00:00", "value": 18},
+        {"date": "2024-06-12 07:00:00", "value": 17.0},
+    ]
+    newest = parse_local("2024-06-12 07:00:00")
+    assert new_rows(10, values, newest) == [
+        (10, 21.5, parse_local("2024-06-12 10:00:00")),
+        (10, 18.0, parse_local("2024-06-12 08:00:00")),
+    ]
+    assert len(new_rows(10, values, None)) == 3
+    assert new_rows(10, [], newest) == []
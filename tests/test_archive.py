@@ -0,0 +1,122 @@
+from datetime import datetime
+
+import pytest
+
+from app import archive, rollups
+from app.aggregation import summarize_sensor
+from app.database import get_measurements_range, get_series, INSERT_MEASUREMENT_SQL
+from app.timestamps import parse_local, to_local_text
+
+NOW = datetime(2024, 6, 15)
+
+
+def hourly(sensor_id, start, hours):
+    # Co godzinę w czasie UTC – przy zmianie czasu lokalnego bez luk i powtórzeń
+    first = parse_local(start.strftime("%Y-%m-%d %H:%M:%S"))
+    return [(sensor_id, round(1 + (h * 7) % 90 + 0.25, 2), first + h * 3600) for h in range(hours)]
+
+
+@pytest.fixture
+def db(db):
+    rows = hourly(1, datetime(2023, 1, 1), 24 * 500) + hourly(2, datetime(2024, 1, 1), 24 * 10)
+    with db:
+        db.executemany(INSERT_MEASUREMENT_SQL, rows)
+        rollups.rebuild(db)
+    return db
+
+
+def as_rows(df):
+    return [(ts.strftime("%Y-%m-%d %H:%M:%S"), pytest.approx(value, abs=1e-5))
+            for ts, value in zip(df["date_time"], df["value"])]
+
+# --- Archiwizacja: stare miesiące do Parquetu, zapytanie zakresowe bez zmian ---
+def test_archive_moves_old_months_and_range_query_is_transparent(db, tmp_path):
+    before = as_rows(get_measurements_range(1, "2023-03-10", "2023-08-20", conn=db))
+    summary = archive.archive_measurements(db, max_age_days=180, now=NOW)
+
+    assert summary["cutoff"] == "2023-12-01 00:00:00"
+    assert summary["sensors"] == 1 and summary["rows"] == 24 * 334
+    assert summary["sqlite_bytes_after"] < summary["sqlite_bytes_before"]
+    assert (tmp_path / "archive" / "sensor_id=1" / "month=2023-05" / "part.parquet").exists()
+    assert to_local_text(db.execute("SELECT MIN(ts) FROM measurements WHERE sensor_id = 1").fetchone()[0]) == (
+        "2023-12-01 00:00:00")
+
+    assert as_rows(get_measurements_range(1, "2023-03-10", "2023-08-20", conn=db)) == before
+    # zakres przez granicę archiwum: część z Parquetu, część z SQLite
+    across = get_measurements_range(1, "2023-11-30 22:00:00", "2023-12-01 01:00:00", conn=db)
+    assert [ts.strftime("%H:%M") for ts in across["date_time"]] == ["22:00", "23:00", "00:00", "01:00"]
+    assert len(get_measurements_range(1, conn=db)) == 24 * 500
+
+
+def test_archive_is_idempotent_and_merges_late_rows(db):
+    archive.archive_measurements(db, max_age_days=180, now=NOW)
+    # spóźniony pomiar sprzed granicy (korekta) – trafia do SQLite i wygrywa z archiwum
+    with db:
+        db.execute(INSERT_MEASUREMENT_SQL, (1, 999.0, parse_local("2023-05-01 10:00:00")))
+    df = get_measurements_range(1, "2023-05-01 09:00:00", "2023-05-01 11:00:00", conn=db)
+    assert df["value"].tolist()[1] == 999.0 and len(df) == 3
+
+    summary = archive.archive_measurements(db, max_age_days=180, now=NOW)
+    assert summary["rows"] == 1
+    df = get_measurements_range(1, "2023-05-01 09:00:00", "2023-05-01 11:00:00", conn=db)
+    assert df["value"].tolist()[1] == 999.0 and len(df) == 3
+
+# --- Statystyki surowych pomiarów obejmują archiwum (także przez granicę archiwum) ---
+@pytest.mark.parametrize("date_from, date_to", [("2023-03-10", "2023-08-20"), ("2023-11-20", "2023-12-10")])
+def test_raw_statistics_include_archive(db, date_from, date_to):
+    before = summarize_sensor(1, date_from, date_to, conn=db)
+    archive.archive_measurements(db, max_age_days=180, now=NOW)
+    after = summarize_sensor(1, date_from, date_to, conn=db)
+
+    assert after["count"] == before["count"]
+    for key in ("min", "max", "mean", "std", "slope_per_day", "first", "last"):
+        assert after[key] == pytest.approx(before[key], rel=1e-6, abs=1e-6)
+    assert after["percentiles"] == pytest.approx(before["percentiles"], rel=1e-6)
+    for key in ("min_time", "max_time", "first_time", "last_time"):
+        assert after[key] == before[key]
+
+
+# --- Spóźniony pomiar w zarchiwizowanym miesiącu: kubełki scalają archiwum i SQLite ---
+def test_late_row_in_archived_month_keeps_rollup_counts(db):
+    bucket_sql = "SELECT count, max FROM {table} WHERE sensor_id = 1 AND bucket = ?"
+    monthly = db.execute(bucket_sql.format(table="measurements_monthly"), ("2023-05-01 00:00:00",)).fetchone()
+    archive.archive_measurements(db, max_age_days=180, now=NOW)
+
+    late = parse_local("2023-05-01 10:30:00")
+    with db:
+        db.execute(INSERT_MEASUREMENT_SQL, (1, 999.0, late))
+        rollups.refresh(db, {1: (late, late)})
+
+    def buckets():
+        return (db.execute(bucket_sql.format(table="measurements_monthly"), ("2023-05-01 00:00:00",)).fetchone(),
+                db.execute(bucket_sql.format(table="measurements_daily"), ("2023-05-01 00:00:00",)).fetchone(),
+                db.execute(bucket_sql.format(table="measurements_hourly"), ("2023-05-01 10:00:00",)).fetchone())
+
+    assert buckets() == ((monthly[0] + 1, 999.0), (25, 999.0), (2, 999.0))
+    # pełne przeliczenie daje to samo
+    rollups.rebuild(db)
+    assert buckets() == ((monthly[0] + 1, 999.0), (25, 999.0), (2, 999.0))
+
+
+# --- Odczyt: filtr po miesiącu i ts czyta tylko potrzebne pliki ---
+def test_read_range_prunes_partitions(db, tmp_path):
+    archive.archive_measurements(db, max_age_days=180, now=NOW)
+    root = str(tmp_path / "archive")
+    # uszkodzony plik z innego miesiąca nie jest w ogóle otwierany
+    (tmp_path / "archive" / "sensor_id=1" / "month=2023-02" / "part.parquet").write_bytes(b"not parquet")
+
+    ts, values = archive.read_range(1, parse_local("2023-07-03 00:00:00"), parse_local("2023-07-04 23:59:59"), root)
+    assert len(ts) == len(values) == 48
+    assert (ts[1:] > ts[:-1]).all()
+    assert len(archive.read_range(2, 0, parse_local("2023-07-04 23:59:59"), root)[0]) == 0
+
+# --- Agregaty zarchiwizowanych miesięcy zostają w SQLite ---
+def test_rollups_survive_archive_and_rebuild(db):
+    monthly = db.execute("SELECT * FROM measurements_monthly ORDER BY sensor_id, bucket").fetchall()
+    archive.archive_measurements(db, max_age_days=180, now=NOW)
+    rollups.rebuild(db)
+
+    assert db.execute("SELECT * FROM measurements_monthly ORDER BY sensor_id, bucket").fetchall() == monthly
+    df, level = get_series(1, conn=db)
+    # 12000 godzin od północy 1.01 (czas zimowy) kończy się o północy 15.05 czasu letniego
+    assert level == "daily" and len(df) == 501
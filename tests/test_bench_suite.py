@@ -0,0 +1,30 @@
+from benchmarks import suite
+
+
+# --- Mały przebieg zestawu obejmuje wszystkie przypadki, a aktualizacja wstawia nowe pomiary ---
+def test_suite_runs_all_cases(monkeypatch):
+    monkeypatch.setattr(suite, "INGEST_MAX_ROWS", 800)
+
+    report = suite.run_suite([2000], repeat=1)
+
+    assert set(report["results"]) == {f"2000/{name}" for name in (
+        "ingest", "update_city", "analysis_30d", "analysis_full", "plot_data_30d", "plot_data_full",
+        "radius_search", "nearest_stations", "city_names", "city_stations")}
+    assert report["results"]["2000/ingest"]["rows"] == 800
+    assert all(r["median_s"] > 0 for r in report["results"].values())
+
+
+# --- Porównanie z wynikami bazowymi: regresja tylko powyżej tolerancji i progu szumu ---
+def test_compare_flags_regressions():
+    def report(**medians):
+        return {"results": {name: {"median_s": s} for name, s in medians.items()}}
+
+    baseline = report(fast=0.0001, slow=0.100, same=0.050, gone=1.0)
+    current = report(fast=0.0010, slow=0.200, same=0.055, new=1.0)
+
+    rows = {row["name"]: row for row in suite.compare(current, baseline, tolerance=0.25)}
+
+    assert set(rows) == {"fast", "slow", "same"}
+    assert rows["slow"]["regression"] and rows["slow"]["ratio"] == 2.0
+    assert not rows["fast"]["regression"]  # 10x, ale poniżej progu szumu
+    assert not rows["same"]["regression"]
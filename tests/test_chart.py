@@ -0,0 +1,70 @@
+import gc
+import sys
+
+import numpy as np
+import pandas as pd
+
+from app.visualizations.chart import SeriesChart
+
+
+def series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.date_range("2024-06-01", periods=n, freq="h").to_numpy(), rng.uniform(1, 120, n)
+
+
+# --- Kolejne wykresy podmieniają dane jednej linii zamiast tworzyć nowe figury ---
+def test_update_reuses_figure_and_line():
+    chart = SeriesChart()
+    line = chart.line
+
+    x, y = series(48)
+    chart.update(x, y, title="PM10")
+    chart.update(x[:24], y[:24], lo=y[:24] - 1, hi=y[:24] + 1, title="PM2.5")
+
+    assert chart.line is line and list(chart.axes.lines) == [line]
+    assert len(chart.line.get_xdata()) == 24
+    assert len(chart.axes.collections) == 1  # jedno pasmo min–max, poprzednie usunięte
+    assert chart.axes.get_title() == "PM2.5"
+
+
+# --- Pamięć nie rośnie przy 1000 kolejnych przerysowań (co 20. – nowy sensor: tytuł,
+#     pasmo i pełne przerysowanie; pozostałe – ta sama oś, tylko linia przez blitting) ---
+def test_memory_flat_over_redraws():
+    chart = SeriesChart(blit=True, figsize=(3, 2))
+    data = []
+    for seed in range(10):
+        x, y = series(48, seed)
+        y[:2] = -4, 125  # ten sam zakres osi (także z pasmem ±5) – kolejne serie idą ścieżką blittingu
+        data.append((x, y))
+
+    def redraw(i):
+        x, y = data[i % 10]
+        band = (i // 20) % 2 == 1
+        chart.update(x, y, lo=y - 5 if band else None, hi=y + 5 if band else None, title=f"Sensor {i // 20 % 3}")
+
+    for i in range(100):
+        redraw(i)
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+
+    for i in range(1000):
+        redraw(i)
+    gc.collect()
+
+    assert sys.getallocatedblocks() - blocks_before < 1000
+    assert list(chart.axes.lines) == [chart.line] and len(chart.axes.collections) <= 1
+
+
+# --- Długa seria: liczba punktów linii ograniczona szerokością osi, szczyt zostaje ---
+def test_long_series_downsampled_to_canvas_width():
+    chart = SeriesChart()
+    x, y = series(24 * 365 * 3)
+    y[12_345] = 999.0
+
+    chart.update(x, y, lo=y - 1, hi=y + 1)
+
+    budget = chart.point_budget()
+    assert budget == 2 * int(chart.axes.bbox.width)
+    assert len(chart.line.get_xdata()) <= budget
+    assert 999.0 in chart.line.get_ydata()
+    assert chart.axes.get_ylim()[1] >= 1000.0  # pasmo (hi) po decymacji nadal obejmuje szczyt
@@ -0,0 +1,123 @@
+import sqlite3
+import threading
+
+import pandas as pd
+import pytest
+
+from app import database
+from app.database import create_tables, compact_database, get_measurements_range, INSERT_MEASUREMENT_SQL
+from app.timestamps import parse_local
+
+
+@pytest.fixture
+def legacy_db():
+    # Stary schemat: pomiary bez klucza unikalnego, z duplikatami
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE measurements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sensor_id INTEGER,
+            value REAL,
+            date_time TEXT
+        );
+        INSERT INTO measurements (sensor_id, value, date_time) VALUES
+            (10, 1.0, '2024-06-10 10:00:00'),
+            (10, 1.5, '2024-06-10 10:00:00'),
+            (10, 2.0, '2024-06-10 11:00:00'),
+            (11, 3.0, '2024-06-10 10:00:00');
+    """)
+    return conn
+
+# --- Migracja usuwa duplikaty i zostawia najnowszą wartość ---
+def test_create_tables_dedupes_existing_measurements(legacy_db):
+    create_tables(legacy_db)
+
+    rows = legacy_db.execute("SELECT sensor_id, value, date_time FROM measurements_local ORDER BY id").fetchall()
+    assert rows == [
+        (10, 1.5, "2024-06-10 10:00:00"),
+        (10, 2.0, "2024-06-10 11:00:00"),
+        (11, 3.0, "2024-06-10 10:00:00"),
+    ]
+
+# --- Ponowny zapis tego samego pomiaru nie tworzy duplikatu ---
+def test_measurement_upsert_is_idempotent(legacy_db):
+    create_tables(legacy_db)
+    for _ in range(3):
+        legacy_db.execute(INSERT_MEASUREMENT_SQL, (10, 2.5, parse_local("2024-06-10 11:00:00")))
+
+    rows = legacy_db.execute(
+        "SELECT value FROM measurements WHERE sensor_id = 10 AND ts = ?", (parse_local("2024-06-10 11:00:00"),)
+    ).fetchall()
+    assert rows == [(2.5,)]
+
+# --- Migracja dat tekstowych na ts (UTC): czas letni/zimowy, separator "T", znak wodny ---
+def test_create_tables_migrates_text_dates_to_epoch(legacy_db):
+    legacy_db.executescript("""
+        INSERT INTO measurements (sensor_id, value, date_time) VALUES
+            (12, 4.0, '2024-01-15T10:00:00'),
+            (12, 5.0, '2024-07-15 10:00:00'),
+            (12, 6.0, 'brak daty');
+        CREATE TABLE sensor_sync_state (sensor_id INTEGER PRIMARY KEY, last_date TEXT, last_fetch REAL,
+                                        etag TEXT, last_modified TEXT) WITHOUT ROWID;
+        INSERT INTO sensor_sync_state (sensor_id, last_date) VALUES (12, '2024-07-15 10:00:00');
+    """)
+    create_tables(legacy_db)
+
+    columns = {row[1] for row in legacy_db.execute("PRAGMA table_info(measurements)")}
+    assert "ts" in columns and "date_time" not in columns
+    rows = legacy_db.execute("SELECT ts, date_time FROM measurements_local WHERE sensor_id = 12 ORDER BY ts").fetchall()
+    # zimą UTC+1, latem UTC+2
+    assert rows == [(1705309200, "2024-01-15 10:00:00"), (1721030400, "2024-07-15 10:00:00")]
+    assert legacy_db.execute("SELECT last_ts FROM sensor_sync_state WHERE sensor_id = 12").fetchone() == (1721030400,)
+    assert legacy_db.execute(
+        "SELECT ts FROM measurements WHERE sensor_id = 11").fetchone() == (parse_local("2024-06-10 10:00:00"),)
+
+# --- Kompaktowanie bazy raportuje liczbę usuniętych duplikatów ---
+def test_compact_database(legacy_db):
+    summary = compact_database(legacy_db)
+
+    assert summary["removed_rows"] == 1
+    assert legacy_db.execute("SELECT COUNT(*) FROM measurements").fetchone()[0] == 3
+
+# --- Zakres dat jest filtrowany w SQL, a daty zwracane jako datetime ---
+def test_get_measurements_range_filters_in_sql():
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+    conn.executemany(INSERT_MEASUREMENT_SQL, [
+        (10, float(day), parse_local(f"2024-06-{day:02d} 12:00:00")) for day in range(1, 31)
+    ] + [(11, 99.0, parse_local("2024-06-15 12:00:00"))])
+
+    df = get_measurements_range(10, "2024-06-10", "2024-06-20", conn=conn)
+
+    assert list(df["value"]) == [float(day) for day in range(10, 20)]
+    assert str(df["date_time"].dtype).startswith("datetime64")
+    assert df["date_time"].iloc[0] == pd.Timestamp("2024-06-10 12:00:00")
+    assert len(get_measurements_range(10, conn=conn)) == 30
+
+# --- WAL: czytelnik w innym wątku nie czeka na trwający zapis ---
+def test_pooled_connections_allow_concurrent_read_during_write(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "wal.db"))
+    create_tables()
+    writer = database.get_connection()
+    assert writer.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    errors, counts = [], []
+
+    def read():
+        try:
+            counts.append(database.get_connection().execute("SELECT COUNT(*) FROM measurements").fetchone()[0])
+        except sqlite3.Error as e:
+            errors.append(e)
+        finally:
+            database.close_connections()
+
+    writer.execute("BEGIN EXCLUSIVE")
+    writer.execute(INSERT_MEASUREMENT_SQL, (10, 1.0, parse_local("2024-06-10 10:00:00")))
+    reader = threading.Thread(target=read)
+    reader.start()
+    reader.join(timeout=2)
+    writer.commit()
+    database.close_connections()
+
+    assert not errors
+    assert counts == [0]  # czytelnik widzi stan sprzed niezatwierdzonego zapisu
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from app.visualizations import downsampling
+
+
+def noisy(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.arange(n, dtype=float), 50 + 20 * np.sin(np.arange(n) / 200) + rng.normal(0, 3, n)
+
+
+# --- min/max: ograniczona liczba punktów, zachowane szczyty i kolejność czasu ---
+def test_minmax_keeps_peaks():
+    x, y = noisy(100_000)
+    y[4321], y[98_765], y[500] = 900.0, -50.0, np.nan
+
+    xd, yd = downsampling.downsample(x, y, 1000, "minmax")
+
+    assert len(xd) <= 1000
+    assert np.all(np.diff(xd) > 0)
+    assert 900.0 in yd and -50.0 in yd
+    assert not np.isnan(yd).any()
+
+
+# --- LTTB: dokładnie max_points punktów, skrajne punkty serii i wyraźny szczyt zostają ---
+def test_lttb_bounds_points_and_keeps_spike():
+    x, y = noisy(50_000)
+    y[25_000] = 900.0
+
+    xd, yd = downsampling.downsample(x, y, 500, "lttb")
+
+    assert len(xd) == 500
+    assert xd[0] == x[0] and xd[-1] == x[-1]
+    assert np.all(np.diff(xd) > 0)
+    assert 900.0 in yd
+
+
+# --- Krótkie serie bez zmian; nieznana metoda to błąd ---
+def test_short_series_unchanged():
+    x, y = noisy(100)
+    for method in downsampling.METHODS:
+        xd, yd = downsampling.downsample(x, y, 1000, method)
+        assert np.array_equal(xd, x) and np.array_equal(yd, y)
+    with pytest.raises(ValueError):
+        downsampling.downsample(x, y, 10, "stride")
+
+
+# --- Pasmo min–max po redukcji obejmuje wszystkie skrajne wartości ---
+def test_envelope_covers_extremes():
+    x, y = noisy(10_000)
+    lo, hi = y - 5, y + 5
+    hi[777] = 1000.0
+
+    xe, loe, hie = downsampling.envelope(x, lo, hi, 200)
+
+    assert len(xe) <= 100
+    assert hie.max() == 1000.0 and loe.min() == lo.min()
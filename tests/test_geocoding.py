@@ -0,0 +1,102 @@
+import sqlite3
+import time
+
+import pytest
+
+from app import geocoding
+from app.database import create_tables
+from app.geocoding import GeocodeResult
+
+
+class StubBackend:
+    # Lokalna atrapa geokodera: zlicza zapytania, może symulować awarię
+    def __init__(self, places=None, fail=False):
+        self.places = places or {}
+        self.fail = fail
+        self.calls = []
+
+    def __call__(self, query):
+        self.calls.append(query)
+        if self.fail:
+            raise ConnectionError("geokoder niedostępny")
+        return self.places.get(query)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+    return conn
+
+
+# --- Kolejne zapytania (po normalizacji) nie trafiają do geokodera ---
+def test_cache_hit_after_first_lookup(conn):
+    backend = StubBackend({"Rynek Główny, Kraków": GeocodeResult(50.0617, 19.9373, "Rynek Główny")})
+
+    first = geocoding.geocode("Rynek Główny, Kraków", conn=conn, backend=backend)
+    second = geocoding.geocode("  rynek   GŁÓWNY, kraków ", conn=conn, backend=backend)
+
+    assert first == second == GeocodeResult(50.0617, 19.9373, "Rynek Główny")
+    assert backend.calls == ["Rynek Główny, Kraków"]
+
+
+# --- Brak wyniku też jest zapamiętywany ---
+def test_negative_result_cached(conn):
+    backend = StubBackend()
+    assert geocoding.geocode("Nieistniejące", conn=conn, backend=backend) is None
+    assert geocoding.geocode("nieistniejące", conn=conn, backend=backend) is None
+    assert len(backend.calls) == 1
+
+
+# --- Wygasły wpis: odświeżenie, a przy awarii geokodera – stare współrzędne ---
+def test_expired_entry_refreshed_or_used_when_backend_fails(conn):
+    geocoding.geocode("Sopot", conn=conn, backend=StubBackend({"Sopot": GeocodeResult(54.44, 18.56)}))
+    conn.execute("UPDATE geocode_cache SET created_at = ?", (time.time() - geocoding.CACHE_TTL - 1,))
+
+    failing = StubBackend(fail=True)
+    assert geocoding.geocode("Sopot", conn=conn, backend=failing) == GeocodeResult(54.44, 18.56)
+    assert failing.calls == ["Sopot"]
+
+    with pytest.raises(ConnectionError):
+        geocoding.geocode("Hel", conn=conn, backend=failing)
+
+
+# --- LRU: nadmiarowe wpisy z geokodera są usuwane od najdawniej używanych ---
+def test_lru_eviction(conn):
+    backend = StubBackend({f"Miejsce {i}": GeocodeResult(50 + i / 100, 20.0) for i in range(5)})
+    for i in range(5):
+        geocoding.geocode(f"Miejsce {i}", conn=conn, backend=backend, max_entries=3)
+        conn.execute("UPDATE geocode_cache SET last_used = last_used - ? WHERE query = ?",
+                     (100 - i, f"miejsce {i}"))
+
+    cached = {row[0] for row in conn.execute("SELECT query FROM geocode_cache")}
+    assert cached == {"miejsce 2", "miejsce 3", "miejsce 4"}
+
+
+# --- Miasta z CITY_NAMES rozwiązywane lokalnie ze współrzędnych stacji ---
+def test_city_names_seeded_from_stations(conn):
+    conn.executemany("INSERT INTO stations (id, station_name, city, latitude, longitude) VALUES (?, ?, ?, ?, ?)", [
+        (1, "Kraków, Aleja Krasińskiego", "Kraków", 50.06, 19.92),
+        (2, "Kraków, ul. Bulwarowa", "Kraków", 50.07, 20.06),
+    ])
+    backend = StubBackend()
+
+    result = geocoding.geocode("KRAKÓW", conn=conn, backend=backend)
+
+    assert backend.calls == []
+    assert result.latitude == pytest.approx(50.065)
+    assert result.longitude == pytest.approx(19.99)
+    assert result.address == "Kraków"
+
+
+# --- Stacje tego samego miasta w różnej pisowni ("ŁÓDŹ"/"Łódź") dają jeden środek ---
+def test_city_centroid_groups_non_ascii_case(conn):
+    conn.executemany("INSERT INTO stations (id, station_name, city, latitude, longitude) VALUES (?, ?, ?, ?, ?)", [
+        (1, "Łódź, ul. Czernika", "Łódź", 51.76, 19.53),
+        (2, "Łódź, ul. Gdańska", "ŁÓDŹ", 51.78, 19.45),
+    ])
+
+    result = geocoding.geocode("łódź", conn=conn, backend=StubBackend())
+
+    assert result.latitude == pytest.approx(51.77)
+    assert result.longitude == pytest.approx(19.49)
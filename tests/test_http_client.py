@@ -0,0 +1,239 @@
+import sqlite3
+import time
+
+import pytest
+import requests
+
+from app import api_GIOS, http_client
+from app.database import create_tables
+from app.http_client import CircuitBreaker, CircuitOpenError
+from app.update_db import update_city_measurements
+from benchmarks.common import synthetic_payload
+from benchmarks.stub_server import GiosStubServer
+
+LATENCY = 0.1
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    payload = synthetic_payload(n_stations=2, n_sensors=4, n_hours=5)
+    with GiosStubServer(payload, latency=LATENCY) as server:
+        monkeypatch.setattr(api_GIOS, "BASE_URL", server.base_url)
+        http_client.configure(http_client.DEFAULT_WORKERS)
+        yield server
+    http_client.configure(http_client.DEFAULT_WORKERS)
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(http_client, "RETRY_BASE_DELAY", 0.01)
+    http_client.reset_breakers()
+    yield
+    http_client.reset_breakers()
+
+
+@pytest.fixture
+def city_db(stub):
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+    for station in stub.stations:
+        conn.execute("INSERT INTO stations (id, city) VALUES (?, 'Atrapa')", (station["id"],))
+        for sensor in stub.sensors[station["id"]]:
+            conn.execute("INSERT INTO sensors (id, station_id, param_name) VALUES (?, ?, ?)",
+                         (sensor["id"], station["id"], sensor["param"]["paramName"]))
+    conn.commit()
+    return conn
+
+# --- Sensory miasta są pobierane równolegle, a zapis trafia do bazy ---
+def test_update_city_fetches_in_parallel(stub, city_db):
+    start = time.perf_counter()
+    inserted = update_city_measurements("Atrapa", conn=city_db, workers=8)
+    elapsed = time.perf_counter() - start
+
+    assert inserted == city_db.execute("SELECT COUNT(*) FROM measurements").fetchone()[0] > 0
+    assert stub.max_in_flight > 1
+    # 8 sensorów sekwencyjnie to co najmniej 8 * LATENCY
+    assert elapsed < 8 * LATENCY / 2
+
+# --- Kolejne zapytania do tego samego hosta używają istniejących połączeń ---
+def test_session_reuses_connections(stub):
+    for station in stub.stations:
+        api_GIOS.get_sensors_for_station(station["id"])
+        api_GIOS.get_sensors_for_station(station["id"])
+
+    assert stub.requests == 4
+    assert len(stub.connections) == 1
+
+# --- Ponowne odświeżenie: sensory odpytane przed chwilą są pomijane, a wymuszone
+#     zapytania warunkowe (ETag) kończą się odpowiedzią 304 ---
+def test_refresh_skips_recent_and_uses_etags(stub, city_db):
+    first = update_city_measurements("Atrapa", conn=city_db)
+    requests_after_first = stub.requests
+
+    assert update_city_measurements("Atrapa", conn=city_db) == 0
+    assert stub.requests == requests_after_first
+
+    assert update_city_measurements("Atrapa", conn=city_db, force=True) == 0
+    assert stub.not_modified == 8
+    assert first == city_db.execute("SELECT COUNT(*) FROM measurements").fetchone()[0]
+    etags = city_db.execute("SELECT COUNT(*) FROM sensor_sync_state WHERE etag IS NOT NULL").fetchone()[0]
+    assert etags == 8
+
+# --- Błędy przejściowe (5xx) są ponawiane ---
+def test_transient_errors_retried(stub):
+    sensor_id = stub.sensors[stub.stations[0]["id"]][0]["id"]
+    path = f"/data/getData/{sensor_id}"
+    stub.inject(path, 503, 502)
+
+    data = api_GIOS.get_measurements_for_sensor(sensor_id, raise_errors=True)
+
+    assert data["values"]
+    assert stub.hits[path] == 3
+
+# --- Zawieszona odpowiedź kończy się po limicie czasu i ponowieniu ---
+def test_hung_request_times_out(stub, monkeypatch):
+    monkeypatch.setattr(http_client, "DEFAULT_TIMEOUT", (1, 0.5))
+    sensor_id = stub.sensors[stub.stations[0]["id"]][0]["id"]
+    stub.inject(f"/data/getData/{sensor_id}", 3.0)
+
+    start = time.perf_counter()
+    data = api_GIOS.get_measurements_for_sensor(sensor_id, raise_errors=True)
+
+    assert data["values"]
+    assert time.perf_counter() - start < 1.5
+
+# --- Pusta odpowiedź to nie błąd: raise_errors=True przekazuje wyjątek dalej ---
+def test_failed_distinct_from_empty(stub, monkeypatch):
+    monkeypatch.setattr(http_client, "RETRIES", 0)
+    station_id = stub.stations[0]["id"]
+    stub.inject(f"/station/sensors/{station_id}", 500, 500)
+
+    assert api_GIOS.get_sensors_for_station(station_id) == []
+    with pytest.raises(requests.HTTPError):
+        api_GIOS.get_sensors_for_station(station_id, raise_errors=True)
+    assert api_GIOS.get_sensors_for_station(station_id, raise_errors=True) == stub.sensors[station_id]
+
+# --- Ponowna aktualizacja odpytuje tylko sensory, których nie udało się pobrać ---
+def test_refresh_retries_only_failed_sensors(stub, city_db, monkeypatch):
+    # Bez ponowień: każda próba liczy się do bezpiecznika, 4 sensory × 4 próby by go otworzyły
+    monkeypatch.setattr(http_client, "RETRIES", 0)
+    station_id = stub.stations[0]["id"]
+    failing = [s["id"] for s in stub.sensors[station_id]]
+    for sensor_id in failing:
+        stub.inject(f"/data/getData/{sensor_id}", 500)
+
+    update_city_measurements("Atrapa", conn=city_db)
+    stored = {row[0] for row in city_db.execute("SELECT DISTINCT sensor_id FROM measurements")}
+    assert stored.isdisjoint(failing) and len(stored) == 4
+    hits = stub.hits.copy()
+
+    update_city_measurements("Atrapa", conn=city_db)
+
+    requested = {int(path.rsplit("/", 1)[1]) for path in stub.hits if stub.hits[path] != hits[path]}
+    assert requested == set(failing)
+    assert city_db.execute("SELECT COUNT(DISTINCT sensor_id) FROM measurements").fetchone()[0] == 8
+
+# --- Bezpiecznik: po serii błędów zapytania są odrzucane bez wysyłania ---
+def test_circuit_breaker_opens(stub, monkeypatch):
+    monkeypatch.setattr(http_client, "RETRIES", 0)
+    station_id = stub.stations[0]["id"]
+    path = f"/station/sensors/{station_id}"
+    stub.inject(path, *[503] * http_client.BREAKER_THRESHOLD)
+
+    for _ in range(http_client.BREAKER_THRESHOLD):
+        with pytest.raises(requests.HTTPError):
+            api_GIOS.get_sensors_for_station(station_id, raise_errors=True)
+    with pytest.raises(CircuitOpenError):
+        api_GIOS.get_sensors_for_station(station_id, raise_errors=True)
+
+    assert stub.hits[path] == http_client.BREAKER_THRESHOLD
+    # Inne endpointy mają własne bezpieczniki
+    assert api_GIOS.get_all_stations(raise_errors=True)
+
+# --- Półotwarty bezpiecznik przepuszcza jedno próbne zapytanie ---
+def test_circuit_breaker_half_open():
+    now = [0.0]
+    cb = CircuitBreaker("test", threshold=2, reset_timeout=30, clock=lambda: now[0])
+    cb.record_failure()
+    cb.record_failure()
+    assert cb.state == "open"
+    with pytest.raises(CircuitOpenError):
+        cb.before_call()
+
+    now[0] = 31
+    cb.before_call()
+    with pytest.raises(CircuitOpenError):
+        cb.before_call()  # próba już trwa
+    cb.record_failure()
+    assert cb.state == "open"
+
+    now[0] = 62
+    cb.before_call()
+    cb.record_success()
+    assert cb.state == "closed"
+
+# --- Każda próba (także ponowienie) liczy się do bezpiecznika; otwarty przerywa ponowienia ---
+def test_each_retry_attempt_counted_by_breaker(stub, monkeypatch):
+    monkeypatch.setattr(http_client, "RETRIES", 5)
+    station_id = stub.stations[0]["id"]
+    path = f"/station/sensors/{station_id}"
+    stub.inject(path, *[503] * 10)
+
+    with pytest.raises(CircuitOpenError):
+        api_GIOS.get_sensors_for_station(station_id, raise_errors=True)
+
+    assert stub.hits[path] == http_client.BREAKER_THRESHOLD
+    assert http_client.breaker("station/sensors").state == "open"
+
+# --- Ponowienia zużywają budżet zapytań (retry_budget) ---
+def test_retries_acquire_budget(stub):
+    station_id = stub.stations[0]["id"]
+    path = f"/station/sensors/{station_id}"
+    stub.inject(path, 503, 503)
+    acquired = []
+
+    with http_client.retry_budget(lambda: acquired.append(1)):
+        api_GIOS.get_sensors_for_station(station_id, raise_errors=True)
+    api_GIOS.get_sensors_for_station(station_id, raise_errors=True)
+
+    assert stub.hits[path] == 4 and len(acquired) == 2
+
+
+# --- Błąd spoza ponawianych (np. ChunkedEncodingError) kończy próbę półotwartego bezpiecznika ---
+class FailingAdapter(requests.adapters.BaseAdapter):
+    def __init__(self):
+        super().__init__()
+        self.error = requests.exceptions.ChunkedEncodingError("urwana odpowiedź")
+
+    def send(self, request, **kwargs):
+        if self.error is not None:
+            raise self.error
+        response = requests.Response()
+        response.status_code, response._content, response.url, response.request = 200, b"[]", request.url, request
+        return response
+
+    def close(self):
+        pass
+
+
+def test_non_retryable_error_recorded_by_breaker():
+    now = [0.0]
+    cb = http_client._breakers["test"] = CircuitBreaker("test", threshold=1, reset_timeout=30, clock=lambda: now[0])
+    adapter = FailingAdapter()
+    http_client.set_transport(adapter)
+    try:
+        with pytest.raises(requests.exceptions.ChunkedEncodingError):
+            http_client.request("http://gios.test/x", endpoint="test")
+        assert cb.state == "open"
+
+        now[0] = 31
+        with pytest.raises(requests.exceptions.ChunkedEncodingError):
+            http_client.request("http://gios.test/x", endpoint="test")
+        assert cb.state == "open" and not cb._trial
+
+        now[0] = 62
+        adapter.error = None
+        assert http_client.request("http://gios.test/x", endpoint="test").status_code == 200
+        assert cb.state == "closed"
+    finally:
+        http_client.set_transport(None)
@@ -0,0 +1,87 @@
+from unittest.mock import patch
+
+import requests
+
+from app import metadata, rollups
+from app.ingest import fetch_and_save_all_data, BulkIngestor
+
+STATION = {
+    "id": 1,
+    "stationName": "Testowa",
+    "gegrLat": "52.40",
+    "gegrLon": "16.92",
+    "city": {"name": "Poznań", "commune": {"communeName": "Poznań", "provinceName": "WIELKOPOLSKIE"}},
+}
+SENSOR = {"id": 10, "param": {"paramCode": "PM10", "paramName": "pył zawieszony PM10"}}
+
+
+# --- Ingest wsadowy zapisuje wszystko i pomija wartości None ---
+@patch("app.ingest.api_GIOS.get_measurements_for_sensor")
+@patch("app.ingest.api_GIOS.get_sensors_for_station")
+@patch("app.ingest.api_GIOS.get_all_stations")
+def test_fetch_and_save_all_data_bulk(mock_stations, mock_sensors, mock_measurements, db):
+    mock_stations.return_value = [STATION]
+    mock_sensors.return_value = [SENSOR]
+    mock_measurements.return_value = {"values": [
+        {"date": "2024-06-10 10:00:00", "value": 15.2},
+        {"date": "2024-06-10 11:00:00", "value": None},
+        {"date": "2024-06-10 12:00:00", "value": 16.8},
+    ]}
+
+    stats = fetch_and_save_all_data(conn=db)
+
+    assert stats["rows"] == 4  # stacja + sensor + 2 pomiary
+    assert stats["rows_per_sec"] > 0
+    assert db.execute("SELECT COUNT(*) FROM measurements").fetchone()[0] == 2
+    assert db.execute("SELECT city FROM stations").fetchone()[0] == "Poznań"
+
+# --- Partia jest zapisywana automatycznie po przekroczeniu batch_size ---
+def test_bulk_ingestor_flushes_by_batch_size(db):
+    ingestor = BulkIngestor(db, batch_size=3)
+    ingestor.add_station(STATION)
+    ingestor.add_sensor(SENSOR, 1)
+    ingestor.add_measurements(10, [{"date": f"2024-06-10 0{h}:00:00", "value": h} for h in range(4)])
+
+    assert ingestor.commits == 1
+    assert ingestor.pending == 0
+    assert db.execute("SELECT COUNT(*) FROM measurements").fetchone()[0] == 4
+
+# --- Agregaty odświeżane raz na partię, nie przy każdym commicie stacji ---
+@patch("app.ingest.api_GIOS.get_measurements_for_sensor")
+@patch("app.ingest.api_GIOS.get_sensors_for_station")
+@patch("app.ingest.api_GIOS.get_all_stations")
+def test_rollups_refreshed_once_per_batch(mock_stations, mock_sensors, mock_measurements, db):
+    stations = [dict(STATION, id=i) for i in range(1, 4)]
+    mock_stations.return_value = stations
+    mock_sensors.side_effect = lambda station_id, **kw: [dict(SENSOR, id=station_id * 10)]
+    mock_measurements.return_value = {"values": [{"date": "2024-06-10 10:00:00", "value": 15.2}]}
+
+    with patch("app.ingest.rollups.refresh", wraps=rollups.refresh) as refresh:
+        stats = fetch_and_save_all_data(conn=db)
+
+    assert stats["commits"] == 4  # po jednym na stację + końcowe odświeżenie
+    assert refresh.call_count == 1
+    assert db.execute("SELECT COUNT(*) FROM measurements_daily").fetchone()[0] == 3
+    assert db.execute("SELECT COUNT(*) FROM sensor_sync_state WHERE last_ts IS NOT NULL").fetchone()[0] == 3
+
+# --- Nieudane pobranie sensora to nie brak danych: stacja nie jest oznaczana jako zsynchronizowana ---
+@patch("app.ingest.api_GIOS.get_measurements_for_sensor")
+@patch("app.ingest.api_GIOS.get_sensors_for_station")
+@patch("app.ingest.api_GIOS.get_all_stations")
+def test_sensor_failure_leaves_station_unsynced(mock_stations, mock_sensors, mock_measurements, db):
+    mock_stations.return_value = [STATION, dict(STATION, id=2)]
+    mock_sensors.side_effect = lambda station_id, **kw: [dict(SENSOR, id=station_id * 10),
+                                                         dict(SENSOR, id=station_id * 10 + 1)]
+
+    def fake_measurements(sensor_id, **kwargs):
+        assert kwargs.get("raise_errors") is True
+        if sensor_id == 11:
+            raise requests.HTTPError("500")
+        return {"values": [{"date": "2024-06-10 10:00:00", "value": 15.2}]}
+    mock_measurements.side_effect = fake_measurements
+
+    fetch_and_save_all_data(conn=db)
+
+    assert sorted(row[0] for row in db.execute("SELECT sensor_id FROM measurements")) == [10, 20, 21]
+    assert metadata.synced_at(db, metadata.sensors_resource(1)) is None
+    assert metadata.synced_at(db, metadata.sensors_resource(2)) is not None
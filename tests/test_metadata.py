@@ -0,0 +1,87 @@
+import sqlite3
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app import metadata
+from app.database import create_tables
+
+STATIONS = [
+    {
+        "id": 1, "stationName": "Poznań, ul. Polanka", "addressStreet": "ul. Polanka",
+        "gegrLat": "52.40", "gegrLon": "16.95",
+        "city": {"name": "Poznań", "commune": {"communeName": "Poznań", "provinceName": "WIELKOPOLSKIE"}},
+    },
+    {
+        "id": 2, "stationName": "Gniezno, ul. Paczkowskiego", "addressStreet": None,
+        "gegrLat": "52.53", "gegrLon": "17.58",
+        "city": {"name": "Gniezno", "commune": {"communeName": "Gniezno", "provinceName": "WIELKOPOLSKIE"}},
+    },
+    {
+        "id": 3, "stationName": "Łódź, ul. Czernika", "addressStreet": "ul. Czernika",
+        "gegrLat": "51.76", "gegrLon": "19.53",
+        "city": {"name": "Łódź", "commune": {"communeName": "Łódź", "provinceName": "ŁÓDZKIE"}},
+    },
+]
+
+SENSORS = [{"id": 10, "stationId": 1, "param": {"paramName": "pył zawieszony PM10", "paramCode": "PM10"}}]
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+    return conn
+
+
+# --- Pierwsze zapytanie pobiera z API, kolejne są obsługiwane z bazy ---
+@patch("app.metadata.api_GIOS.get_all_stations", return_value=STATIONS)
+def test_stations_served_from_cache_until_ttl(mock_all, conn):
+    first = metadata.get_stations_in_city("poznań", conn=conn)
+    second = metadata.get_stations_in_city("Poznań", conn=conn)
+
+    assert mock_all.call_count == 1
+    assert [s["id"] for s in first] == [s["id"] for s in second] == [1]
+    assert second[0]["addressStreet"] == "ul. Polanka"
+    assert second[0]["city"]["commune"]["provinceName"] == "WIELKOPOLSKIE"
+
+    # Przeterminowany wpis → ponowne pobranie
+    conn.execute("UPDATE metadata_sync SET synced_at = ?", (time.time() - metadata.STATIONS_TTL - 1,))
+    metadata.get_stations_in_city("Poznań", conn=conn)
+    assert mock_all.call_count == 2
+
+
+# --- Brak sieci: przeterminowany cache nadal jest zwracany ---
+def test_stale_cache_used_when_api_unavailable(conn):
+    with patch("app.metadata.api_GIOS.get_all_stations", return_value=STATIONS):
+        metadata.refresh_stations(conn)
+    metadata.invalidate(conn)
+
+    with patch("app.metadata.api_GIOS.get_all_stations", return_value=[]) as mock_all:
+        stations = metadata.get_stations_in_city("Gniezno", conn=conn)
+
+    mock_all.assert_called_once()
+    assert [s["id"] for s in stations] == [2]
+    assert metadata.is_stale(conn, metadata.STATIONS_RESOURCE, metadata.STATIONS_TTL)
+
+
+# --- Miasto bez względu na wielkość liter także poza ASCII (LOWER() w SQLite zmienia tylko ASCII) ---
+@pytest.mark.parametrize("name", ["Łódź", "łódź", "ŁÓDŹ", " łódź "])
+def test_city_match_folds_non_ascii_case(conn, name):
+    with patch("app.metadata.api_GIOS.get_all_stations", return_value=STATIONS):
+        metadata.refresh_stations(conn)
+        stations = metadata.get_stations_in_city(name, conn=conn)
+
+    assert [s["id"] for s in stations] == [3]
+
+
+# --- Sensory stacji: cache per stacja ---
+@patch("app.metadata.api_GIOS.get_sensors_for_station", return_value=SENSORS)
+def test_sensors_cached_per_station(mock_sensors, conn):
+    with patch("app.metadata.api_GIOS.get_all_stations", return_value=STATIONS):
+        metadata.refresh_stations(conn)
+
+    assert metadata.get_sensors_for_station(1, conn=conn)[0]["param"]["paramCode"] == "PM10"
+    assert metadata.get_sensors_for_station(1, conn=conn)[0]["id"] == 10
+    mock_sensors.assert_called_once_with(1, raise_errors=True)
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import requests
+
+from app import http_client
+from app.pipeline import Pipeline, PipelineMetrics
+
+
+def pipeline_threads():
+    return [t for t in threading.enumerate() if t.name.startswith("pipeline-")]
+
+# --- Wszystkie elementy przechodzą przez pobieranie i parsowanie, błędy nie przerywają potoku ---
+def test_pipeline_yields_every_key_with_errors():
+    def fetch(key):
+        if key == 3:
+            raise ValueError("sieć")
+        return key * 10
+
+    def parse(key, fetched):
+        if key == 5:
+            raise ValueError("format")
+        return fetched + 1
+
+    flow = Pipeline(fetch, parse, fetch_workers=4, parse_workers=2, queue_size=2)
+    results = {key: (value, type(error).__name__ if error else None) for key, value, error in flow.run(range(8))}
+
+    assert results == {0: (1, None), 1: (11, None), 2: (21, None), 3: (None, "ValueError"),
+                       4: (41, None), 5: (None, "ValueError"), 6: (61, None), 7: (71, None)}
+    stages = flow.metrics.as_dict()["stages"]
+    assert [stages[name]["items"] for name in ("fetch", "parse", "write")] == [8, 7, 8]
+    assert stages["fetch"]["errors"] == 1 and stages["parse"]["errors"] == 1
+    assert not pipeline_threads()
+
+# --- Wolny zapis: kolejki nie rosną ponad pojemność, wąskim gardłem jest zapis ---
+def test_pipeline_backpressure_and_bottleneck():
+    metrics = PipelineMetrics()
+    flow = Pipeline(lambda key: key, lambda key, value: value, fetch_workers=4, parse_workers=1,
+                    queue_size=3, metrics=metrics)
+    for _ in flow.run(range(30)):
+        time.sleep(0.005)
+
+    queues = metrics.as_dict()["queues"]
+    assert queues["parsed"]["max_depth"] <= 3 and queues["fetched"]["max_depth"] <= 3
+    assert queues["parsed"]["mean_depth"] > 1
+    assert metrics.bottleneck() == "write"
+    assert "wąskie gardło: write" in metrics.summary()
+
+# --- Przerwanie iteracji zatrzymuje wątki i porzuca niepobrane klucze ---
+def test_pipeline_close_stops_workers():
+    fetched = []
+    flow = Pipeline(lambda key: fetched.append(key) or key, lambda key, value: value,
+                    fetch_workers=2, queue_size=1)
+    results = flow.run(range(1000))
+    next(results)
+    results.close()
+
+    assert not pipeline_threads()
+    assert len(fetched) < 1000
+
+# --- Przerwanie iteracji przerywa oczekiwanie na ponowienie zapytań zamiast je przeczekać ---
+class UnavailableAdapter(requests.adapters.BaseAdapter):
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code, response.url, response.request = 503, request.url, request
+        return response
+
+    def close(self):
+        pass
+
+
+def test_pipeline_close_cancels_retry_backoff(monkeypatch):
+    monkeypatch.setattr(http_client, "_retry_delay", lambda attempt, response: 30.0)
+    http_client.reset_breakers()
+    http_client.set_transport(UnavailableAdapter())
+    try:
+        def fetch(key):
+            return key if key == 0 else http_client.request(f"http://gios.test/{key}", endpoint="test")
+
+        results = Pipeline(fetch, lambda key, value: value, fetch_workers=3).run(range(3))
+        assert next(results)[0] == 0
+        time.sleep(0.1)  # pozostałe wątki czekają na ponowienie
+        start = time.perf_counter()
+        results.close()
+
+        assert time.perf_counter() - start < 1
+        assert not pipeline_threads()
+    finally:
+        http_client.set_transport(None)
+        http_client.reset_breakers()
@@ -0,0 +1,58 @@
+import pytest
+
+from app import update_db
+from app.database import SENSOR_RANGE_SQL, MEASUREMENTS_UNIQUE_INDEX
+from app.timestamps import parse_local
+
+# Każde gorące zapytanie musi korzystać z indeksów zarządzanych (app.database.INDEXES).
+# Jeśli zmiana zapytania przywróci pełny skan tabeli, te testy to wychwycą.
+
+
+@pytest.fixture
+def db(db):
+    conn = db
+    conn.executemany("INSERT INTO stations (id, city) VALUES (?, ?)", [(i, f"Miasto {i % 10}") for i in range(50)])
+    conn.executemany("INSERT INTO sensors (id, station_id) VALUES (?, ?)", [(i, i // 4) for i in range(200)])
+    conn.executemany(
+        "INSERT INTO measurements (sensor_id, value, ts) VALUES (?, ?, ?)",
+        [(s, h * 1.0, parse_local("2024-06-01 00:00:00") + h * 3600) for s in range(200) for h in range(48)]
+    )
+    conn.execute("ANALYZE")
+    return conn
+
+
+def query_plan(conn, sql, params):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def assert_no_table_scan(plan):
+    scans = [step for step in plan if step.startswith("SCAN ") and "INDEX" not in step]
+    assert not scans, f"Pełny skan tabeli w planie: {plan}"
+
+
+def test_sensor_range_uses_covering_index(db):
+    plan = query_plan(db, SENSOR_RANGE_SQL, (10, parse_local("2024-06-01 12:00:00"), parse_local("2024-06-02 00:00:00")))
+    assert_no_table_scan(plan)
+    assert any("COVERING INDEX idx_measurements_sensor_time_value (sensor_id=? AND ts>? AND ts<?)"
+               in step for step in plan)
+    assert not any("TEMP B-TREE FOR ORDER BY" in step for step in plan)
+
+
+def test_station_sync_states_use_station_index(db):
+    plan = query_plan(db, update_db.STATION_SYNC_STATES_SQL, ("[1, 2]",))
+    assert_no_table_scan(plan)
+    assert any("idx_sensors_station" in step for step in plan)
+
+
+def test_sync_state_uses_indexes(db):
+    sql = update_db.SYNC_STATE_SQL.format(placeholders="?,?")
+    plan = query_plan(db, sql, (1, 2))
+    assert_no_table_scan(plan)
+    assert any(step.startswith("SEARCH s USING INTEGER PRIMARY KEY") for step in plan)
+    assert any(step.startswith("SEARCH st USING PRIMARY KEY") for step in plan)
+    # Zapasowy MAX(ts) wystarcza (sensor_id, ts) – planer może wybrać węższy indeks unikalny
+    assert any(
+        step.startswith("SEARCH m USING COVERING INDEX")
+        and ("idx_measurements_sensor_time_value" in step or MEASUREMENTS_UNIQUE_INDEX in step)
+        for step in plan
+    )
@@ -0,0 +1,59 @@
+import sqlite3
+
+import pytest
+import requests
+
+from app import api_GIOS, http_client
+from app.database import create_tables
+from app.ingest import fetch_and_save_all_data
+from benchmarks.common import synthetic_payload
+from benchmarks.replay import Cassette, recording, replaying
+from benchmarks.stub_server import GiosStubServer
+
+PAYLOAD = synthetic_payload(n_stations=3, n_sensors=2, n_hours=6)
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers():
+    http_client.reset_breakers()
+    yield
+    http_client.reset_breakers()
+
+
+# --- Nagrane odpowiedzi atrapy są potem odtwarzane bez serwera ---
+def test_record_then_replay(tmp_path, monkeypatch):
+    path = str(tmp_path / "gios.json.gz")
+    with GiosStubServer(PAYLOAD) as stub:
+        monkeypatch.setattr(api_GIOS, "BASE_URL", stub.base_url + "/pjp-api/rest")
+        with recording(path) as cassette:
+            stations = api_GIOS.get_all_stations(raise_errors=True)
+            live = api_GIOS.get_measurements_for_sensor(PAYLOAD[1][1][0]["id"], raise_errors=True)
+    assert len(cassette) == 2
+
+    monkeypatch.setattr(api_GIOS, "BASE_URL", "http://offline.invalid/pjp-api/rest")
+    with replaying(path) as adapter:
+        assert api_GIOS.get_all_stations(raise_errors=True) == stations
+        replayed = api_GIOS.get_measurements_for_sensor(PAYLOAD[1][1][0]["id"], raise_errors=True)
+        again = api_GIOS.get_measurements_for_sensor(PAYLOAD[1][1][0]["id"], etag=replayed.etag,
+                                                     raise_errors=True)
+        with pytest.raises(requests.ConnectionError):
+            api_GIOS.get_sensors_for_station(1, raise_errors=True)
+
+    assert replayed == live and replayed.etag == live.etag
+    assert again.not_modified
+    assert adapter.misses >= 1
+
+
+# --- Syntetyczne nagranie napędza pełne pobieranie (ingest) przez HTTP ---
+def test_ingest_from_synthetic_cassette():
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+
+    with replaying(Cassette.from_payload(PAYLOAD)) as adapter:
+        stats = fetch_and_save_all_data(conn=conn)
+
+    assert adapter.misses == 0
+    assert adapter.requests == 1 + 3 + 3 * 2
+    expected = sum(1 for m in PAYLOAD[2].values() for v in m["values"] if v["value"] is not None)
+    assert conn.execute("SELECT COUNT(*) FROM measurements").fetchone()[0] == expected
+    assert stats["rows"] == expected + 3 + 3 * 2
@@ -0,0 +1,65 @@
+import pytest
+
+from app import rollups
+from app.aggregation import summarize_sensor
+from app.database import get_series, INSERT_MEASUREMENT_SQL
+from app.timestamps import parse_local
+
+
+def hourly_rows(sensor_id, days, start_day=1):
+    return [(sensor_id, float(h % 24 + d), f"2024-{1 + (d + start_day - 1) // 28:02d}-"
+             f"{1 + (d + start_day - 1) % 28:02d} {h:02d}:00:00") for d in range(days) for h in range(24)]
+
+
+def insert_tracked(conn, rows):
+    rows = [(sensor_id, value, parse_local(date_time)) for sensor_id, value, date_time in rows]
+    touched = {}
+    for sensor_id, _, ts in rows:
+        rollups.track(touched, sensor_id, [ts])
+    with conn:
+        conn.executemany(INSERT_MEASUREMENT_SQL, rows)
+        rollups.refresh(conn, touched)
+
+
+def snapshot(conn):
+    return {table: conn.execute(f"SELECT * FROM {table} ORDER BY sensor_id, bucket").fetchall()
+            for table, *_ in rollups.LEVELS.values()}
+
+
+# --- Aktualizacja przyrostowa daje ten sam wynik co pełne przeliczenie ---
+def test_incremental_refresh_matches_rebuild(db):
+    insert_tracked(db, hourly_rows(10, 40))
+    # korekta istniejącej wartości i nowe pomiary na końcu
+    insert_tracked(db, [(10, 500.0, "2024-01-05 10:00:00")] + hourly_rows(10, 3, start_day=41))
+    incremental = snapshot(db)
+
+    rollups.rebuild(db)
+
+    assert snapshot(db) == incremental
+    assert db.execute("SELECT max FROM measurements_daily WHERE bucket = '2024-01-05 00:00:00'").fetchone() == (500.0,)
+
+# --- Wybór poziomu: krótkie zakresy z surowych danych, długie z agregatów ---
+@pytest.mark.parametrize("days, expected", [(3, None), (10, None), (30, None), (60, None),
+                                            (365, "daily"), (3650, "monthly")])
+def test_choose_level(days, expected):
+    assert rollups.choose_level(days * 86400) == expected
+
+
+def test_hourly_level_only_for_finer_sources():
+    # Pomiary godzinowe – kubełek godzinowy nic nie zmniejsza; pomiary co 10 minut – tak
+    assert rollups.choose_level(10 * 86400, source_seconds=3600) is None
+    assert rollups.choose_level(10 * 86400, source_seconds=600) == "hourly"
+
+
+def test_long_range_series_and_analysis_use_rollups(db):
+    insert_tracked(db, hourly_rows(10, 150))
+
+    df, level = get_series(10, "2024-01-01", "2024-08-01", conn=db)
+    raw = summarize_sensor(10, "2024-01-01", "2024-08-01", conn=db)
+    daily = summarize_sensor(10, "2024-01-01", "2024-08-01", level="daily", conn=db)
+
+    assert level == "daily"
+    assert len(df) == 150
+    assert {"min", "max"} <= set(df.columns)
+    for key in ("count", "min", "max", "mean", "std"):
+        assert daily[key] == pytest.approx(raw[key])
@@ -0,0 +1,105 @@
+import sqlite3
+import time
+
+import pytest
+
+from app import api_GIOS, http_client
+from app.database import create_tables, record_sensor_view
+from app.scheduler import RefreshScheduler, BASE_INTERVAL
+from benchmarks.common import synthetic_payload
+from benchmarks.stub_server import GiosStubServer
+
+
+class FakeClock:
+    # Symulowany zegar: sleep() tylko przesuwa czas
+    def __init__(self, start):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    payload = synthetic_payload(n_stations=3, n_sensors=4, n_hours=5)
+    with GiosStubServer(payload) as server:
+        monkeypatch.setattr(api_GIOS, "BASE_URL", server.base_url)
+        http_client.configure(http_client.DEFAULT_WORKERS)
+        yield server
+    http_client.configure(http_client.DEFAULT_WORKERS)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+    return conn
+
+
+def data_hits(stub, sensor_id):
+    return stub.hits[f"/data/getData/{sensor_id}"]
+
+
+# --- Globalny budżet zapytań nie jest przekraczany ---
+def test_request_budget_respected(stub, conn):
+    clock = FakeClock(time.time())
+    scheduler = RefreshScheduler(conn, clock=clock, requests_per_minute=2, workers=2)
+
+    scheduler.run(until=clock.now + 300)
+
+    # burst (2 zapytania) + 2 na minutę przez 5 minut
+    assert 0 < stub.requests <= 2 + 2 * 5
+    assert stub.requests == stub.hits["/station/findAll"] + sum(
+        n for path, n in stub.hits.items() if path.startswith(("/station/sensors/", "/data/getData/")))
+
+
+# --- Ponowienia po błędach zużywają ten sam budżet co zapytania ---
+def test_retries_count_against_budget(stub, conn, monkeypatch):
+    monkeypatch.setattr(http_client, "RETRY_BASE_DELAY", 0.001)
+    http_client.reset_breakers()
+    for sensors in stub.sensors.values():
+        for sensor in sensors:
+            stub.inject(f"/data/getData/{sensor['id']}", 503, 503, 503)
+    clock = FakeClock(time.time())
+    scheduler = RefreshScheduler(conn, clock=clock, requests_per_minute=6, workers=2)
+
+    scheduler.run(until=clock.now + 300)
+    http_client.reset_breakers()
+
+    # burst (2 zapytania) + 6 na minutę przez 5 minut, ponowienia wliczone
+    assert sum(n for path, n in stub.hits.items() if path.startswith("/data/getData/")) > 0
+    assert stub.requests <= 2 + 6 * 5
+
+
+# --- Pełny obieg: metadane i pomiary wszystkich sensorów trafiają do bazy ---
+def test_all_sensors_refreshed(stub, conn):
+    clock = FakeClock(time.time())
+    scheduler = RefreshScheduler(conn, clock=clock, requests_per_minute=600, workers=4)
+
+    scheduler.run(until=clock.now + 120)
+
+    sensor_ids = [s["id"] for sensors in stub.sensors.values() for s in sensors]
+    assert all(data_hits(stub, sensor_id) == 1 for sensor_id in sensor_ids)
+    assert conn.execute("SELECT COUNT(DISTINCT sensor_id) FROM measurements").fetchone()[0] == len(sensor_ids)
+
+
+# --- Często oglądany sensor jest odpytywany częściej, a brak nowych danych wydłuża odstęp ---
+def test_popular_sensor_refreshed_more_often_with_backoff(stub, conn):
+    clock = FakeClock(time.time())
+    scheduler = RefreshScheduler(conn, clock=clock, requests_per_minute=600, workers=4)
+    scheduler.run(until=clock.now + 60)  # metadane i pierwsze pobranie
+
+    popular, quiet = stub.sensors[1][0]["id"], stub.sensors[2][0]["id"]
+    for _ in range(1000):
+        record_sensor_view(popular, conn=conn)
+    scheduler.reload()
+
+    scheduler.run(until=clock.now + 3 * 3600)
+
+    assert data_hits(stub, popular) > data_hits(stub, quiet) >= 2
+    # Dane w atrapie się nie zmieniają (304) – odstępy rosną wykładniczo
+    assert scheduler.interval(quiet) > BASE_INTERVAL
+    assert stub.not_modified > 0
@@ -0,0 +1,63 @@
+import random
+import sqlite3
+
+import pytest
+from geopy.distance import geodesic
+
+from app import spatial
+from app.database import create_tables
+
+
+def random_stations(n, seed=1):
+    rng = random.Random(seed)
+    return [(i, f"Stacja {i}", f"Miasto {i % 7}", 49 + rng.random() * 5, 14 + rng.random() * 10)
+            for i in range(1, n + 1)]
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+    conn.executemany("INSERT INTO stations (id, station_name, city, latitude, longitude) VALUES (?, ?, ?, ?, ?)",
+                     random_stations(500))
+    conn.commit()
+    return conn
+
+
+# --- Wyniki indeksu zgodne z pętlą geodesic, posortowane po odległości ---
+@pytest.mark.parametrize("radius", [5, 40, 150])
+def test_within_matches_geodesic_loop(conn, radius):
+    center = (52.23, 21.01)
+    rows = conn.execute("SELECT id, latitude, longitude FROM stations").fetchall()
+    expected = {r[0] for r in rows if geodesic(center, (r[1], r[2])).km <= radius}
+
+    found = spatial.stations_within(*center, radius, conn=conn)
+    ids = {station_id for station_id, *_ in found}
+    distances = [km for *_, km in found]
+
+    # Haversine vs elipsoida: różnice tylko na samej granicy promienia
+    border = {r[0] for r in rows if abs(geodesic(center, (r[1], r[2])).km - radius) < radius * 0.006}
+    assert ids - border == expected - border
+    assert distances == sorted(distances)
+
+
+# --- k najbliższych: te same co pełne sortowanie ---
+def test_nearest_matches_brute_force(conn):
+    rows = conn.execute("SELECT id, latitude, longitude FROM stations").fetchall()
+    center = (50.06, 19.94)
+    brute = sorted(rows, key=lambda r: spatial.haversine_km(*center, r[1], r[2]))[:5]
+
+    nearest = spatial.nearest_stations(*center, k=5, conn=conn)
+    assert [n[0] for n in nearest] == [r[0] for r in brute]
+
+
+# --- Zmiana tabeli stations unieważnia indeks ---
+def test_index_rebuilt_after_stations_change(conn):
+    index = spatial.get_station_index(conn)
+    assert spatial.get_station_index(conn) is index
+
+    conn.execute("INSERT INTO stations (id, station_name, city, latitude, longitude) "
+                 "VALUES (9999, 'Nowa', 'Nowe', 54.35, 18.65)")
+    rebuilt = spatial.get_station_index(conn)
+    assert rebuilt is not index
+    assert spatial.nearest_stations(54.35, 18.65, conn=conn)[0][0] == 9999
@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from app import startup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budżety czasu startu (s) – z zapasem na wolniejsze maszyny CI
+IMPORT_BUDGET = 1.0
+FIRST_WINDOW_BUDGET = 2.0
+
+
+def run_python(code):
+    result = subprocess.run([sys.executable, "-c", textwrap.dedent(code)], cwd=ROOT,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip().splitlines()[-1]
+
+
+# --- Import GUI nie ładuje ciężkich bibliotek i mieści się w budżecie ---
+def test_gui_import_is_lazy_and_fast():
+    out = run_python("""
+        import sys, time
+        start = time.perf_counter()
+        import app.gui
+        elapsed = time.perf_counter() - start
+        heavy = [m for m in ("pandas", "matplotlib", "folium", "geopy", "numpy") if m in sys.modules]
+        print(elapsed, *heavy)
+    """)
+    elapsed, *heavy = out.split()
+    assert heavy == []
+    assert float(elapsed) < IMPORT_BUDGET
+
+
+# --- Czas do pierwszego okna (wymaga ekranu) ---
+def test_time_to_first_window(tmp_path):
+    try:
+        import tkinter
+        tkinter.Tk().destroy()
+    except Exception:
+        pytest.skip("brak ekranu dla Tk")
+
+    out = run_python(f"""
+        from app import startup
+        import tkinter as tk
+        from unittest.mock import patch
+        from app import database
+        with patch.object(database, "DB_PATH", {str(tmp_path / "start.db")!r}):
+            from app.gui import AirQualityApp
+            root = tk.Tk()
+            AirQualityApp(root)
+            root.update()
+            print(startup.elapsed())
+            root.destroy()
+    """)
+    assert float(out) < FIRST_WINDOW_BUDGET
+
+
+# --- Preload w tle wczytuje moduły raz na proces ---
+def test_preload_runs_once():
+    first = startup.preload(("json",))
+    first.join(timeout=10)
+
+    assert startup.preload(("json",)) is first
+    assert "biblioteki wczytane" in [label for label, _ in startup.marks()]
+
+
+# --- Raport importów: najwolniejsze moduły, czasy łączne malejąco ---
+def test_import_report():
+    rows = startup.import_report("app.database", top=50)
+
+    assert 0 < len(rows) <= 50
+    assert "app.database" in [name for name, _, _ in rows]
+    assert [r[2] for r in rows] == sorted((r[2] for r in rows), reverse=True)
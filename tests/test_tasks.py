@@ -0,0 +1,90 @@
+import threading
+import time
+
+from app.tasks import TaskExecutor
+
+
+class FakeRoot:
+    # Zamiast pętli Tk: zapamiętuje zaplanowane wywołania after()
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, fn):
+        self.scheduled.append(fn)
+
+
+def drain_until(executor, predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "zadanie nie zakończyło się w czasie"
+        executor.drain()
+        time.sleep(0.01)
+
+
+# --- Wyniki i postęp trafiają do wątku wywołującego drain() ---
+def test_results_and_progress_delivered_on_draining_thread():
+    root = FakeRoot()
+    executor = TaskExecutor(root)
+    assert root.scheduled, "executor powinien zaplanować odpytywanie kolejki"
+
+    calls = []
+
+    def work(task, n):
+        for i in range(1, n + 1):
+            task.progress(i, n)
+        return n * 10
+
+    executor.submit(
+        work, 3,
+        on_progress=lambda done, total: calls.append(("progress", done, total, threading.get_ident())),
+        on_done=lambda result: calls.append(("done", result, threading.get_ident())),
+    )
+    drain_until(executor, lambda: any(c[0] == "done" for c in calls))
+    executor.shutdown()
+
+    main = threading.get_ident()
+    assert [c[1:3] for c in calls if c[0] == "progress"] == [(1, 3), (2, 3), (3, 3)]
+    assert calls[-1][:2] == ("done", 30)
+    assert all(c[-1] == main for c in calls)
+
+
+# --- Anulowanie przerywa pracę przy najbliższym wywołaniu progress_cb ---
+def test_cancel_stops_task_via_progress_callback():
+    executor = TaskExecutor(FakeRoot())
+    started = threading.Event()
+    release = threading.Event()
+    steps = []
+    outcome = []
+
+    def work(task):
+        started.set()
+        release.wait(5)
+        for i in range(100):
+            task.progress(i, 100)
+            steps.append(i)
+        return "koniec"
+
+    task = executor.submit(work, on_done=outcome.append, on_cancel=lambda: outcome.append("anulowano"))
+    assert started.wait(5)
+    task.cancel()
+    release.set()
+    drain_until(executor, lambda: outcome)
+    executor.shutdown()
+
+    assert outcome == ["anulowano"]
+    assert steps == []
+
+
+# --- Wyjątek z wątku roboczego trafia do on_error ---
+def test_error_delivered_to_callback():
+    executor = TaskExecutor(FakeRoot())
+    errors = []
+
+    def work(task):
+        raise RuntimeError("awaria API")
+
+    executor.submit(work, on_error=errors.append)
+    drain_until(executor, lambda: errors)
+    executor.shutdown()
+
+    assert isinstance(errors[0], RuntimeError)
@@ -0,0 +1,60 @@
+import sqlite3
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from app import timestamps
+from app.timestamps import TIMEZONE, parse_local, parse_local_many, to_local_text, to_local_many
+
+
+def zoneinfo_text(ts):
+    return datetime.fromtimestamp(ts, TIMEZONE).strftime(timestamps.DATE_TIME_FORMAT)
+
+# --- Parser o stałym formacie i konwersja do czasu lokalnego zgodne z zoneinfo ---
+@pytest.mark.parametrize("text, utc", [
+    ("2024-01-15 10:00:00", "2024-01-15 09:00:00"),
+    ("2024-07-15 10:00:00", "2024-07-15 08:00:00"),
+    ("2024-03-31 01:59:59", "2024-03-31 00:59:59"),
+    ("2024-03-31 03:00:00", "2024-03-31 01:00:00"),
+    # 02:30 jesienią występuje dwa razy – pierwsze wystąpienie (czas letni)
+    ("2024-10-27 02:30:00", "2024-10-27 00:30:00"),
+    ("2024-10-27T03:00:00", "2024-10-27 02:00:00"),
+])
+def test_parse_local(text, utc):
+    expected = int(datetime.strptime(utc, timestamps.DATE_TIME_FORMAT).replace(tzinfo=timezone.utc).timestamp())
+    assert parse_local(text) == expected
+    assert parse_local_many([text]).tolist() == [expected]
+
+
+def test_to_local_round_trip_over_dst_changes():
+    start = parse_local("2024-03-30 00:00:00")
+    stamps = [start + h * 1800 for h in range(48 * 2)] + [parse_local("2024-10-26 00:00:00") + h * 1800
+                                                           for h in range(48 * 2)]
+    texts = [to_local_text(ts) for ts in stamps]
+    assert texts == [zoneinfo_text(ts) for ts in stamps]
+    local = to_local_many(np.array(stamps))
+    assert [str(t)[:19].replace("T", " ") for t in local] == texts
+
+# --- Wyrażenia SQL (widok, agregaty, migracja) zgodne z zoneinfo ---
+def test_sql_expressions_match_zoneinfo():
+    conn = sqlite3.connect(":memory:")
+    stamps = list(range(parse_local("2018-01-01 00:00:00"), parse_local("2026-01-01 00:00:00"), 1800))
+    conn.execute("CREATE TABLE t (ts INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(ts,) for ts in stamps])
+
+    local = [row[0] for row in conn.execute(f"SELECT {timestamps.local_text_sql('ts')} FROM t ORDER BY ts")]
+    assert local == [to_local_text(ts) for ts in stamps]
+
+    conn.execute(f"CREATE TABLE l AS SELECT {timestamps.local_text_sql('ts')} AS text FROM t")
+    back = [row[0] for row in conn.execute(f"SELECT {timestamps.epoch_sql('text')} FROM l ORDER BY rowid")]
+    assert back == [parse_local(text) for text in local]
+
+# --- Granice lokalnych kubełków (doba przy zmianie czasu ma 23/25 godzin) ---
+def test_local_floor_and_next():
+    ts = parse_local("2024-10-27 15:20:00")
+    assert to_local_text(timestamps.local_floor(ts, "hour")) == "2024-10-27 15:00:00"
+    assert to_local_text(timestamps.local_floor(ts, "day")) == "2024-10-27 00:00:00"
+    assert timestamps.local_next(ts, "day") - timestamps.local_floor(ts, "day") == 25 * 3600
+    assert to_local_text(timestamps.local_floor(ts, "month")) == "2024-10-01 00:00:00"
+    assert to_local_text(timestamps.local_next(ts, "month")) == "2024-11-01 00:00:00"